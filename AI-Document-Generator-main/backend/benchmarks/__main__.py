@@ -0,0 +1,130 @@
+"""Run the benchmark suite offline and write the results as JSON.
+
+Run from the backend directory:
+    python -m benchmarks --output bench.json
+    python -m benchmarks --quick --output new.json --compare bench.json
+
+``--compare`` matches rows with a previous results file and exits with
+status 1 if any timing got slower than ``--threshold``.
+"""
+import argparse
+import datetime
+import json
+import platform
+import subprocess
+import sys
+from importlib import metadata
+
+from benchmarks import bench_api, bench_bulk_export, bench_docx_writer, bench_generators, bench_icons, bench_normalizer, bench_pptx_export, bench_prefetch, bench_projects, bench_refine, bench_startup
+
+# Fields that identify a row across runs; numeric fields ending in these are timings
+ID_FIELDS = ('suite', 'benchmark', 'endpoint', 'theme', 'sections', 'slides', 'concurrency', 'module', 'documents')
+TIMING_SUFFIXES = ('seconds', '_ms', '_us')
+QUICK_SIZES = [5, 50]
+
+
+def environment() -> dict:
+    """Commit and library versions the results were measured with"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for package in ('python-pptx', 'python-docx', 'lxml', 'fastapi'):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "packages": versions,
+    }
+
+
+def run_suite(quick: bool, skip_api: bool, skip_startup: bool, latency: float) -> list:
+    rows = []
+    sizes = QUICK_SIZES if quick else bench_generators.DECK_SIZES
+
+    def add(suite, results):
+        for row in results:
+            rows.append({"suite": suite, **row})
+        print(f"  {suite}: {len(results)} rows", file=sys.stderr)
+
+    add("generators", bench_generators.run(sizes=sizes))
+    add("pptx_export", bench_pptx_export.run(themes=['professional_blue'], sizes=sizes))
+    add("icons", bench_icons.run())
+    add("docx_writer", bench_docx_writer.run(section_counts=[10] if quick else bench_docx_writer.SECTION_COUNTS))
+    add("normalizer", bench_normalizer.run(section_counts=QUICK_SIZES if quick else bench_normalizer.SECTION_COUNTS))
+    if not skip_api:
+        requests = 20 if quick else bench_api.DEFAULT_REQUESTS
+        add("api", bench_api.run(latency=latency, requests=requests))
+        add("projects", bench_projects.run(section_counts=QUICK_SIZES if quick else bench_projects.SECTION_COUNTS))
+        add("refine", bench_refine.run(bullet_counts=[5, 20] if quick else bench_refine.BULLET_COUNTS))
+        add("prefetch", bench_prefetch.run(section_counts=[5] if quick else bench_prefetch.SECTION_COUNTS))
+        add("bulk_export", bench_bulk_export.run(document_counts=[4] if quick else bench_bulk_export.DOCUMENT_COUNTS))
+    if not skip_startup:
+        add("startup", bench_startup.run(repeat=1 if quick else 3))
+    return rows
+
+
+def row_key(row: dict) -> tuple:
+    return tuple(row.get(field) for field in ID_FIELDS)
+
+
+def compare(rows: list, baseline: list, threshold: float) -> list:
+    """Timings slower than ``threshold`` x the baseline, as printable lines"""
+    previous = {row_key(row): row for row in baseline}
+    regressions = []
+    for row in rows:
+        old = previous.get(row_key(row))
+        if old is None:
+            continue
+        for field, value in row.items():
+            if not field.endswith(TIMING_SUFFIXES) or not old.get(field):
+                continue
+            ratio = value / old[field]
+            if ratio > threshold:
+                label = ' '.join(str(part) for part in row_key(row) if part is not None)
+                regressions.append(f"{label} {field}: {old[field]} -> {value} ({ratio:.2f}x)")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.splitlines()[0])
+    parser.add_argument('--output', '-o', help="Write JSON results here (default: stdout)")
+    parser.add_argument('--compare', help="Previous JSON results to compare against")
+    parser.add_argument('--threshold', type=float, default=1.25, help="Slowdown ratio reported as a regression")
+    parser.add_argument('--quick', action='store_true', help="Small decks and fewer requests")
+    parser.add_argument('--skip-api', action='store_true', help="Only benchmark the generators")
+    parser.add_argument('--skip-startup', action='store_true', help="Don't start uvicorn for the cold-start timings")
+    parser.add_argument('--latency', type=float, default=bench_api.DEFAULT_STUB_LATENCY,
+                        help="Seconds the stub LLM takes per call")
+    args = parser.parse_args(argv)
+
+    report = {"environment": environment(), "results": run_suite(args.quick, args.skip_api, args.skip_startup, args.latency)}
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(report["results"], baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print("No regressions", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""In-process load test of the FastAPI app on the stub LLM provider.
+
+Each scenario fires ``requests`` calls with at most ``concurrency`` in
+flight through httpx's ASGI transport and reports throughput and latency
+percentiles. Every request has a topic unique to the run, so the LLM and
+export caches miss and the numbers reflect real work. Export scenarios
+run at most the engine's capacity at once (more would just be answered
+429, counted as ``rejected``).
+
+Run from the backend directory:
+    python -m benchmarks.bench_api
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+
+import httpx
+
+from utils.gemini_helper import DEFAULT_STUB_LATENCY, canned_text
+
+DEFAULT_REQUESTS = 100
+DEFAULT_CONCURRENCY = 20
+EXPORT_SECTIONS = 20
+DOCUMENT_SECTIONS = 10
+
+
+def _sections(count: int, content: str = '') -> list:
+    return [{"id": i, "title": f"Section {i}", "content": content} for i in range(1, count + 1)]
+
+
+# name -> (method, path, builds the request kwargs from a run tag and call number)
+SCENARIOS = {
+    "generate-section": ("POST", "/api/generate-section", lambda tag, n: {
+        "json": {"topic": f"Benchmark topic {tag}-{n}", "sectionTitle": "Overview", "docType": "pptx"}
+    }),
+    "generate-document": ("POST", "/api/generate-document", lambda tag, n: {
+        "json": {"topic": f"Benchmark topic {tag}-{n}", "docType": "docx", "sections": _sections(DOCUMENT_SECTIONS)}
+    }),
+    "generate-document-packed": ("POST", "/api/generate-document", lambda tag, n: {
+        "json": {"topic": f"Benchmark topic {tag}-{n}", "docType": "docx", "sections": _sections(DOCUMENT_SECTIONS),
+                 "packed": True}
+    }),
+    "refine-section": ("POST", "/api/refine-section", lambda tag, n: {
+        "json": {"currentContent": f"• Draft point {tag}-{n}", "instruction": "Make it shorter"}
+    }),
+    "generate-template": ("POST", "/api/generate-template", lambda tag, n: {
+        "params": {"topic": f"Benchmark topic {tag}-{n}", "doc_type": "pptx", "num_sections": 5}
+    }),
+    "export-pptx": ("POST", "/api/export-document", lambda tag, n: {
+        "json": {"topic": f"Benchmark deck {tag}-{n}", "docType": "pptx",
+                 "sections": _sections(EXPORT_SECTIONS, canned_text(str(n)))}
+    }),
+    "export-docx": ("POST", "/api/export-document", lambda tag, n: {
+        "json": {"topic": f"Benchmark document {tag}-{n}", "docType": "docx",
+                 "sections": _sections(EXPORT_SECTIONS, canned_text(str(n)))}
+    }),
+}
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def load(client: httpx.AsyncClient, scenario: str, requests: int, concurrency: int) -> dict:
+    method, path, build = SCENARIOS[scenario]
+    limit = asyncio.Semaphore(concurrency)
+    tag = uuid.uuid4().hex[:8]
+    latencies = []
+    statuses = {}
+
+    async def one(n):
+        async with limit:
+            start = time.perf_counter()
+            response = await client.request(method, path, **build(tag, n))
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "endpoint": scenario,
+        "requests": requests,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 4),
+        "rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2),
+        "rejected": statuses.get(429, 0),
+        "errors": sum(count for status, count in statuses.items() if status >= 400 and status != 429),
+    }
+
+
+def load_app(latency: float):
+    """Import the app with LLM_PROVIDER=stub answering after ``latency`` seconds"""
+    os.environ['LLM_PROVIDER'] = 'stub'
+    os.environ['LLM_STUB_LATENCY'] = str(latency)
+    # Measure the API, not the client-side Gemini quota (unless one is set explicitly)
+    os.environ.setdefault('GEMINI_RPM', '0')
+    os.environ.setdefault('GEMINI_TPM', '0')
+    os.environ.setdefault('PROJECT_STORE_DB', ':memory:')
+    import main
+
+    if main.llm_provider.name != 'stub':
+        raise RuntimeError("main was already imported with a real LLM provider; benchmark in a fresh process")
+    main.llm_provider.latency = latency
+    return main
+
+
+async def _run(main, scenarios, requests: int, concurrency: int) -> list:
+    await asyncio.to_thread(main.export_engine.start)
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)  # Per-request INFO logs would dominate the timings
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            results = []
+            for scenario in scenarios:
+                limit = concurrency
+                if scenario.startswith("export"):
+                    limit = min(concurrency, main.export_engine.capacity)
+                results.append(await load(client, scenario, requests, limit))
+            return results
+    finally:
+        root.setLevel(level)
+        main.export_engine.shutdown()
+
+
+def run(latency: float = DEFAULT_STUB_LATENCY, requests: int = DEFAULT_REQUESTS,
+        concurrency: int = DEFAULT_CONCURRENCY, scenarios=None) -> list:
+    """Load-test every scenario with the stub model answering after ``latency`` seconds"""
+    main = load_app(latency)
+    rows = asyncio.run(_run(main, scenarios or list(SCENARIOS), requests, concurrency))
+    for row in rows:
+        row["llm_latency_ms"] = round(latency * 1000, 1)
+    return rows
+
+
+if __name__ == "__main__":
+    print(f"{'endpoint':<18} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'429s':>6} {'errors':>7}")
+    for row in run():
+        print(f"{row['endpoint']:<18} {row['rps']:>8} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+              f"{row['rejected']:>6} {row['errors']:>7}")
@@ -0,0 +1,99 @@
+"""Bulk export benchmark: one /api/exports/bulk call against one
+/api/export-document call per document, as batch tooling did before.
+
+Starts ``uvicorn main:app`` on the stub LLM provider with an empty export
+cache and measures the whole batch over real HTTP, plus the time to the
+first ZIP byte (the archive is streamed as documents finish).
+
+Run from the backend directory:
+    python -m benchmarks.bench_bulk_export
+"""
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_startup import STARTUP_TIMEOUT, _free_port, _wait_for
+from utils.gemini_helper import canned_text
+
+DOCUMENT_COUNTS = [8, 32]
+SECTIONS = 20
+
+
+def make_documents(count: int, tag: str) -> list:
+    return [
+        {
+            "topic": f"Client {tag}-{n}",
+            "docType": "pptx" if n % 2 else "docx",
+            "sections": [{"id": i, "title": f"Section {i}", "content": canned_text(f"{tag}-{n}-{i}")}
+                         for i in range(1, SECTIONS + 1)],
+        }
+        for n in range(count)
+    ]
+
+
+def sequential(client: httpx.Client, documents: list) -> dict:
+    start = time.perf_counter()
+    total_bytes = 0
+    for document in documents:
+        response = client.post("/api/export-document", json=document)
+        response.raise_for_status()
+        total_bytes += len(response.content)
+    return {"seconds": time.perf_counter() - start, "first_byte_seconds": None, "bytes": total_bytes}
+
+
+def bulk(client: httpx.Client, documents: list) -> dict:
+    start = time.perf_counter()
+    first_byte = None
+    total_bytes = 0
+    with client.stream("POST", "/api/exports/bulk", json={"documents": documents}) as response:
+        response.raise_for_status()
+        for chunk in response.iter_bytes():
+            if first_byte is None:
+                first_byte = time.perf_counter() - start
+            total_bytes += len(chunk)
+    return {"seconds": time.perf_counter() - start, "first_byte_seconds": first_byte, "bytes": total_bytes}
+
+
+def run(document_counts=DOCUMENT_COUNTS) -> list:
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, LLM_PROVIDER='stub', LOG_LEVEL='WARNING', PROJECT_STORE_DB=':memory:',
+               EXPORT_CACHE_DIR=tempfile.mkdtemp(prefix='bench-export-cache-'))
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    results = []
+    try:
+        if not _wait_for(base + '/ready', time.perf_counter() + STARTUP_TIMEOUT):
+            raise RuntimeError("Server did not become ready")
+        logging.getLogger("httpx").setLevel(logging.WARNING)  # One INFO line per request otherwise
+        with httpx.Client(base_url=base, timeout=600) as client:
+            for count in document_counts:
+                # Fresh topics and content per mode: both miss the export and render caches
+                for mode, export in (("sequential", sequential), ("bulk", bulk)):
+                    row = export(client, make_documents(count, uuid.uuid4().hex[:8]))
+                    results.append({
+                        "benchmark": f"export_{mode}",
+                        "documents": count,
+                        "seconds": round(row["seconds"], 3),
+                        "first_byte_seconds": round(row["first_byte_seconds"], 3)
+                        if row["first_byte_seconds"] is not None else None,
+                        "bytes": row["bytes"],
+                    })
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+if __name__ == "__main__":
+    for row in run():
+        first_byte = f"  first byte {row['first_byte_seconds']}s" if row["first_byte_seconds"] is not None else ""
+        print(f"{row['benchmark']:<18} {row['documents']:>4} docs  {row['seconds']:>7}s{first_byte}")
@@ -0,0 +1,88 @@
+"""DOCX writers compared: python-docx object model vs direct XML.
+
+For documents of 10 to 1000 sections of synthetic LLM markdown, checks
+that both writers produce the same package (every part byte for byte)
+and reports wall time and peak traced memory of each. python-docx is
+timed with a cold render cache (full render) and a warm one (re-export
+of an unchanged document).
+
+Run from the backend directory:
+    python -m benchmarks.bench_docx_writer
+"""
+import io
+import random
+import time
+import tracemalloc
+import zipfile
+
+from benchmarks.bench_normalizer import make_content
+from utils.docx_generator import generate_docx
+from utils.render_cache import get_render_cache
+
+SECTION_COUNTS = [10, 100, 1000]
+# Content the synthetic sections don't cover: escaping, tabs, whitespace, headings, deep nesting
+EDGE_CASES = [
+    {"title": "Q&A <draft>", "content": "Costs & \"margins\" < 5% > plan\tnext\n\n## Sub heading\n      • deep\n - dash"},
+    {"title": "  padded  ", "content": "  leading space\ntrailing space   \n***both*** and *a* **b**\n\n\n"},
+    {"title": "Empty", "content": ""},
+]
+
+
+def make_sections(count: int, rng: random.Random) -> list:
+    sections = [{"id": i, "title": f"Section {i}", "content": make_content(rng)} for i in range(1, count + 1)]
+    return sections + [{"id": count + n, **case} for n, case in enumerate(EDGE_CASES, 1)]
+
+
+def differing_parts(topic: str, sections: list) -> list:
+    """Package parts whose bytes differ between the two writers (empty = equivalent)"""
+    get_render_cache().clear()
+    packages = [zipfile.ZipFile(io.BytesIO(generate_docx(topic, sections, writer=writer)))
+                for writer in ('python-docx', 'xml')]
+    names = packages[0].namelist()
+    if names != packages[1].namelist():
+        return ['<part list>']
+    return [name for name in names if packages[0].read(name) != packages[1].read(name)]
+
+
+def measure(func, repeat: int) -> dict:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(best, 4), "peak_mb": round(peak / 2 ** 20, 2)}
+
+
+def run(section_counts=SECTION_COUNTS) -> list:
+    rng = random.Random(7)
+    results = []
+    for count in section_counts:
+        sections = make_sections(count, rng)
+        repeat = 3 if count <= 100 else 1
+
+        def python_docx_cold():
+            get_render_cache().clear()
+            generate_docx("Benchmark Document", sections, writer='python-docx')
+
+        generate_docx("Benchmark Document", sections, writer='python-docx')  # Fill the render cache
+        writers = {
+            "python_docx_cold": python_docx_cold,
+            "python_docx_warm": lambda: generate_docx("Benchmark Document", sections, writer='python-docx'),
+            "xml": lambda: generate_docx("Benchmark Document", sections, writer='xml'),
+        }
+        identical = not differing_parts("Benchmark Document", sections)
+        for writer, func in writers.items():
+            results.append({
+                "benchmark": f"docx_{writer}", "sections": count, "identical": identical, **measure(func, repeat)
+            })
+    return results
+
+
+if __name__ == "__main__":
+    for row in run():
+        print(f"{row['benchmark']:<24} {row['sections']:>5}  {row['seconds']:>8}s  {row['peak_mb']:>7} MB"
+              f"  identical={row['identical']}")
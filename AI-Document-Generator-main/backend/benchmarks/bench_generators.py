@@ -0,0 +1,74 @@
+"""Timings for the document generators and their text helpers.
+
+Covers generate_docx, generate_pptx for every theme, parse_content and
+get_icon_for_title over synthetic decks of 5 to 1000 sections. Exports are
+timed with a cold render cache so every slide/section is rendered.
+
+Run from the backend directory:
+    python -m benchmarks.bench_generators
+"""
+import time
+
+from benchmarks.bench_pptx_export import make_sections
+from utils import pptx_generator
+from utils.docx_generator import generate_docx
+from utils.pptx_generator import THEMES, generate_pptx, get_icon_for_title
+from utils.render_cache import get_render_cache
+from utils.text_normalizer import parse_content
+
+DECK_SIZES = [5, 50, 200, 1000]
+
+
+def best_of(func, repeat: int) -> float:
+    """Best wall time of ``repeat`` calls, in seconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def cold(func):
+    """Wrap an export so each call starts with an empty render cache"""
+    def call():
+        get_render_cache().clear()
+        func()
+    return call
+
+
+def run(sizes=DECK_SIZES, themes=None) -> list:
+    results = []
+    for size in sizes:
+        sections = make_sections(size)
+        repeat = 3 if size <= 200 else 1
+
+        seconds = best_of(cold(lambda: generate_docx("Benchmark Document", sections)), repeat)
+        results.append({"benchmark": "generate_docx", "sections": size, "seconds": round(seconds, 4)})
+
+        for theme in themes or THEMES:
+            seconds = best_of(cold(lambda: generate_pptx("Benchmark Deck", sections, theme)), repeat)
+            results.append({
+                "benchmark": "generate_pptx", "sections": size, "theme": theme, "seconds": round(seconds, 4)
+            })
+
+        contents = [section["content"] for section in sections]
+        seconds = best_of(lambda: [parse_content(content) for content in contents], 5)
+        results.append({"benchmark": "parse_content", "sections": size, "seconds": round(seconds, 6)})
+
+        titles = [section["title"] for section in sections]
+
+        def icons():
+            pptx_generator._cached_icon.cache_clear()
+            for title in titles:
+                get_icon_for_title(title)
+
+        seconds = best_of(icons, 5)
+        results.append({"benchmark": "get_icon_for_title", "sections": size, "seconds": round(seconds, 6)})
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'benchmark':<22} {'sections':>8} {'theme':<18} {'seconds':>9}")
+    for row in run():
+        print(f"{row['benchmark']:<22} {row['sections']:>8} {row.get('theme', ''):<18} {row['seconds']:>9}")
@@ -0,0 +1,79 @@
+"""Micro-benchmark for get_icon_for_title.
+
+Compares the precompiled matcher (cold and with the title LRU warm) against
+the old linear substring scan over ICON_MAP, on synthetic decks.
+
+Run from the backend directory:
+    python -m benchmarks.bench_icons
+"""
+import random
+import time
+
+from utils import pptx_generator
+from utils.pptx_generator import ICON_MAP, get_icon_for_title
+
+DECK_SIZES = [100, 1000, 5000]
+FILLER_WORDS = ['plan', 'overview', 'quarterly', 'team', 'update', 'key', 'next', 'steps',
+                'customer', 'journey', 'platform', 'roadmap', 'global', 'product', 'review']
+
+
+def legacy_icon_for_title(title: str) -> str:
+    """The pre-matcher implementation, kept here as the baseline"""
+    title_lower = title.lower()
+    for keyword, icon in ICON_MAP.items():
+        if keyword in title_lower:
+            return icon
+    if any(word in title_lower for word in ['intro', 'start', 'begin', 'welcome']):
+        return '📊'
+    elif any(word in title_lower for word in ['end', 'conclude', 'final', 'summary']):
+        return '🏁'
+    elif any(word in title_lower for word in ['thank', 'questions', 'q&a']):
+        return '🙏'
+    return ''
+
+
+def make_titles(count: int, seed: int = 42) -> list:
+    """Mix of titles with a keyword, several keywords, or none (worst case for a scan)"""
+    rng = random.Random(seed)
+    keywords = list(ICON_MAP)
+    titles = []
+    for i in range(count):
+        words = rng.sample(FILLER_WORDS, 3)
+        for _ in range(rng.choice([0, 0, 1, 2])):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        titles.append(' '.join(words).title() + f' {i}')
+    return titles
+
+
+def time_per_title(func, titles: list, repeat: int = 5) -> float:
+    """Best-of-``repeat`` cost per title in microseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for title in titles:
+            func(title)
+        best = min(best, time.perf_counter() - start)
+    return best / len(titles) * 1e6
+
+
+def run() -> list:
+    results = []
+    for size in DECK_SIZES:
+        titles = make_titles(size)
+        matcher = pptx_generator._icon_matcher
+
+        results.append({
+            "slides": size,
+            "legacy_us": round(time_per_title(legacy_icon_for_title, titles), 3),
+            # Matcher alone, i.e. every title seen for the first time
+            "matcher_cold_us": round(time_per_title(lambda t: matcher.match(t.lower()), titles), 3),
+            # Through the title LRU; decks larger than ICON_CACHE_SIZE partly miss
+            "matcher_warm_us": round(time_per_title(get_icon_for_title, titles), 3),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'slides':>8} {'legacy µs':>10} {'cold µs':>10} {'warm µs':>10}")
+    for row in run():
+        print(f"{row['slides']:>8} {row['legacy_us']:>10} {row['matcher_cold_us']:>10} {row['matcher_warm_us']:>10}")
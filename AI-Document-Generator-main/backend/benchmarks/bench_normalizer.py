@@ -0,0 +1,121 @@
+"""Micro-benchmark for the shared text normalizer.
+
+Compares parse_content against the per-generator text handling it replaced
+(clean_text_formatting plus a line split for slides, a blank-line split for
+documents) and parse_outline against generate_template's old cleanup loop,
+on synthetic LLM markdown of growing size.
+
+Run from the backend directory:
+    python -m benchmarks.bench_normalizer
+"""
+import random
+import re
+import time
+
+from utils.text_normalizer import parse_content, parse_outline
+
+SECTION_COUNTS = [100, 1000, 10000]
+OUTLINE_SIZES = [10, 100, 1000]
+WORDS = ['market', 'growth', 'strategy', 'customer', 'platform', 'risk', 'data', 'model',
+         'revenue', 'team', 'quarter', 'launch', 'cost', 'signal', 'pipeline', 'review']
+
+
+def legacy_clean_text_formatting(text: str) -> str:
+    """The pre-normalizer pptx cleanup, kept here as the baseline"""
+    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
+    text = re.sub(r'\*(.+?)\*', r'\1', text)
+    text = re.sub(r'^[\*\-•]\s*', '', text, flags=re.MULTILINE)
+    return text.strip()
+
+
+def legacy_slide_lines(content: str) -> list:
+    cleaned_content = legacy_clean_text_formatting(content)
+    return [line.strip() for line in cleaned_content.split('\n') if line.strip()]
+
+
+def legacy_document_paragraphs(content: str) -> list:
+    return [para_text.strip() for para_text in content.split('\n\n') if para_text.strip()]
+
+
+def legacy_outline(text: str) -> list:
+    """generate_template's old line cleanup"""
+    clean_lines = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if any(skip_word in line.lower() for skip_word in [
+            'here are', 'these are', 'following', 'presentation',
+            'document', 'titles', 'for an', 'about'
+        ]):
+            continue
+        if line[0].isdigit() and ('.' in line or ')' in line):
+            line = line.split('.', 1)[-1].split(')', 1)[-1].strip()
+        line = line.lstrip('*-•').strip()
+        if len(line.split()) <= 15:
+            clean_lines.append(line)
+    return clean_lines
+
+
+def make_content(rng: random.Random) -> str:
+    """A section as Gemini writes it: bullets with bold leads, some nesting, a closing paragraph"""
+    def sentence(n):
+        return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+    lines = []
+    for _ in range(rng.randint(4, 6)):
+        lines.append(f"• **{sentence(2).title()}**: {sentence(10)} *{sentence(2)}* {sentence(4)}.")
+        if rng.random() < 0.3:
+            lines.append(f"  • {sentence(8)}.")
+    lines.append('')
+    lines.append(f"{sentence(20)}.\n{sentence(15)}.")
+    return '\n'.join(lines)
+
+
+def make_outline(count: int, rng: random.Random) -> str:
+    lines = ["Here are the titles for your presentation:", ""]
+    for i in range(1, count + 1):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        lines.append(rng.choice([f"{i}. {title}", f"- {title}", f"**{title}**", title]))
+    return '\n'.join(lines)
+
+
+def best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(section_counts=SECTION_COUNTS, outline_sizes=OUTLINE_SIZES) -> list:
+    rng = random.Random(42)
+    results = []
+    for count in section_counts:
+        contents = [make_content(rng) for _ in range(count)]
+        repeat = 5 if count <= 1000 else 2
+        results.append({
+            "benchmark": "section_content",
+            "sections": count,
+            "legacy_slide_seconds": round(best_of(lambda: [legacy_slide_lines(c) for c in contents], repeat), 5),
+            "legacy_document_seconds": round(
+                best_of(lambda: [legacy_document_paragraphs(c) for c in contents], repeat), 5
+            ),
+            "normalizer_seconds": round(best_of(lambda: [parse_content(c) for c in contents], repeat), 5),
+        })
+    for size in outline_sizes:
+        outline = make_outline(size, rng)
+        results.append({
+            "benchmark": "outline",
+            "sections": size,
+            "legacy_seconds": round(best_of(lambda: legacy_outline(outline), 20), 6),
+            "normalizer_seconds": round(best_of(lambda: parse_outline(outline), 20), 6),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for row in run():
+        timings = '  '.join(f"{key}={value}" for key, value in row.items() if key.endswith('seconds'))
+        print(f"{row['benchmark']:<16} {row['sections']:>6}  {timings}")
@@ -0,0 +1,78 @@
+"""Export latency and allocation benchmark for generate_pptx.
+
+Times 5-, 50- and 500-slide decks for every theme with a cold render
+cache, records the peak traced allocation of one export, and times an
+incremental re-export after one section was edited.
+
+Run from the backend directory:
+    python -m benchmarks.bench_pptx_export
+"""
+import time
+import tracemalloc
+
+from utils.pptx_generator import THEMES, generate_pptx
+from utils.render_cache import get_render_cache
+
+DECK_SIZES = [5, 50, 500]
+SLIDE_CONTENT = "\n".join(
+    f"• **Point {n}**: a concise, presentation-friendly statement about the topic"
+    for n in range(1, 6)
+)
+
+
+def make_sections(count: int) -> list:
+    titles = ['Introduction', 'Market Analysis', 'Machine Learning Data', 'Risks', 'Conclusion']
+    return [
+        {"id": i, "title": f"{titles[i % len(titles)]} {i}", "content": SLIDE_CONTENT}
+        for i in range(1, count + 1)
+    ]
+
+
+def measure(sections: list, theme: str, repeat: int) -> dict:
+    generate_pptx("Warm-up", sections[:1], theme)
+
+    render_cache = get_render_cache()
+
+    best = float('inf')
+    for _ in range(repeat):
+        render_cache.clear()
+        start = time.perf_counter()
+        generate_pptx("Benchmark Deck", sections, theme)
+        best = min(best, time.perf_counter() - start)
+
+    render_cache.clear()
+    tracemalloc.start()
+    generate_pptx("Benchmark Deck", sections, theme)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Every slide is cached now; edit one section and export again
+    edited = [dict(section) for section in sections]
+    edited[len(edited) // 2]["content"] = "Edited during refinement"
+    start = time.perf_counter()
+    generate_pptx("Benchmark Deck", edited, theme)
+    incremental = time.perf_counter() - start
+
+    return {
+        "seconds": round(best, 4),
+        "peak_alloc_mb": round(peak / 1e6, 2),
+        "incremental_seconds": round(incremental, 4)
+    }
+
+
+def run(themes=None, sizes=DECK_SIZES) -> list:
+    results = []
+    for size in sizes:
+        sections = make_sections(size)
+        for theme in themes or THEMES:
+            row = {"slides": size, "theme": theme}
+            row.update(measure(sections, theme, repeat=3 if size < 500 else 1))
+            results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    print(f"{'slides':>7} {'theme':<18} {'seconds':>9} {'peak MB':>9} {'1 edit s':>9}")
+    for row in run(themes=['professional_blue']):
+        print(f"{row['slides']:>7} {row['theme']:<18} {row['seconds']:>9} "
+              f"{row['peak_alloc_mb']:>9} {row['incremental_seconds']:>9}")
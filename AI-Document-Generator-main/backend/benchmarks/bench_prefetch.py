@@ -0,0 +1,78 @@
+"""Perceived generation latency with and without speculative pre-generation.
+
+Replays the common path: /api/generate-template, a pause while the user
+reads and confirms the outline, then the /api/generate-document call that
+GenerateContent.jsx makes (packed). With ``prefetch`` the sections are
+generated in the background during the pause, so the last call is served
+from the LLM cache. Reports the latency of that call, the one the user
+waits for, and the speculative tokens spent.
+
+Run from the backend directory:
+    python -m benchmarks.bench_prefetch
+"""
+import asyncio
+import logging
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_api import load_app
+
+SECTION_COUNTS = [5, 10]
+STUB_LATENCY = 0.05
+TOKEN_LATENCY = 0.005              # Seconds per output token: a section takes about half a second
+THINK_SECONDS = 3.0                # The user looking over the outline
+
+
+async def _journey(client: httpx.AsyncClient, sections: int, prefetch: bool) -> float:
+    topic = f"Benchmark topic {uuid.uuid4().hex[:8]}"
+    response = await client.post("/api/generate-template", params={
+        "topic": topic, "doc_type": "pptx", "num_sections": sections, "prefetch": prefetch
+    })
+    response.raise_for_status()
+    outline = response.json()["sections"]
+    await asyncio.sleep(THINK_SECONDS)
+
+    start = time.perf_counter()
+    response = await client.post("/api/generate-document", json={
+        "topic": topic, "docType": "pptx", "packed": True,
+        "sections": [{"id": s["id"], "title": s["title"]} for s in outline]
+    })
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed
+
+
+async def _run(main, section_counts) -> list:
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            results = []
+            for sections in section_counts:
+                row = {"benchmark": "outline_to_content", "sections": sections}
+                for mode, prefetch in (("cold", False), ("prefetch", True)):
+                    spent = main.prefetcher.tokens_spent
+                    row[f"{mode}_ms"] = round(await _journey(client, sections, prefetch) * 1000, 2)
+                    if prefetch:
+                        row["speculative_tokens"] = main.prefetcher.tokens_spent - spent
+                results.append(row)
+            return results
+    finally:
+        root.setLevel(level)
+        main.prefetcher.cancel_all()
+
+
+def run(section_counts=SECTION_COUNTS) -> list:
+    main = load_app(STUB_LATENCY)
+    main.llm_provider.token_latency = TOKEN_LATENCY
+    return asyncio.run(_run(main, section_counts))
+
+
+if __name__ == "__main__":
+    print(f"{'sections':>8} {'cold ms':>9} {'prefetch ms':>12} {'speculative tokens':>19}")
+    for row in run():
+        print(f"{row['sections']:>8} {row['cold_ms']:>9} {row['prefetch_ms']:>12} {row['speculative_tokens']:>19}")
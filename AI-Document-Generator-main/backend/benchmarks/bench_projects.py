@@ -0,0 +1,64 @@
+"""Request size and parse cost: resending a whole document vs a section delta.
+
+For documents of growing size, compares the JSON body of an
+/api/export-document call (every section with its content) with the body
+of a PATCH /api/projects/{id}/sections/{sid} editing one section, and
+times parsing each into its request model plus applying the delta to an
+in-memory project store.
+
+Run from the backend directory:
+    python -m benchmarks.bench_projects
+"""
+import json
+import os
+import time
+
+from utils.gemini_helper import canned_text
+from utils.project_store import ProjectStore
+
+SECTION_COUNTS = [10, 100, 1000]
+
+
+def best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(section_counts=SECTION_COUNTS) -> list:
+    os.environ.setdefault('PROJECT_STORE_DB', ':memory:')  # Importing main opens the project store
+    from main import ExportRequest, SectionPatch
+
+    results = []
+    for count in section_counts:
+        sections = [{"id": i, "title": f"Section {i}", "content": canned_text(str(i))} for i in range(1, count + 1)]
+        full_body = json.dumps({"topic": "Benchmark document", "docType": "docx", "sections": sections})
+        patch_body = json.dumps({"version": 1, "content": canned_text("edited")})
+
+        store = ProjectStore(':memory:')
+        project_id = store.create("Benchmark document", "docx", None, sections)["id"]
+        versions = iter(range(1, 1_000_000))
+
+        def apply_patch():
+            patch = SectionPatch.model_validate_json(patch_body)
+            store.update_section(project_id, count // 2 + 1, next(versions), content=patch.content)
+
+        repeat = 20 if count <= 100 else 5
+        results.append({
+            "benchmark": "edit_request",
+            "sections": count,
+            "full_request_bytes": len(full_body),
+            "patch_request_bytes": len(patch_body),
+            "full_parse_seconds": round(best_of(lambda: ExportRequest.model_validate_json(full_body), repeat), 6),
+            "patch_apply_seconds": round(best_of(apply_patch, repeat), 6),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for row in run():
+        print(f"{row['sections']:>5} sections  request {row['full_request_bytes']:>9} B -> {row['patch_request_bytes']} B"
+              f"  parse {row['full_parse_seconds']}s -> parse+store {row['patch_apply_seconds']}s")
@@ -0,0 +1,86 @@
+"""Refining one bullet of a long section: the whole section vs just that span.
+
+For sections of growing size, sends /api/refine-section an instruction
+about one bullet, once as a full refinement and once with ``partial`` so
+only the bullet (plus a line of context) goes to the model. The stub
+provider charges time per output token, like a real model's decoding, so
+latency follows how much text is regenerated. Reports latency, prompt
+size and the tokens the span refinement saved.
+
+Run from the backend directory:
+    python -m benchmarks.bench_refine
+"""
+import asyncio
+import logging
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_api import load_app
+
+BULLET_COUNTS = [5, 20, 80]
+STUB_LATENCY = 0.05
+TOKEN_LATENCY = 0.002              # Seconds per output token
+REPEAT = 3
+INSTRUCTION = "Make the third bullet shorter and more concrete"
+
+
+def make_section(bullets: int, tag: str) -> str:
+    lines = [
+        f"• **Point {i} ({tag})**: the plan for growth area {i} covers pricing, channel mix, hiring "
+        f"and the quarterly milestones the team has committed to."
+        for i in range(1, bullets + 1)
+    ]
+    return '\n'.join(lines) + "\n\nOverall, these priorities keep the roadmap focused on measurable outcomes."
+
+
+async def _time(client: httpx.AsyncClient, body: dict) -> tuple:
+    start = time.perf_counter()
+    response = await client.post("/api/refine-section", json=body)
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed, response.json()
+
+
+async def _run(main, bullet_counts) -> list:
+    root = logging.getLogger()
+    level = root.level
+    root.setLevel(logging.WARNING)
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            results = []
+            for bullets in bullet_counts:
+                row = {"benchmark": "refine_one_bullet", "sections": bullets}
+                for mode, partial in (("full", False), ("span", True)):
+                    best, data = float('inf'), None
+                    for _ in range(REPEAT):
+                        # Unique content each call so the LLM cache never answers
+                        content = make_section(bullets, uuid.uuid4().hex[:8])
+                        elapsed, data = await _time(client, {
+                            "currentContent": content, "instruction": INSTRUCTION, "partial": partial
+                        })
+                        best = min(best, elapsed)
+                    row["section_chars"] = len(content)
+                    row[f"{mode}_ms"] = round(best * 1000, 2)
+                    if mode == "span":
+                        row["span_mode"] = data["mode"]
+                        row["tokens_saved"] = data["tokensSaved"]
+                results.append(row)
+            return results
+    finally:
+        root.setLevel(level)
+
+
+def run(bullet_counts=BULLET_COUNTS) -> list:
+    main = load_app(STUB_LATENCY)
+    main.llm_provider.token_latency = TOKEN_LATENCY
+    return asyncio.run(_run(main, bullet_counts))
+
+
+if __name__ == "__main__":
+    print(f"{'bullets':>7} {'chars':>7} {'full ms':>9} {'span ms':>9} {'mode':>5} {'tokens saved':>13}")
+    for row in run():
+        print(f"{row['sections']:>7} {row['section_chars']:>7} {row['full_ms']:>9} {row['span_ms']:>9} "
+              f"{row['span_mode']:>5} {row['tokens_saved']:>13}")
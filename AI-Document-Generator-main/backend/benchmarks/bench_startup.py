@@ -0,0 +1,108 @@
+"""Cold-start benchmark: import-time breakdown and time to first healthy response.
+
+Starts ``uvicorn main:app`` in a fresh process and polls ``/`` (port bound
+and answering) and ``/ready`` (warm-up finished), and lists the slowest
+imports of ``main`` as reported by ``python -X importtime``.
+
+Run from the backend directory:
+    python -m benchmarks.bench_startup
+"""
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+POLL_INTERVAL = 0.01
+STARTUP_TIMEOUT = 120.0
+TOP_IMPORTS = 12
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)')
+
+
+def import_report(top: int = TOP_IMPORTS) -> list:
+    """Slowest imports of ``main`` (direct children and theirs), by cumulative seconds"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import main'],
+        capture_output=True, text=True, env=_env()
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match and len(match.group(3)) <= 5:  # main is at depth 1, its imports at 2 and 3
+            rows.append({"module": match.group(4), "cumulative_seconds": int(match.group(2)) / 1e6})
+    rows.sort(key=lambda row: row["cumulative_seconds"], reverse=True)
+    return rows[:top]
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    env.setdefault('PROJECT_STORE_DB', ':memory:')
+    return env
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(POLL_INTERVAL)
+    return False
+
+
+def time_to_ready(ready_path: str = '/ready') -> dict:
+    """Seconds from process start until ``/`` and then ``ready_path`` answer 200"""
+    port = _free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port), '--log-level', 'warning'],
+        env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start + STARTUP_TIMEOUT
+        healthy = time.perf_counter() - start if _wait_for(base + '/', deadline) else None
+        ready = time.perf_counter() - start if _wait_for(base + ready_path, deadline) else None
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "benchmark": "cold_start",
+        "first_healthy_seconds": round(healthy, 3) if healthy is not None else None,
+        "ready_seconds": round(ready, 3) if ready is not None else None,
+    }
+
+
+def run(repeat: int = 3) -> list:
+    runs = [time_to_ready() for _ in range(repeat)]
+    healthy = [r["first_healthy_seconds"] for r in runs if r["first_healthy_seconds"] is not None]
+    ready = [r["ready_seconds"] for r in runs if r["ready_seconds"] is not None]
+    results = [{
+        "benchmark": "cold_start",
+        "first_healthy_seconds": min(healthy) if healthy else None,
+        "ready_seconds": min(ready) if ready else None,
+    }]
+    for row in import_report():
+        results.append({"benchmark": "import", "module": row["module"],
+                        "cumulative_seconds": round(row["cumulative_seconds"], 4)})
+    return results
+
+
+if __name__ == "__main__":
+    for row in run():
+        if row["benchmark"] == "cold_start":
+            print(f"first healthy response: {row['first_healthy_seconds']}s, ready: {row['ready_seconds']}s")
+        else:
+            print(f"  {row['module']:<45} {row['cumulative_seconds']:>8}s")
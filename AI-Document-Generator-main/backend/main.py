@@ -1,24 +1,162 @@
-from fastapi import FastAPI, HTTPException
+import time
+IMPORT_STARTED = time.perf_counter()  # Module import time goes into the startup report
+
+if __name__ == "__main__":
+    # `python main.py` hands over to `python -m uvicorn main:app`. Spawned export
+    # workers re-run the __main__ file, and this one would build the whole app
+    # (LLM clients, project store, caches) in every worker; uvicorn's isn't re-run.
+    import os
+    import sys
+    print("\n" + "="*60)
+    print("🚀 AI DOCUMENT GENERATOR API")
+    print("="*60)
+    print(f"📍 Server: http://localhost:8000")
+    print(f"📖 Docs: http://localhost:8000/docs")
+    print("="*60 + "\n", flush=True)
+    os.execv(sys.executable, [
+        sys.executable, "-m", "uvicorn", "main:app", "--host", "localhost", "--port", "8000",
+        "--app-dir", os.path.dirname(os.path.abspath(__file__))
+    ])
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Optional
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-import io
-import traceback
+import json
+import asyncio
+import logging
+import math
+import uuid
+from starlette.routing import Match
 
-from utils.docx_generator import generate_docx
-from utils.pptx_generator import generate_pptx
+from utils.export_engine import ExportEngine, ExportQueueFullError
+from utils.export_cache import ExportCache, export_cache_key, etag_matches
+from utils.export_jobs import ExportJobs, ExportStore
+from utils.gemini_helper import (
+    DEFAULT_MODEL, GeminiClient, LLMRateLimitError, LLMTimeoutError, ClientDisconnectedError, get_provider,
+    run_until_disconnect
+)
+from utils.llm_cache import LLMCache
+from utils.logging_setup import configure_logging, log_payload, request_id_var, start_request
+from utils.metrics import (
+    EXPORTS, EXPORT_BYTES, HTTP_REQUEST_LATENCY, HTTP_REQUESTS_IN_FLIGHT, PACKED_SECTIONS, REFINE_REQUESTS,
+    REFINE_TOKENS_SAVED, STAGE_LATENCY, CacheStatsCollector, EngineCollector, register_collector, render_metrics, stage_timer
+)
+from utils.prefetch import Prefetcher
+from utils.project_store import ProjectNotFoundError, ProjectStore, VersionConflictError
+from utils.prompts import (
+    build_section_prompt, build_packed_sections_prompt, build_refine_prompt, build_span_refine_prompt,
+    parse_packed_sections
+)
+from utils.rate_limiter import estimate_tokens
+from utils.span_refine import context, resolve_span, splice
+from utils.text_normalizer import parse_outline
+from utils.zip_stream import ZipStream
 
 load_dotenv()
 
-# Initialize Gemini
-genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-model = genai.GenerativeModel('gemini-2.5-flash-lite')
+# Structured logs (LOG_LEVEL, LOG_FORMAT, LOG_PAYLOAD_SAMPLE_RATE), written off the event loop
+configure_logging()
+logger = logging.getLogger("api")
+
+# Initialize the LLM provider (LLM_PROVIDER=gemini, or stub for offline runs)
+llm_provider = get_provider()
+llm_cache = LLMCache()
+_llm_clients = {}  # model name -> client
 
-app = FastAPI()
+def llm_client(model_name: str) -> GeminiClient:
+    """One client per model, so routes sharing a model share its concurrency limit"""
+    if model_name not in _llm_clients:
+        _llm_clients[model_name] = GeminiClient(model_name, cache=llm_cache, provider=llm_provider)
+    return _llm_clients[model_name]
+
+# Model per request type, e.g. a lighter one for outline titles
+outline_llm = llm_client(os.getenv('LLM_MODEL_OUTLINE', DEFAULT_MODEL))
+section_llm = llm_client(os.getenv('LLM_MODEL_SECTION', DEFAULT_MODEL))
+refine_llm = llm_client(os.getenv('LLM_MODEL_REFINE', DEFAULT_MODEL))
+
+# Max sections generated in parallel by one /api/generate-document call
+DOCUMENT_CONCURRENCY = int(os.getenv('DOCUMENT_CONCURRENCY', 5))
+# Sections per Gemini call when generate-document is asked for packed mode
+DOCUMENT_PACK_SIZE = max(int(os.getenv('DOCUMENT_PACK_SIZE', 5)), 1)
+
+# DOCX/PPTX rendering runs on warm worker processes (EXPORT_WORKERS, EXPORT_QUEUE_LIMIT)
+export_engine = ExportEngine()
+export_jobs = ExportJobs(export_engine, ExportStore())
+export_cache = ExportCache()
+EXPORT_CHUNK_SIZE = 64 * 1024
+# /api/exports/bulk: documents per request, and how many render at once
+# (default: one per export worker, leaving the queue to single exports)
+BULK_EXPORT_MAX_DOCUMENTS = int(os.getenv('BULK_EXPORT_MAX_DOCUMENTS', 100))
+BULK_EXPORT_CONCURRENCY = int(os.getenv('BULK_EXPORT_CONCURRENCY', 0)) or max(export_engine.max_workers, 1)
+BULK_EXPORT_RETRY_DELAY = 0.5  # Seconds a bulk document waits when the export queue is full
+
+# Cache and queue gauges are read from these objects on each /metrics scrape
+register_collector(CacheStatsCollector({"llm": llm_cache, "export": export_cache}))
+register_collector(EngineCollector(export_engine))
+
+# Server-side projects, so clients send section deltas instead of whole documents
+project_store = ProjectStore()
+
+# Section content generated speculatively (low priority, budget-capped) once
+# generate-template has produced an outline (PREFETCH_TPM, PREFETCH_*)
+prefetcher = Prefetcher(section_llm)
+
+# ============ STARTUP ============
+# The port binds right after import; the Gemini SDK import and the export
+# workers warm up in the background. "/" answers at once (liveness),
+# /ready only after warm-up (readiness).
+startup_report = {
+    "ready": False,
+    "importSeconds": round(time.perf_counter() - IMPORT_STARTED, 3),
+    "warmup": {},
+}
+
+def _timed_step(name: str, step):
+    started_at = time.perf_counter()
+    step()
+    startup_report["warmup"][name] = round(time.perf_counter() - started_at, 3)
+
+def _load_llm_models():
+    for client in _llm_clients.values():
+        client.model  # Creating the model imports and configures the SDK
+
+async def warm_up():
+    """Import the LLM SDK and start the export workers, then flip /ready"""
+    started_at = time.perf_counter()
+    try:
+        await asyncio.gather(
+            asyncio.to_thread(_timed_step, "llmSeconds", _load_llm_models),
+            asyncio.to_thread(_timed_step, "exportWorkersSeconds", export_engine.start),
+        )
+    except Exception as e:
+        startup_report["error"] = str(e)
+        logger.exception("Warm-up failed")
+        return
+    startup_report["warmupSeconds"] = round(time.perf_counter() - started_at, 3)
+    startup_report["readySeconds"] = round(time.perf_counter() - IMPORT_STARTED, 3)
+    startup_report["ready"] = True
+    logger.info("Warm-up finished", extra={
+        **startup_report, "provider": llm_provider.name,
+        "models": {"outline": outline_llm.model_name, "section": section_llm.model_name, "refine": refine_llm.model_name}
+    })
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm up in the background while serving; stop speculation and the export workers on shutdown"""
+    warmup_task = asyncio.create_task(warm_up())
+    try:
+        yield
+    finally:
+        warmup_task.cancel()
+        prefetcher.cancel_all()
+        export_engine.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 # Enable CORS
@@ -32,8 +170,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Export-Cache", "Content-Disposition", "X-Request-ID", "Retry-After"],
 )
 
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    """Request id for the logs, per-route latency histogram and in-flight gauge"""
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+    token = start_request(request_id)
+    route = route_label(request)
+    in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(route)
+    in_flight.inc()
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        in_flight.dec()
+        # Streaming responses are timed to their headers, not to the last byte
+        elapsed = time.perf_counter() - started_at
+        HTTP_REQUEST_LATENCY.labels(request.method, route, str(status)).observe(elapsed)
+        logger.info("Request finished", extra={
+            "method": request.method, "route": route, "status": status, "durationMs": round(elapsed * 1000, 1)
+        })
+        request_id_var.reset(token)
+
 # ============ MODELS ============
 class Section(BaseModel):
     id: int
@@ -50,9 +214,30 @@ class GenerateSectionRequest(BaseModel):
     sectionTitle: str
     docType: str
 
+class DocumentSection(BaseModel):
+    id: int
+    title: str
+    content: Optional[str] = ""
+
+class GenerateDocumentRequest(BaseModel):
+    topic: str
+    docType: str
+    sections: List[DocumentSection]
+    retryIds: Optional[List[int]] = None  # Only regenerate these sections
+    packed: bool = False  # Several sections per Gemini call (DOCUMENT_PACK_SIZE)
+
+class OutlineUpdate(BaseModel):
+    topic: str
+    titles: List[str]
+
 class RefineRequest(BaseModel):
     currentContent: str
     instruction: str
+    # Rewrite only part of the content (widened to whole lines): a [start, end)
+    # character range, the text itself, or partial=true to let the server guess
+    targetSpan: Optional[List[int]] = None
+    targetText: Optional[str] = None
+    partial: bool = False
 
 class ExportRequest(BaseModel):
     topic: str
@@ -60,141 +245,643 @@ class ExportRequest(BaseModel):
     docType: str
     theme: Optional[str] = "professional_blue"
 
+class BulkExportRequest(BaseModel):
+    documents: List[ExportRequest]
+
+class CreateProjectRequest(BaseModel):
+    topic: str
+    docType: str
+    theme: Optional[str] = "professional_blue"
+    sections: List[DocumentSection]
+
+class UpdateProjectRequest(BaseModel):
+    version: int  # Project version the change is based on
+    topic: Optional[str] = None
+    docType: Optional[str] = None
+    theme: Optional[str] = None
+
+class SectionPatch(BaseModel):
+    version: int  # Section version the change is based on
+    title: Optional[str] = None
+    content: Optional[str] = None
+
+class NewSection(BaseModel):
+    title: str
+    content: Optional[str] = ""
+
+class ProjectGenerateRequest(BaseModel):
+    retryIds: Optional[List[int]] = None  # Only regenerate these sections
+    packed: bool = False
+
+class ProjectRefineRequest(BaseModel):
+    instruction: str
+    version: Optional[int] = None  # Fail with 409 if the section has changed since
+    targetSpan: Optional[List[int]] = None  # As in RefineRequest
+    targetText: Optional[str] = None
+    partial: bool = False
+
+# ============ HELPERS ============
+
+def route_label(request: Request) -> str:
+    """Route template (e.g. /api/exports/{job_id}) so metrics stay low-cardinality"""
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+def project_error(e: Exception) -> JSONResponse:
+    """404 for unknown projects/sections, 409 with the current version for stale updates"""
+    if isinstance(e, VersionConflictError):
+        return JSONResponse(status_code=409, content={"detail": str(e), "currentVersion": e.current_version})
+    return JSONResponse(status_code=404, content={"detail": str(e)})
+
+def quota_exceeded(e: LLMRateLimitError) -> HTTPException:
+    """503 with Retry-After, so clients back off instead of retrying straight away"""
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+def plan_refine(content: str, request):
+    """(prompt, span) for a refine request; span is None when the whole content goes to the model.
+
+    Raises ValueError for a target outside the content.
+    """
+    span = resolve_span(content, request.instruction, request.targetSpan, request.targetText, request.partial)
+    if span is None:
+        return build_refine_prompt(content, request.instruction), None
+    before, after = context(content, span)
+    return build_span_refine_prompt(content[span.start:span.end], request.instruction, before, after), span
+
+def refine_result(content: str, instruction: str, prompt: str, span, refined: str) -> dict:
+    """Refine response: the whole refined content, plus the rewritten range and tokens saved in span mode"""
+    if span is None:
+        REFINE_REQUESTS.labels("full").inc()
+        return {"refinedContent": refined, "mode": "full", "tokensSaved": 0}
+    
+    # Estimated like the rate limiter does: prompt plus an answer as long as the text rewritten
+    full_tokens = estimate_tokens(build_refine_prompt(content, instruction), len(content) // 4)
+    span_tokens = estimate_tokens(prompt, len(refined) // 4)
+    tokens_saved = max(full_tokens - span_tokens, 0)
+    REFINE_REQUESTS.labels("span").inc()
+    REFINE_TOKENS_SAVED.inc(tokens_saved)
+    refined_content, new_span = splice(content, span, refined)
+    return {
+        "refinedContent": refined_content,
+        "mode": "span",
+        "span": [new_span.start, new_span.end],
+        "tokensSaved": tokens_saved
+    }
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def iter_file_chunks(file, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Yield a file in fixed-size chunks, closing it when done"""
+    try:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        file.close()
+
+def sections_to_dicts(sections) -> list:
+    """Plain dicts for the generators; works for Pydantic objects & dicts"""
+    sections_data = []
+    for s in sections:
+        if isinstance(s, dict):  # frontend
+            sections_data.append({
+                "id": s.get("id"),
+                "title": s.get("title"),
+                "content": s.get("content")
+            })
+        else:  # Pydantic Section
+            sections_data.append({
+                "id": s.id,
+                "title": s.title,
+                "content": s.content
+            })
+    return sections_data
+
+def export_file_info(doc_type: str, topic: str):
+    """Download filename and media type for an export"""
+    if doc_type == "docx":
+        filename = f"{topic.replace(' ', '_')}.docx"
+        media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+    else:  # pptx
+        filename = f"{topic.replace(' ', '_')}.pptx"
+        media_type = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+    return filename, media_type
+
+def unique_names(names: list) -> list:
+    """Make archive member names unique: "Report.docx", "Report (2).docx", ..."""
+    seen = set()
+    unique = []
+    for name in names:
+        stem, dot, suffix = name.rpartition('.')
+        candidate, n = name, 1
+        while candidate in seen:
+            n += 1
+            candidate = f"{stem} ({n}).{suffix}" if dot else f"{name} ({n})"
+        seen.add(candidate)
+        unique.append(candidate)
+    return unique
+
+async def render_export(doc_type: str, topic: str, theme: str, sections_data: list, cache_key: str,
+                        operation: str):
+    """Open an export from the cache, rendering it on the export workers on a miss.
+
+    Returns (file, size, cache_status) with ``file`` open for reading.
+    """
+    with stage_timer(operation, "cache_lookup"):
+        cached = export_cache.lookup(cache_key)
+    cache_status = "HIT" if cached else "MISS"
+    if cached is None:
+        # Render on the export workers into a temp file, then keep it in the cache
+        with stage_timer(operation, "render"):
+            path, size = await export_engine.render(doc_type, topic, sections_data, theme)
+        cached = export_cache.add(cache_key, path, size)
+    file, size = cached
+    EXPORTS.labels(doc_type, cache_status.lower()).inc()
+    EXPORT_BYTES.labels(doc_type).inc(size)
+    return file, size, cache_status
+
+async def export_response(doc_type: str, topic: str, theme: str, sections_data: list, http_request: Request,
+                          operation: str):
+    """The rendered file as a chunked download, or 304 if the client's If-None-Match still matches"""
+    filename, media_type = export_file_info(doc_type, topic)
+
+    # Same inputs render the same file: the content hash doubles as ETag
+    cache_key = export_cache_key(doc_type, theme, topic, sections_data)
+    etag = f'"{cache_key}"'
+    if etag_matches(http_request.headers.get("if-none-match"), etag):
+        export_cache.not_modified += 1
+        EXPORTS.labels(doc_type, "not_modified").inc()
+        return Response(status_code=304, headers={"ETag": etag, "X-Export-Cache": "HIT"})
+
+    file, size, cache_status = await render_export(doc_type, topic, theme, sections_data, cache_key, operation)
+    logger.info("Export ready", extra={"cache": cache_status, "bytes": size})
+
+    # Send file in fixed-size chunks
+    return StreamingResponse(
+        iter_file_chunks(file),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(size),
+            "ETag": etag,
+            "X-Export-Cache": cache_status
+        }
+    )
+
+def wants_fresh(http_request: Request) -> bool:
+    """True when the client sent 'Cache-Control: no-cache' to bypass the LLM cache"""
+    return "no-cache" in http_request.headers.get("cache-control", "").lower()
+
+def stream_llm_events(llm: GeminiClient, prompt: str, result_key: str, use_cache: bool = True, finish=None):
+    """Stream LLM chunks as SSE 'chunk' events, ending with a 'done' event.
+
+    ``finish(text)``, if given, builds the 'done' payload from the whole answer.
+    """
+    async def events():
+        parts = []
+        try:
+            async for text in llm.stream(prompt, use_cache=use_cache):
+                parts.append(text)
+                yield sse_event("chunk", {"text": text})
+            text = "".join(parts).strip()
+            yield sse_event("done", finish(text) if finish else {result_key: text})
+        except LLMRateLimitError as e:
+            logger.warning("Streaming throttled", extra={"retryAfter": e.retry_after})
+            yield sse_event("error", {"detail": str(e), "retryAfter": math.ceil(e.retry_after)})
+        except Exception as e:
+            logger.warning("Streaming failed", extra={"error": str(e)})
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ============ ROUTES ============
 
 @app.api_route("/", methods=["GET", "HEAD"])
 def read_root():
     return {"message": "🚀 AI Document Generator API is running!"}
 
-@app.post("/api/generate-section")
-async def generate_section(request: GenerateSectionRequest):
-    """Generate content for a single section"""
-    try:
-        print(f"Generating content for: {request.sectionTitle}")
-        
-        if request.docType == "docx":
-            prompt = f"""
-You are writing a section for a professional document about: {request.topic}
+@app.get("/ready")
+def ready():
+    """Readiness: 503 until warm-up has finished, with the startup timings either way"""
+    return JSONResponse(startup_report, status_code=200 if startup_report["ready"] else 503)
 
-Section Title: {request.sectionTitle}
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
-Write detailed, well-structured content for this section (3-4 paragraphs).
-Make it professional, informative, and engaging.
-Use clear language and proper formatting.
-Do not include the section title in your response.
-"""
-        else:  # pptx
-            prompt = f"""
-You are creating content for a PowerPoint slide about: {request.topic}
+@app.get("/api/llm-cache/stats")
+def llm_cache_stats():
+    """LLM cache hit/miss counters and size, calls saved by single flight, and quota limiter state"""
+    return {
+        **llm_cache.stats(),
+        "singleFlight": {name: client.single_flight_stats() for name, client in _llm_clients.items()},
+        "quota": {name: client.limiter.stats() for name, client in _llm_clients.items()},
+    }
 
-Slide Title: {request.sectionTitle}
+@app.get("/api/export-cache/stats")
+def export_cache_stats():
+    """Hit/miss counters and size of the rendered-export cache"""
+    return export_cache.stats()
 
-Write concise, impactful content for this slide (4-6 bullet points).
-Keep it brief and presentation-friendly.
-Each point should be clear and actionable.
-Do not include the slide title in your response.
-Format as bullet points using • symbol.
-"""
+@app.post("/api/generate-section")
+async def generate_section(request: GenerateSectionRequest, http_request: Request):
+    """Generate content for a single section"""
+    try:
+        logger.info("Generating section", extra={
+            "docType": request.docType, "topicChars": len(request.topic), "titleChars": len(request.sectionTitle)
+        })
+        
+        with stage_timer("generate_section", "prompt_build"):
+            prompt = build_section_prompt(request.topic, request.sectionTitle, request.docType)
+        use_cache = not wants_fresh(http_request)
+        if use_cache:
+            prefetcher.claim(request.topic, request.docType, request.sectionTitle)
         
-        response = model.generate_content(prompt)
-        content = response.text.strip()
+        with stage_timer("generate_section", "llm_wait"):
+            content = await section_llm.generate(prompt, request=http_request, use_cache=use_cache)
         
-        print(f"Content generated successfully for: {request.sectionTitle}")
+        logger.info("Section generated", extra={"contentChars": len(content)})
+        log_payload(logger, "Section payload", topic=request.topic, title=request.sectionTitle, content=content)
         return {"content": content}
     
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMRateLimitError as e:
+        raise quota_exceeded(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
-        print(f"Error generating section: {e}")
-        traceback.print_exc()
+        logger.exception("Error generating section")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/refine-section")
-async def refine_section(request: RefineRequest):
-    """Refine existing content based on user instruction"""
-    try:
-        print(f"Refining content with instruction: {request.instruction}")
+@app.post("/api/generate-section/stream")
+async def generate_section_stream(request: GenerateSectionRequest, http_request: Request):
+    """Stream content for a single section as server-sent events"""
+    logger.info("Streaming section", extra={"docType": request.docType, "titleChars": len(request.sectionTitle)})
+    prompt = build_section_prompt(request.topic, request.sectionTitle, request.docType)
+    use_cache = not wants_fresh(http_request)
+    if use_cache:
+        prefetcher.claim(request.topic, request.docType, request.sectionTitle)  # Stops it if still queued
+    return stream_llm_events(section_llm, prompt, "content", use_cache=use_cache)
+
+async def generate_contents(topic: str, doc_type: str, targets: list, packed: bool, use_cache: bool):
+    """Generate content for ``targets`` (dicts with id and title), optionally several per Gemini call.
+
+    Returns ([(content, error), ...] in target order, longest Retry-After of
+    sections that hit the Gemini quota).
+    """
+    semaphore = asyncio.Semaphore(DOCUMENT_CONCURRENCY)
+    retry_after = 0.0
+    
+    def failure(e: Exception, **fields):
+        nonlocal retry_after
+        if isinstance(e, LLMRateLimitError):
+            retry_after = max(retry_after, e.retry_after)
+            logger.warning("Section throttled", extra={**fields, "retryAfter": e.retry_after})
+        else:
+            logger.warning("Error generating section", extra={**fields, "error": str(e)})
+        return "", str(e)
+    
+    async def generate_one(section: dict):
+        with stage_timer("generate_document", "prompt_build"):
+            prompt = build_section_prompt(topic, section["title"], doc_type)
+        async with semaphore:
+            try:
+                with stage_timer("generate_document", "llm_wait"):
+                    return await section_llm.generate(prompt, use_cache=use_cache), None
+            except Exception as e:
+                return failure(e, sectionId=section["id"])
+    
+    async def generate_batch(batch: list):
+        """One packed call for the batch; sections missing from its answer get their own call.
+
+        If the packed call itself fails, each section gets its own call, except
+        on a quota error, which fails them all with its Retry-After.
+        """
+        if len(batch) == 1:
+            return [await generate_one(batch[0])]
+        with stage_timer("generate_document", "prompt_build"):
+            prompt = build_packed_sections_prompt(topic, [s["title"] for s in batch], doc_type)
+        async with semaphore:
+            try:
+                with stage_timer("generate_document", "llm_wait"):
+                    # The answer is about len(batch) sections long, so it gets that many sections' time
+                    text = await section_llm.generate(prompt, timeout=section_llm.timeout * len(batch),
+                                                      use_cache=use_cache)
+            except LLMRateLimitError as e:
+                return [failure(e, sectionIds=[s["id"] for s in batch])] * len(batch)
+            except Exception as e:
+                logger.warning("Packed call failed, generating its sections separately", extra={
+                    "sectionIds": [s["id"] for s in batch], "error": str(e)
+                })
+                text = None
         
-        prompt = f"""
-Current Content:
-{request.currentContent}
+        if text is None:
+            PACKED_SECTIONS.labels("fallback").inc(len(batch))
+            return list(await asyncio.gather(*(generate_one(s) for s in batch)))
+        contents = parse_packed_sections(text, len(batch))
+        PACKED_SECTIONS.labels("parsed").inc(len(contents))
+        PACKED_SECTIONS.labels("fallback").inc(len(batch) - len(contents))
+        if len(contents) < len(batch):
+            logger.warning("Packed response incomplete, generating the rest separately", extra={
+                "expected": len(batch), "parsed": len(contents)
+            })
+        missing = [s for n, s in enumerate(batch, 1) if n not in contents]
+        fallback = iter(await asyncio.gather(*(generate_one(s) for s in missing)))
+        return [(contents[n], None) if n in contents else next(fallback) for n in range(1, len(batch) + 1)]
+    
+    # Sections speculated on after generate-template are answered from the LLM
+    # cache (or join the speculative call) with their own single-section prompt
+    prefetched = {n for n, s in enumerate(targets) if use_cache and prefetcher.claim(topic, doc_type, s["title"])}
+    if not packed:
+        outcomes = await asyncio.gather(*(generate_one(s) for s in targets))
+    else:
+        rest = [s for n, s in enumerate(targets) if n not in prefetched]
+        batches = [rest[i:i + DOCUMENT_PACK_SIZE] for i in range(0, len(rest), DOCUMENT_PACK_SIZE)]
+        single_outcomes, *batch_outcomes = await asyncio.gather(
+            asyncio.gather(*(generate_one(targets[n]) for n in sorted(prefetched))),
+            *(generate_batch(b) for b in batches)
+        )
+        singles = iter(single_outcomes)
+        packed_outcomes = iter(outcome for batch in batch_outcomes for outcome in batch)
+        outcomes = [next(singles) if n in prefetched else next(packed_outcomes) for n in range(len(targets))]
+    return outcomes, retry_after
 
-User Instruction: {request.instruction}
+@app.post("/api/generate-document")
+async def generate_document(request: GenerateDocumentRequest, http_request: Request):
+    """Generate content for all sections concurrently, optionally several per Gemini call"""
+    retry_ids = set(request.retryIds) if request.retryIds is not None else None
+    targets = [s for s in request.sections if retry_ids is None or s.id in retry_ids]
+    logger.info("Generating document", extra={
+        "docType": request.docType, "sections": len(request.sections), "targets": len(targets),
+        "packed": request.packed
+    })
+    
+    try:
+        outcomes, retry_after = await run_until_disconnect(http_request, generate_contents(
+            request.topic, request.docType, [{"id": s.id, "title": s.title} for s in targets],
+            request.packed, use_cache=not wants_fresh(http_request)
+        ))
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    
+    generated = {s.id: outcome for s, outcome in zip(targets, outcomes)}
+    results = []
+    failed = []
+    for section in request.sections:
+        if section.id in generated:
+            content, error = generated[section.id]
+        else:
+            content, error = section.content or "", None
+        if error:
+            failed.append(section.id)
+        results.append({
+            "id": section.id,
+            "title": section.title,
+            "content": content,
+            "error": error
+        })
+    
+    logger.info("Document generated", extra={
+        "ok": len(targets) - len(failed), "failed": len(failed),
+        "contentChars": sum(len(r["content"]) for r in results)
+    })
+    response = {"sections": results, "failed": failed}
+    if retry_after:
+        # Sections left out by the quota can be retried with retryIds after this many seconds
+        response["retryAfter"] = math.ceil(retry_after)
+    return response
 
-Rewrite the content following the user's instruction.
-Maintain professional quality and coherence.
-Keep the same general structure unless asked to change it.
-Do not add any preamble or explanation, just provide the refined content.
-"""
+@app.post("/api/refine-section")
+async def refine_section(request: RefineRequest, http_request: Request):
+    """Refine existing content based on user instruction, whole or only the targeted lines"""
+    try:
+        with stage_timer("refine_section", "prompt_build"):
+            prompt, span = plan_refine(request.currentContent, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        logger.info("Refining section", extra={
+            "contentChars": len(request.currentContent), "instructionChars": len(request.instruction),
+            "spanChars": span.end - span.start if span else None
+        })
+        log_payload(logger, "Refine payload", instruction=request.instruction)
         
-        response = model.generate_content(prompt)
-        refined_content = response.text.strip()
+        with stage_timer("refine_section", "llm_wait"):
+            refined_content = await refine_llm.generate(prompt, request=http_request, use_cache=not wants_fresh(http_request))
         
-        print("Content refined successfully")
-        return {"refinedContent": refined_content}
+        result = refine_result(request.currentContent, request.instruction, prompt, span, refined_content)
+        logger.info("Section refined", extra={
+            "contentChars": len(result["refinedContent"]), "mode": result["mode"], "tokensSaved": result["tokensSaved"]
+        })
+        return result
     
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMRateLimitError as e:
+        raise quota_exceeded(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
-        print(f"Error refining content: {e}")
-        traceback.print_exc()
+        logger.exception("Error refining content")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/refine-section/stream")
+async def refine_section_stream(request: RefineRequest, http_request: Request):
+    """Stream refined content as server-sent events.
+
+    In span mode the chunks are the rewritten lines only; the 'done' event
+    carries the whole refined content, the span and the tokens saved.
+    """
+    try:
+        prompt, span = plan_refine(request.currentContent, request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Streaming refinement", extra={
+        "contentChars": len(request.currentContent), "instructionChars": len(request.instruction),
+        "spanChars": span.end - span.start if span else None
+    })
+    return stream_llm_events(
+        refine_llm, prompt, "refinedContent", use_cache=not wants_fresh(http_request),
+        finish=lambda text: refine_result(request.currentContent, request.instruction, prompt, span, text)
+    )
+
 @app.post("/api/export-document")
-async def export_document(request: ExportRequest):
+async def export_document(request: ExportRequest, http_request: Request):
     """Export document as .docx or .pptx"""
     try:
-        print("\n===== EXPORT REQUEST RECEIVED =====")
-        print("Topic:", request.topic)
-        print("DocType:", request.docType)
-        print("Theme:", request.theme)
-        print("Sections received:", len(request.sections))
-
         # 🔥 SAFE conversion: works for Pydantic objects & dicts
-        sections_data = []
-        for s in request.sections:
-            if isinstance(s, dict):  # frontend
-                sections_data.append({
-                    "id": s.get("id"),
-                    "title": s.get("title"),
-                    "content": s.get("content")
-                })
-            else:  # Pydantic Section
-                sections_data.append({
-                    "id": s.id,
-                    "title": s.title,
-                    "content": s.content
-                })
+        sections_data = sections_to_dicts(request.sections)
+
+        # Sizes only; section bodies are logged for sampled requests at DEBUG
+        logger.info("Export requested", extra={
+            "docType": request.docType,
+            "theme": request.theme,
+            "sections": len(sections_data),
+            "contentChars": sum(len(s["content"] or "") for s in sections_data)
+        })
+        log_payload(logger, "Export payload", topic=request.topic, sections=sections_data)
 
-        print("Converted sections (final):", sections_data)
-
-        # Generate file
-        if request.docType == "docx":
-            file_bytes = generate_docx(request.topic, sections_data)
-            filename = f"{request.topic.replace(' ', '_')}.docx"
-            media_type = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-
-        else:  # pptx
-            theme = request.theme or "professional_blue"
-            file_bytes = generate_pptx(request.topic, sections_data, theme)
-            filename = f"{request.topic.replace(' ', '_')}.pptx"
-            media_type = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-
-        # Send file
-        return StreamingResponse(
-            io.BytesIO(file_bytes),
-            media_type=media_type,
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
+        return await export_response(
+            request.docType, request.topic, request.theme or "professional_blue", sections_data, http_request,
+            "export_document"
         )
 
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
     except Exception as e:
-        print("❌ EXPORT ERROR:", e)
-        traceback.print_exc()
+        logger.exception("Export failed")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 
+@app.post("/api/exports", status_code=202)
+async def create_export_job(request: ExportRequest):
+    """Start a background export; poll /api/exports/{id} for progress"""
+    filename, media_type = export_file_info(request.docType, request.topic)
+    try:
+        job = export_jobs.submit(
+            request.docType,
+            request.topic,
+            sections_to_dicts(request.sections),
+            request.theme or "professional_blue",
+            filename,
+            media_type
+        )
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
+    logger.info("Export job queued", extra={"jobId": job["id"], "sections": job["total"], "docType": request.docType})
+    return job
+
+@app.post("/api/exports/bulk")
+async def bulk_export(request: BulkExportRequest):
+    """Render several exports in parallel and stream them back as one ZIP.
+
+    Members are written in the order they finish, each as soon as it is
+    rendered (or found in the export cache); a manifest.json listing every
+    document, including failed ones, closes the archive.
+    """
+    documents = request.documents
+    if not documents:
+        raise HTTPException(status_code=400, detail="No documents to export")
+    if len(documents) > BULK_EXPORT_MAX_DOCUMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {BULK_EXPORT_MAX_DOCUMENTS} documents per bulk export"
+        )
+
+    names = unique_names([export_file_info(document.docType, document.topic)[0] for document in documents])
+    logger.info("Bulk export requested", extra={
+        "documents": len(documents),
+        "sections": sum(len(document.sections) for document in documents)
+    })
+
+    limit = asyncio.Semaphore(BULK_EXPORT_CONCURRENCY)
+
+    async def render_one(index: int):
+        """(index, (file, size, cache_status) or None, error or None); never raises"""
+        document = documents[index]
+        sections_data = sections_to_dicts(document.sections)
+        theme = document.theme or "professional_blue"
+        cache_key = export_cache_key(document.docType, theme, document.topic, sections_data)
+        async with limit:
+            while True:
+                try:
+                    rendered = await render_export(document.docType, document.topic, theme, sections_data,
+                                                   cache_key, "bulk_export")
+                    return index, rendered, None
+                except ExportQueueFullError:
+                    # Busy with other exports; this request already caps its own share
+                    await asyncio.sleep(BULK_EXPORT_RETRY_DELAY)
+                except Exception as e:
+                    logger.exception("Bulk export document failed", extra={"document": index})
+                    return index, None, str(e)
+
+    async def archive():
+        started_at = time.perf_counter()
+        tasks = [asyncio.create_task(render_one(index)) for index in range(len(documents))]
+        manifest = [None] * len(documents)
+        stream = ZipStream()
+        try:
+            for finished in asyncio.as_completed(tasks):
+                index, rendered, error = await finished
+                document = documents[index]
+                entry = {"name": names[index], "topic": document.topic, "docType": document.docType}
+                if rendered is None:
+                    manifest[index] = {**entry, "status": "error", "error": error}
+                    continue
+                file, size, cache_status = rendered
+                with file:
+                    for chunk in stream.add_file(names[index], file, size, EXPORT_CHUNK_SIZE):
+                        if chunk:
+                            yield chunk
+                manifest[index] = {**entry, "status": "ok", "bytes": size, "cache": cache_status}
+            yield stream.add_bytes("manifest.json", json.dumps({"documents": manifest}, indent=2).encode('utf-8'))
+            yield stream.close()
+            logger.info("Bulk export finished", extra={
+                "documents": len(documents),
+                "failed": sum(1 for entry in manifest if entry["status"] == "error"),
+                "seconds": round(time.perf_counter() - started_at, 3)
+            })
+        finally:
+            # Client gone or archive done: stop pending renders, close files nobody will send
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled() and task.result()[1] is not None:
+                    task.result()[1][0].close()
+
+    return StreamingResponse(
+        archive(),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=exports.zip"}
+    )
+
+@app.get("/api/exports/{job_id}")
+def get_export_job(job_id: str):
+    """Status and progress (sections rendered / total) of an export job"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return job
+
+@app.get("/api/exports/{job_id}/file")
+def download_export_job(job_id: str):
+    """Download the finished file of an export job"""
+    job = export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export job is {job['status']}")
+    
+    path = export_jobs.file_path(job_id)
+    if path is None:
+        raise HTTPException(status_code=410, detail="Export file has been evicted, please export again")
+    return FileResponse(path, media_type=job["mediaType"], filename=job["filename"])
+
 @app.post("/api/generate-template")
-async def generate_template(topic: str, doc_type: str, num_sections: int = 5):
-    """Generate suggested outline/template"""
+async def generate_template(http_request: Request, topic: str, doc_type: str, num_sections: int = 5,
+                            prefetch: bool = False):
+    """Generate suggested outline/template.
+
+    With ``prefetch``, content for the titles is generated in the background
+    and ``outlineId`` is returned; PUT the edited titles to /api/outlines/{id}
+    or DELETE it so speculation the user no longer wants is cancelled.
+    """
     try:
         if doc_type == "docx":
             prompt = f"""
@@ -234,41 +921,13 @@ Benefits and Risks
 Future of AI Trading
 """
         
-        response = model.generate_content(prompt)
-        text = response.text.strip()
-        
-        # Clean up the response - remove any explanatory text
-        lines = text.split('\n')
-        clean_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Skip empty lines
-            if not line:
-                continue
-            
-            # Skip lines that look like explanations
-            if any(skip_word in line.lower() for skip_word in [
-                'here are', 'these are', 'following', 'presentation', 
-                'document', 'titles', 'for an', 'about'
-            ]):
-                continue
-            
-            # Remove numbering (1., 2., etc.)
-            if line[0].isdigit() and ('.' in line or ')' in line):
-                # Remove "1. " or "1) " from start
-                line = line.split('.', 1)[-1].split(')', 1)[-1].strip()
-            
-            # Remove asterisks or dashes from markdown
-            line = line.lstrip('*-•').strip()
-            
-            # Only add if it's not too long (likely a description)
-            if len(line.split()) <= 15:  # Max 15 words for a title
-                clean_lines.append(line)
+        with stage_timer("generate_template", "llm_wait"):
+            text = await outline_llm.generate(prompt, request=http_request, use_cache=not wants_fresh(http_request))
         
-        # Take only the requested number of sections
-        clean_lines = clean_lines[:num_sections]
+        # Clean up the response - remove numbering, bullets and explanatory lines,
+        # and take only the requested number of sections
+        postprocess_started = time.perf_counter()
+        clean_lines = parse_outline(text)[:num_sections]
         
         # If we don't have enough, add generic ones
         while len(clean_lines) < num_sections:
@@ -276,6 +935,7 @@ Future of AI Trading
                 clean_lines.append(f"Section {len(clean_lines) + 1}")
             else:
                 clean_lines.append(f"Slide {len(clean_lines) + 1}")
+        STAGE_LATENCY.labels("generate_template", "postprocess").observe(time.perf_counter() - postprocess_started)
         
         # Create sections array
         sections = []
@@ -286,18 +946,243 @@ Future of AI Trading
                 "content": ""
             })
         
-        return {"sections": sections}
+        response = {"sections": sections}
+        if prefetch:
+            response["outlineId"] = prefetcher.start(topic, doc_type, clean_lines)
+        return response
     
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMRateLimitError as e:
+        raise quota_exceeded(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
     except Exception as e:
-        print(f"Error in generate_template: {str(e)}")
+        logger.exception("Error in generate_template")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/outlines/{outline_id}")
+async def get_outline(outline_id: str):
+    """State of the speculative content for each title of an outline"""
+    status = prefetcher.status(outline_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Outline not found")
+    return status
+
+@app.put("/api/outlines/{outline_id}")
+async def update_outline(outline_id: str, request: OutlineUpdate):
+    """The outline as the user edited it; speculation on titles no longer in it is cancelled"""
+    status = prefetcher.update(outline_id, request.topic, request.titles)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Outline not found")
+    return status
+
+@app.delete("/api/outlines/{outline_id}", status_code=204)
+async def discard_outline(outline_id: str):
+    """Cancel all speculation for an outline the user discarded"""
+    if not prefetcher.cancel(outline_id):
+        raise HTTPException(status_code=404, detail="Outline not found")
+
+@app.get("/api/prefetch/stats")
+def prefetch_stats():
+    """Speculative sections by outcome, tokens spent and the budget"""
+    return prefetcher.stats()
+
+# ============ PROJECTS ============
+# Upload a document once, then PATCH single sections with the version they
+# were based on; export/generate/refine read the stored sections. The store
+# blocks (a lock plus SQLite's busy timeout): CRUD routes are plain functions
+# run in the threadpool, async routes call it through asyncio.to_thread.
+
+@app.post("/api/projects", status_code=201)
+def create_project(request: CreateProjectRequest):
+    """Store a project; the answer lists section ids and versions, not content"""
+    try:
+        project = project_store.create(
+            request.topic, request.docType, request.theme or "professional_blue", sections_to_dicts(request.sections)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("Project created", extra={"projectId": project["id"], "sections": len(project["sections"])})
+    return project
+
+@app.get("/api/projects/stats")
+def project_store_stats():
+    return project_store.stats()
+
+@app.get("/api/projects/{project_id}")
+def get_project(project_id: str, content: bool = True):
+    """The project with its sections (content=false: titles and versions only)"""
+    try:
+        return project_store.get(project_id, with_content=content)
+    except ProjectNotFoundError as e:
+        return project_error(e)
+
+@app.patch("/api/projects/{project_id}")
+def update_project(project_id: str, request: UpdateProjectRequest):
+    """Change the topic, doc type or theme"""
+    try:
+        return project_store.update(
+            project_id, request.version, topic=request.topic, docType=request.docType, theme=request.theme
+        )
+    except (ProjectNotFoundError, VersionConflictError) as e:
+        return project_error(e)
+
+@app.delete("/api/projects/{project_id}", status_code=204)
+def delete_project(project_id: str):
+    try:
+        project_store.delete(project_id)
+    except ProjectNotFoundError as e:
+        return project_error(e)
+    return Response(status_code=204)
+
+@app.post("/api/projects/{project_id}/sections", status_code=201)
+def add_project_section(project_id: str, request: NewSection):
+    """Append a section"""
+    try:
+        return project_store.add_section(project_id, request.title, request.content or "")
+    except ProjectNotFoundError as e:
+        return project_error(e)
+
+@app.patch("/api/projects/{project_id}/sections/{section_id}")
+def update_project_section(project_id: str, section_id: int, request: SectionPatch):
+    """Change one section's title and/or content; 409 if it is no longer at ``version``"""
+    try:
+        return project_store.update_section(
+            project_id, section_id, request.version, title=request.title, content=request.content
+        )
+    except (ProjectNotFoundError, VersionConflictError) as e:
+        return project_error(e)
+
+@app.delete("/api/projects/{project_id}/sections/{section_id}")
+def delete_project_section(project_id: str, section_id: int, version: int):
+    try:
+        return project_store.delete_section(project_id, section_id, version)
+    except (ProjectNotFoundError, VersionConflictError) as e:
+        return project_error(e)
+
+@app.post("/api/projects/{project_id}/export")
+async def export_project(project_id: str, http_request: Request):
+    """Export the stored project as .docx or .pptx (same caching and ETag as /api/export-document)"""
+    try:
+        project = await asyncio.to_thread(project_store.get, project_id)
+        logger.info("Project export requested", extra={
+            "projectId": project_id, "version": project["version"], "sections": len(project["sections"])
+        })
+        return await export_response(
+            project["docType"], project["topic"], project["theme"] or "professional_blue",
+            sections_to_dicts(project["sections"]), http_request, "export_project"
+        )
+    except ProjectNotFoundError as e:
+        return project_error(e)
+    except ExportQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "2"})
+    except Exception as e:
+        logger.exception("Project export failed")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/projects/{project_id}/generate")
+async def generate_project(project_id: str, http_request: Request, request: ProjectGenerateRequest = None):
+    """Generate the project's sections and store the results.
+
+    Sections edited while their content was being generated keep the edit
+    and are listed in ``conflicts``.
+    """
+    request = request or ProjectGenerateRequest()
+    try:
+        project = await asyncio.to_thread(project_store.get, project_id, with_content=False)
+    except ProjectNotFoundError as e:
+        return project_error(e)
+    
+    retry_ids = set(request.retryIds) if request.retryIds is not None else None
+    targets = [s for s in project["sections"] if retry_ids is None or s["id"] in retry_ids]
+    logger.info("Generating project", extra={
+        "projectId": project_id, "sections": len(project["sections"]), "targets": len(targets),
+        "packed": request.packed
+    })
+    
+    try:
+        outcomes, retry_after = await run_until_disconnect(http_request, generate_contents(
+            project["topic"], project["docType"], targets, request.packed, use_cache=not wants_fresh(http_request)
+        ))
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    
+    contents = {s["id"]: (content, s["version"]) for s, (content, error) in zip(targets, outcomes) if not error}
+    try:
+        saved = await asyncio.to_thread(project_store.save_contents, project_id, contents)
+    except ProjectNotFoundError as e:
+        return project_error(e)
+    
+    results = []
+    failed = []
+    conflicts = []
+    for section, (content, error) in zip(targets, outcomes):
+        if error:
+            failed.append(section["id"])
+        elif saved[section["id"]] is None:
+            conflicts.append(section["id"])
+        results.append({
+            "id": section["id"],
+            "title": section["title"],
+            "content": content,
+            "version": saved.get(section["id"]) or section["version"],
+            "error": error
+        })
+    
+    logger.info("Project generated", extra={
+        "projectId": project_id, "ok": len(targets) - len(failed) - len(conflicts),
+        "failed": len(failed), "conflicts": len(conflicts)
+    })
+    response = {"sections": results, "failed": failed, "conflicts": conflicts}
+    if retry_after:
+        response["retryAfter"] = math.ceil(retry_after)
+    return response
+
+@app.post("/api/projects/{project_id}/sections/{section_id}/refine")
+async def refine_project_section(project_id: str, section_id: int, request: ProjectRefineRequest,
+                                 http_request: Request):
+    """Refine a stored section with an instruction and store the result"""
+    try:
+        project = await asyncio.to_thread(project_store.get, project_id)
+        section = next((s for s in project["sections"] if s["id"] == section_id), None)
+        if section is None:
+            raise ProjectNotFoundError(f"Section {section_id} not found in project {project_id}")
+        version = section["version"] if request.version is None else request.version
+        if version != section["version"]:
+            raise VersionConflictError(
+                f"Section {section_id} is at version {section['version']}, not {version}", section["version"]
+            )
+        try:
+            with stage_timer("refine_section", "prompt_build"):
+                prompt, span = plan_refine(section["content"], request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        logger.info("Refining project section", extra={
+            "projectId": project_id, "sectionId": section_id,
+            "contentChars": len(section["content"]), "instructionChars": len(request.instruction),
+            "spanChars": span.end - span.start if span else None
+        })
+        
+        with stage_timer("refine_section", "llm_wait"):
+            refined_content = await refine_llm.generate(prompt, request=http_request, use_cache=not wants_fresh(http_request))
+        
+        result = refine_result(section["content"], request.instruction, prompt, span, refined_content)
+        saved = await asyncio.to_thread(
+            project_store.update_section, project_id, section_id, version, content=result["refinedContent"]
+        )
+        return {**result, **saved}
+    
+    except HTTPException:
+        raise
+    except (ProjectNotFoundError, VersionConflictError) as e:
+        return project_error(e)
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except LLMRateLimitError as e:
+        raise quota_exceeded(e)
+    except ClientDisconnectedError as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    except Exception as e:
+        logger.exception("Error refining project section")
         raise HTTPException(status_code=500, detail=str(e))
-if __name__ == "__main__":
-    import uvicorn
-    print("\n" + "="*60)
-    print("🚀 AI DOCUMENT GENERATOR API")
-    print("="*60)
-    print(f"📍 Server: http://localhost:8000")
-    print(f"📖 Docs: http://localhost:8000/docs")
-    print(f"🤖 AI Model: {model.model_name}")
-    print("="*60 + "\n")
-    uvicorn.run(app, host="localhost", port=8000)
@@ -1,64 +1,341 @@
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml import parse_xml
+from lxml import etree
 import io
+import os
+import re
+import threading
+import time
+import zipfile
 
-def generate_docx(topic: str, sections: list) -> bytes:
+from utils.render_cache import fragment_key, get_render_cache
+from utils.text_normalizer import parse_content
+
+# Wraps a section's cached body elements; each element declares its own namespaces
+FRAGMENT_OPEN = '<fragment>'
+FRAGMENT_CLOSE = '</fragment>'
+
+# Built-in list styles of the default template, by bullet level
+BULLET_STYLES = ('List Bullet', 'List Bullet 2', 'List Bullet 3')
+
+# ========== STYLE ==========
+# Shared by both writers so their output stays identical
+BODY_FONT = 'Calibri'
+BODY_SIZE = Pt(11)
+TITLE_COLOR = RGBColor(102, 126, 234)
+TITLE_SIZE = Pt(28)
+HEADING_COLOR = RGBColor(51, 51, 51)
+HEADING_SIZE = Pt(18)
+LINE_SPACING = 1.5
+SPACE_AFTER = Pt(12)
+FOOTER_TEXT = "Generated by AI Document Generator"
+FOOTER_COLOR = RGBColor(153, 153, 153)
+FOOTER_SIZE = Pt(9)
+
+# ========== WRITER SELECTION ==========
+# DOCX_WRITER: 'auto' (XML writer from DOCX_XML_MIN_SECTIONS sections on,
+# python-docx below), 'xml' or 'python-docx'. The XML writer beat
+# python-docx at every size measured, even on a warm render cache
+# (benchmarks/bench_docx_writer.py), hence the threshold of 1.
+DOCX_WRITER = os.getenv('DOCX_WRITER', 'auto')
+DOCX_XML_MIN_SECTIONS = int(os.getenv('DOCX_XML_MIN_SECTIONS', 1))
+
+def generate_docx(topic: str, sections: list, progress=None, stats: dict = None, writer: str = None) -> bytes:
     """Generate a beautifully formatted Word document"""
-    
+    file_stream = io.BytesIO()
+    write_docx(topic, sections, file_stream, progress, stats, writer)
+    return file_stream.getvalue()
+
+def _new_document():
+    """Document from the default template with the body font set"""
     doc = Document()
+    font = doc.styles['Normal'].font
+    font.name = BODY_FONT
+    font.size = BODY_SIZE
+    return doc
+
+def _add_footer(doc):
+    footer_para = doc.sections[0].footer.paragraphs[0]
+    footer_para.text = FOOTER_TEXT
+    footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    footer_para.runs[0].font.size = FOOTER_SIZE
+    footer_para.runs[0].font.color.rgb = FOOTER_COLOR
+
+def _add_section(doc, i, section):
+    """Render one numbered section through the python-docx API"""
+    # Section heading
+    heading = doc.add_heading(f"{i}. {section['title']}", level=1)
+    heading_run = heading.runs[0]
+    heading_run.font.color.rgb = HEADING_COLOR
+    heading_run.font.size = HEADING_SIZE
+    
+    # Section content
+    content = section.get('content', '')
+    if content:
+        _add_content(doc, parse_content(content))
+    
+    # Add spacing after section
+    doc.add_paragraph()
+
+def _add_content(doc, blocks):
+    """Paragraphs, bulleted lists and sub-headings with bold/italic runs"""
+    paragraph = None  # Open body paragraph that continuation lines are appended to
+    for block in blocks:
+        if block.kind == 'heading':
+            doc.add_heading(block.text, level=2)
+            paragraph = None
+            continue
+        
+        if block.kind == 'bullet':
+            p = doc.add_paragraph(style=BULLET_STYLES[min(block.level, len(BULLET_STYLES) - 1)])
+            paragraph = None
+        elif block.continues and paragraph is not None:
+            p = paragraph
+            p.add_run().add_break()
+        else:
+            p = doc.add_paragraph()
+            p.paragraph_format.line_spacing = LINE_SPACING
+            p.paragraph_format.space_after = SPACE_AFTER
+            paragraph = p
+        
+        for run in block.runs:
+            r = p.add_run(run.text)
+            if run.bold:
+                r.bold = True
+            if run.italic:
+                r.italic = True
+
+def write_docx(topic: str, sections: list, output, progress=None, stats: dict = None, writer: str = None) -> None:
+    """Render the Word document into a writable, seekable file object.
+
+    ``writer`` ('auto', 'xml' or 'python-docx', default DOCX_WRITER) picks
+    the engine; both produce the same document.
+    ``progress(done, total)`` is called after each section is rendered.
+    If given, ``stats`` receives render/serialize seconds, the writer used
+    and, for python-docx, the number of sections taken from (fragment_hits)
+    or added to (fragment_misses) the render cache.
+    """
+    writer = writer or DOCX_WRITER
+    if writer == 'auto':
+        writer = 'xml' if len(sections) >= DOCX_XML_MIN_SECTIONS else 'python-docx'
+    if writer == 'xml':
+        write_docx_xml(topic, sections, output, progress, stats)
+    elif writer == 'python-docx':
+        _write_docx_python_docx(topic, sections, output, progress, stats)
+    else:
+        raise ValueError(f"Unknown DOCX writer: {writer}")
+
+def _write_docx_python_docx(topic: str, sections: list, output, progress=None, stats: dict = None) -> None:
+    """Build through the python-docx object model.
+
+    Each section's body XML is cached by position and text, so re-exporting
+    after a one-section edit only renders that section.
+    """
+    started_at = time.perf_counter()
+    hits = 0
     
-    # Set default font
-    style = doc.styles['Normal']
-    font = style.font
-    font.name = 'Calibri'
-    font.size = Pt(11)
+    doc = _new_document()
     
     # Add Title
     title = doc.add_heading(topic, 0)
     title.alignment = WD_ALIGN_PARAGRAPH.CENTER
     title_run = title.runs[0]
-    title_run.font.color.rgb = RGBColor(102, 126, 234)
-    title_run.font.size = Pt(28)
+    title_run.font.color.rgb = TITLE_COLOR
+    title_run.font.size = TITLE_SIZE
     title_run.font.bold = True
     
     # Add spacing after title
     doc.add_paragraph()
     
     # Add sections
+    body = doc.element.body
+    render_cache = get_render_cache()
     for i, section in enumerate(sections, 1):
-        # Section heading
-        heading = doc.add_heading(f"{i}. {section['title']}", level=1)
-        heading_run = heading.runs[0]
-        heading_run.font.color.rgb = RGBColor(51, 51, 51)
-        heading_run.font.size = Pt(18)
+        key = fragment_key('docx', i, section['title'], section.get('content', ''))
+        fragment = render_cache.get(key)
+        if fragment is not None:
+            # Cached XML goes in front of the final sectPr, like doc.add_* does
+            for element in list(parse_xml(fragment)):
+                body.sectPr.addprevious(element)
+            hits += 1
+        else:
+            first_new = len(body) - 1  # Index of sectPr before this section
+            _add_section(doc, i, section)
+            fragment = ''.join(etree.tostring(element, encoding='unicode') for element in body[first_new:-1])
+            render_cache.set(key, FRAGMENT_OPEN + fragment + FRAGMENT_CLOSE)
         
-        # Section content
-        content = section.get('content', '')
-        if content:
-            # Split into paragraphs
-            paragraphs = content.split('\n\n')
-            for para_text in paragraphs:
-                if para_text.strip():
-                    p = doc.add_paragraph(para_text.strip())
-                    p.paragraph_format.line_spacing = 1.5
-                    p.paragraph_format.space_after = Pt(12)
-        
-        # Add spacing after section
-        doc.add_paragraph()
+        if progress:
+            progress(i, len(sections))
     
     # Add footer
-    section = doc.sections[0]
-    footer = section.footer
-    footer_para = footer.paragraphs[0]
-    footer_para.text = f"Generated by AI Document Generator"
-    footer_para.alignment = WD_ALIGN_PARAGRAPH.CENTER
-    footer_para.runs[0].font.size = Pt(9)
-    footer_para.runs[0].font.color.rgb = RGBColor(153, 153, 153)
+    _add_footer(doc)
     
-    # Save to bytes
-    file_stream = io.BytesIO()
-    doc.save(file_stream)
-    file_stream.seek(0)
+    rendered_at = time.perf_counter()
+    doc.save(output)
+    
+    if stats is not None:
+        stats.update(
+            render_seconds=rendered_at - started_at,
+            serialize_seconds=time.perf_counter() - rendered_at,
+            writer='python-docx',
+            fragment_hits=hits,
+            fragment_misses=len(sections) - hits
+        )
+# ========== DIRECT XML WRITER ==========
+# Writes the body WordprocessingML as strings straight into the package,
+# in exactly the form python-docx produces. Everything around the body
+# (styles, footer, settings, ...) comes from a shell document built once
+# per process with the python-docx code above.
+
+# Characters lxml refuses in text (python-docx raises on them too)
+XML_INCOMPATIBLE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f￾￿]')
+RUN_BREAKS = re.compile(r'([\t\r\n])')
+
+_xml_shell = None
+_xml_shell_lock = threading.Lock()
+
+
+class _XMLShell:
+    """The parts of an empty styled document plus the body markup templates"""
+
+    def __init__(self):
+        doc = _new_document()
+        _add_footer(doc)
+        stream = io.BytesIO()
+        doc.save(stream)
+        with zipfile.ZipFile(stream) as package:
+            self.parts = [(info.filename, package.read(info)) for info in package.infolist()]
+        
+        document = dict(self.parts)['word/document.xml'].decode('utf-8')
+        body_start = document.index('<w:body>') + len('<w:body>')
+        body_end = document.index('<w:sectPr')
+        self.head = document[:body_start].encode('utf-8')
+        self.tail = document[body_end:].encode('utf-8')
+        
+        style_id = lambda name: doc.styles[name].style_id
+        self.title_open = (
+            f'<w:p><w:pPr><w:pStyle w:val="{style_id("Title")}"/><w:jc w:val="center"/></w:pPr>'
+            f'<w:r><w:rPr><w:b/><w:color w:val="{TITLE_COLOR}"/><w:sz w:val="{_half_points(TITLE_SIZE)}"/></w:rPr>'
+        )
+        self.heading_open = (
+            f'<w:p><w:pPr><w:pStyle w:val="{style_id("Heading 1")}"/></w:pPr>'
+            f'<w:r><w:rPr><w:color w:val="{HEADING_COLOR}"/><w:sz w:val="{_half_points(HEADING_SIZE)}"/></w:rPr>'
+        )
+        self.subheading_open = f'<w:p><w:pPr><w:pStyle w:val="{style_id("Heading 2")}"/></w:pPr><w:r>'
+        self.bullet_opens = tuple(
+            f'<w:p><w:pPr><w:pStyle w:val="{style_id(name)}"/></w:pPr>' for name in BULLET_STYLES
+        )
+        # w:line is in 240ths of a line, w:after in twips
+        self.paragraph_open = (
+            f'<w:p><w:pPr><w:spacing w:line="{round(LINE_SPACING * 240)}" w:lineRule="auto" '
+            f'w:after="{SPACE_AFTER.twips}"/></w:pPr>'
+        )
+
+
+def _half_points(length) -> int:
+    return round(length.pt * 2)
+
+def get_xml_shell() -> _XMLShell:
+    """The shell document, built on first use (export workers build it while warming up)"""
+    global _xml_shell
+    with _xml_shell_lock:
+        if _xml_shell is None:
+            _xml_shell = _XMLShell()
+        return _xml_shell
+
+def _text_xml(text: str) -> str:
+    escaped = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    if len(text.strip()) < len(text):
+        return f'<w:t xml:space="preserve">{escaped}</w:t>'
+    return f'<w:t>{escaped}</w:t>'
+
+def _run_content_xml(text: str) -> str:
+    """Inner run markup for ``text``: tabs and line breaks become elements, like python-docx's add_run"""
+    if '\t' not in text and '\n' not in text and '\r' not in text:
+        return _text_xml(text) if text else ''
+    parts = []
+    for piece in RUN_BREAKS.split(text):
+        if piece == '\t':
+            parts.append('<w:tab/>')
+        elif piece in ('\r', '\n'):
+            parts.append('<w:br/>')
+        elif piece:
+            parts.append(_text_xml(piece))
+    return ''.join(parts)
+
+def _runs_xml(runs) -> str:
+    parts = []
+    for run in runs:
+        if run.bold or run.italic:
+            parts.append('<w:r><w:rPr>' + ('<w:b/>' if run.bold else '') + ('<w:i/>' if run.italic else '')
+                         + '</w:rPr>' + _run_content_xml(run.text) + '</w:r>')
+        else:
+            parts.append('<w:r>' + _run_content_xml(run.text) + '</w:r>')
+    return ''.join(parts)
+
+def _check_xml_text(*texts):
+    for text in texts:
+        if XML_INCOMPATIBLE.search(text):
+            raise ValueError("All strings must be XML compatible: Unicode or ASCII, no NULL bytes or control characters")
+
+def _section_xml(shell: _XMLShell, i: int, section: dict) -> str:
+    """One numbered section, as _add_section renders it"""
+    title = f"{i}. {section['title']}"
+    content = section.get('content', '')
+    _check_xml_text(title, content or '')
+    parts = [shell.heading_open, _run_content_xml(title), '</w:r></w:p>']
+    if content:
+        paragraph_open = False  # A body paragraph is open for continuation lines
+        for block in parse_content(content):
+            if block.kind == 'paragraph' and block.continues and paragraph_open:
+                parts.append('<w:r><w:br/></w:r>' + _runs_xml(block.runs))
+                continue
+            if paragraph_open:
+                parts.append('</w:p>')
+                paragraph_open = False
+            if block.kind == 'heading':
+                parts.append(shell.subheading_open + _run_content_xml(block.text) + '</w:r></w:p>')
+            elif block.kind == 'bullet':
+                style = shell.bullet_opens[min(block.level, len(BULLET_STYLES) - 1)]
+                parts.append(style + _runs_xml(block.runs) + '</w:p>')
+            else:
+                parts.append(shell.paragraph_open + _runs_xml(block.runs))
+                paragraph_open = True
+        if paragraph_open:
+            parts.append('</w:p>')
+    parts.append('<w:p/>')
+    return ''.join(parts)
+
+def write_docx_xml(topic: str, sections: list, output, progress=None, stats: dict = None) -> None:
+    """Stream the document body into the package as it is built (no object model, no render cache)"""
+    started_at = time.perf_counter()
+    shell = get_xml_shell()
+    _check_xml_text(topic)
+    render_seconds = 0.0
+    
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+        for name, data in shell.parts:
+            if name != 'word/document.xml':
+                package.writestr(name, data)
+                continue
+            with package.open(name, 'w', force_zip64=True) as part:
+                part.write(shell.head)
+                title_run = _run_content_xml(topic)
+                part.write(f'{shell.title_open}{title_run}</w:r></w:p><w:p/>'.encode('utf-8'))
+                for i, section in enumerate(sections, 1):
+                    rendered_at = time.perf_counter()
+                    xml = _section_xml(shell, i, section)
+                    render_seconds += time.perf_counter() - rendered_at
+                    part.write(xml.encode('utf-8'))
+                    if progress:
+                        progress(i, len(sections))
+                part.write(shell.tail)
     
-    return file_stream.getvalue()
\ No newline at end of file
+    if stats is not None:
+        stats.update(
+            render_seconds=render_seconds,
+            serialize_seconds=time.perf_counter() - started_at - render_seconds,
+            writer='xml'
+        )
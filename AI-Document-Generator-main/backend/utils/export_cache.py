@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from utils.export_jobs import ExportStore
+from utils.render_cache import RENDER_VERSION
+
+# ========== CONFIGURATION ==========
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def export_cache_key(doc_type: str, theme: str, topic: str, sections: list) -> str:
+    """Content hash of everything that determines a rendered export"""
+    payload = json.dumps(
+        {
+            "version": RENDER_VERSION,
+            "docType": doc_type,
+            "theme": theme if doc_type != "docx" else None,  # Word output ignores the theme
+            "topic": topic,
+            "sections": [[s.get("title"), s.get("content")] for s in sections],
+        },
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True if an If-None-Match header value covers ``etag``"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class ExportCache:
+    """Rendered exports keyed by content hash, kept in an LRU ExportStore"""
+
+    def __init__(self, store: ExportStore = None):
+        if store is None:
+            store = ExportStore(
+                directory=os.getenv('EXPORT_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'ai-doc-export-cache'),
+                max_bytes=int(os.getenv('EXPORT_CACHE_MAX_BYTES', DEFAULT_CACHE_BYTES))
+            )
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def lookup(self, key: str):
+        """Open a cached render as (file, size), or None on a miss"""
+        opened = self._open(key)
+        if opened is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return opened
+
+    def add(self, key: str, path: str, size: int):
+        """Move a fresh render into the cache and open it as (file, size)"""
+        file, _ = self.store.put_open(key, path, size, os.path.splitext(path)[1])
+        return file, size
+
+    def _open(self, key: str):
+        path = self.store.get(key)
+        if path is None:
+            return None
+        try:
+            file = open(path, 'rb')
+        except FileNotFoundError:  # Evicted in the meantime
+            return None
+        return file, os.fstat(file.fileno()).st_size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "notModified": self.not_modified,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self.store),
+            "bytes": self.store.total_bytes,
+            "maxBytes": self.store.max_bytes
+        }
@@ -0,0 +1,233 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from utils.metrics import STAGE_LATENCY, record_render
+
+# ========== CONFIGURATION ==========
+DEFAULT_START_METHOD = 'spawn'  # Safe with the event loop and other threads already running
+PROGRESS_INTERVAL = 0.2         # Min seconds between progress messages from a worker
+
+
+class ExportQueueFullError(Exception):
+    """Raised when too many exports are already running or waiting"""
+
+
+# ========== WORKER SIDE ==========
+
+_progress_queue = None  # Set in each worker process by _warm_worker
+
+
+def _warm_worker(progress_queue=None):
+    """Process initializer: import the generators and build the DOCX shell and theme templates"""
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    from utils.docx_generator import get_xml_shell
+    from utils.pptx_generator import THEMES, get_theme_template
+
+    get_xml_shell()
+    for theme in THEMES:
+        get_theme_template(theme)
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _queue_reporter(token: str):
+    """Progress callback that forwards throttled updates to the parent process"""
+    last_sent = 0.0
+
+    def report(done, total):
+        nonlocal last_sent
+        now = time.monotonic()
+        if done == total or now - last_sent >= PROGRESS_INTERVAL:
+            last_sent = now
+            _progress_queue.put((token, done, total))
+
+    return report
+
+
+def _render_in_worker(token, *args):
+    """Render in a worker; returns (path, size, stats) so the parent can record metrics"""
+    progress = _queue_reporter(token) if token and _progress_queue is not None else None
+    stats = {}
+    path, size = render_to_file(*args, progress=progress, stats=stats)
+    return path, size, stats
+
+
+def render_to_file(doc_type: str, topic: str, sections: list, theme: str, spool_dir: str = None, progress=None,
+                   stats: dict = None):
+    """Render a document into a new temp file and return (path, size)"""
+    from utils.docx_generator import write_docx
+    from utils.pptx_generator import write_pptx
+
+    suffix = '.docx' if doc_type == 'docx' else '.pptx'
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix='export-', dir=spool_dir)
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            if doc_type == 'docx':
+                write_docx(topic, sections, output, progress, stats)
+            else:
+                write_pptx(topic, sections, output, theme, progress, stats)
+            size = output.tell()
+    except BaseException:
+        os.remove(path)
+        raise
+    return path, size
+
+
+def remove_file(path: str):
+    """Delete a rendered export, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _discard_result(future):
+    if not future.cancelled() and future.exception() is None:
+        remove_file(future.result()[0])
+
+
+# ========== ENGINE ==========
+
+class ExportEngine:
+    """Renders DOCX/PPTX exports on a pool of warm worker processes.
+
+    At most ``max_workers + max_queue`` exports are accepted at once; past
+    that ``render`` raises ExportQueueFullError so the API can answer 429.
+    With ``max_workers=0`` exports run on a thread instead (no pool).
+    """
+
+    def __init__(self, max_workers: int = None, max_queue: int = None, spool_dir: str = None):
+        if max_workers is None:
+            max_workers = int(os.getenv('EXPORT_WORKERS', os.cpu_count() or 1))
+        if max_queue is None:
+            max_queue = int(os.getenv('EXPORT_QUEUE_LIMIT', max(max_workers, 1) * 2))
+        if spool_dir is None:
+            spool_dir = os.getenv('EXPORT_SPOOL_DIR') or None
+
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.spool_dir = spool_dir
+        self.start_method = os.getenv('EXPORT_START_METHOD', DEFAULT_START_METHOD)
+        self.in_flight = 0
+        self._pool = None
+        self._pool_lock = threading.Lock()  # start() may run in a warm-up thread while exports arrive
+        self._progress_queue = None
+        self._progress_thread = None
+        self._progress_handlers = {}  # token -> progress(done, total)
+
+    @property
+    def capacity(self) -> int:
+        return max(self.max_workers, 1) + self.max_queue
+
+    def start(self):
+        """Start the worker processes and block until each one is warm"""
+        if self.max_workers == 0:
+            return
+        pool = self._get_pool()
+        for future in [pool.submit(_ping) for _ in range(self.max_workers)]:
+            future.result()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self._progress_queue is None:
+                    self._progress_queue = context.Queue()
+                    self._progress_thread = threading.Thread(target=self._drain_progress, daemon=True)
+                    self._progress_thread.start()
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=_warm_worker,
+                    initargs=(self._progress_queue,)
+                )
+            return self._pool
+
+    def _drain_progress(self):
+        """Hand worker progress messages to the registered callbacks"""
+        while True:
+            message = self._progress_queue.get()
+            if message is None:
+                return
+            token, done, total = message
+            handler = self._progress_handlers.get(token)
+            if handler is not None:
+                handler(done, total)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+        if self._progress_thread is not None:
+            self._progress_queue.put(None)
+            self._progress_thread.join()
+            self._progress_queue = None
+            self._progress_thread = None
+
+    @property
+    def is_full(self) -> bool:
+        return self.in_flight >= self.capacity
+
+    def reserve(self):
+        """Claim a slot for a later ``render(..., reserved=True)``; raises ExportQueueFullError when full"""
+        if self.is_full:
+            raise ExportQueueFullError(
+                f"Export queue is full ({self.in_flight} exports in progress), try again shortly"
+            )
+        self.in_flight += 1
+
+    async def render(self, doc_type: str, topic: str, sections: list, theme: str = None, progress=None,
+                     reserved: bool = False):
+        """Render on the pool and return (path, size) of the finished temp file.
+
+        ``progress(done, total)`` is called from a background thread as
+        sections are rendered. With ``reserved`` the caller already holds a
+        slot from ``reserve``; the render releases it when it ends.
+        """
+        if not reserved:
+            self.reserve()
+        token = None
+        started_at = time.perf_counter()
+        try:
+            args = (doc_type, topic, sections, theme, self.spool_dir)
+            if self.max_workers == 0:
+                stats = {}
+                path, size = await asyncio.to_thread(render_to_file, *args, progress=progress, stats=stats)
+                record_render(doc_type, stats)
+                return path, size
+
+            if progress is not None:
+                token = uuid.uuid4().hex
+                self._progress_handlers[token] = progress
+            pool = self._get_pool()
+            future = pool.submit(_render_in_worker, token, *args)
+            try:
+                path, size, stats = await asyncio.wrap_future(future)
+                record_render(doc_type, stats)
+                return path, size
+            except asyncio.CancelledError:
+                # Nobody will stream the file; delete it once the worker is done
+                future.add_done_callback(_discard_result)
+                raise
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM); replace the pool for the next export
+                if self._pool is pool:
+                    self._pool = None
+                    pool.shutdown(wait=False, cancel_futures=True)
+                raise
+        finally:
+            self.in_flight -= 1
+            self._progress_handlers.pop(token, None)
+            # Queue wait + render + hand-off, as seen from the API process
+            STAGE_LATENCY.labels(f'export_{doc_type}', 'total').observe(time.perf_counter() - started_at)
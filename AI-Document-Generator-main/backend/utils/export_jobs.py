@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from utils.export_engine import remove_file
+
+# ========== CONFIGURATION ==========
+DEFAULT_STORE_BYTES = 512 * 1024 * 1024   # Finished exports kept on disk
+DEFAULT_JOB_HISTORY = 1000                # Job records kept after they finish
+
+logger = logging.getLogger(__name__)
+
+
+class ExportStore:
+    """Directory of finished export files with size-based LRU eviction.
+
+    Files left over from a previous run are indexed on startup so they are
+    the first to be evicted.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None):
+        if directory is None:
+            directory = os.getenv('EXPORT_STORE_DIR') or os.path.join(tempfile.gettempdir(), 'ai-doc-exports')
+        if max_bytes is None:
+            max_bytes = int(os.getenv('EXPORT_STORE_MAX_BYTES', DEFAULT_STORE_BYTES))
+
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._files = OrderedDict()  # key -> (path, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._index_existing()
+
+    def put(self, key: str, source_path: str, size: int, suffix: str = '') -> list:
+        """Move a rendered file into the store; returns the keys evicted to make room"""
+        with self._lock:
+            return self._put(key, source_path, size, suffix)
+
+    def put_open(self, key: str, source_path: str, size: int, suffix: str = '') -> tuple:
+        """``put``, then open the stored file before another put can evict it.
+
+        Returns (file, evicted keys); the open file stays readable even if
+        it is evicted afterwards.
+        """
+        with self._lock:
+            evicted = self._put(key, source_path, size, suffix)
+            return open(self._files[key][0], 'rb'), evicted
+
+    def get(self, key: str):
+        """Path of a stored file, or None; marks it recently used"""
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is None:
+                return None
+            self._files.move_to_end(key)
+            return entry[0]
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def _put(self, key: str, source_path: str, size: int, suffix: str) -> list:
+        path = os.path.join(self.directory, key + suffix)
+        if key in self._files:
+            old_path, old_size = self._files.pop(key)
+            self._bytes -= old_size
+            if old_path != path:
+                remove_file(old_path)
+        shutil.move(source_path, path)
+        self._files[key] = (path, size)
+        self._bytes += size
+        evicted = []
+        while self._bytes > self.max_bytes and len(self._files) > 1:  # Never the file just added
+            oldest = next(iter(self._files))
+            self._discard(oldest)
+            evicted.append(oldest)
+        return evicted
+
+    def _index_existing(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if os.path.isfile(path):
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, os.path.splitext(name)[0], path, stat.st_size))
+        for _, key, path, size in sorted(entries):
+            self._files[key] = (path, size)
+            self._bytes += size
+
+    def _discard(self, key: str):
+        path, size = self._files.pop(key)
+        self._bytes -= size
+        remove_file(path)
+
+
+class ExportJobs:
+    """Background export jobs rendered on an ExportEngine.
+
+    Job records live in this process, so with several uvicorn workers a
+    client must poll the worker that created the job (use sticky sessions
+    or a single worker for the job API).
+    """
+
+    def __init__(self, engine, store: ExportStore, history: int = DEFAULT_JOB_HISTORY):
+        self.engine = engine
+        self.store = store
+        self.history = history
+        self._jobs = OrderedDict()  # id -> job dict
+        self._tasks = set()
+
+    def submit(self, doc_type: str, topic: str, sections: list, theme: str, filename: str, media_type: str) -> dict:
+        """Queue an export and return its job record.
+
+        The engine slot is reserved here, so a full queue raises
+        ExportQueueFullError now rather than failing the job later.
+        """
+        self.engine.reserve()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "done": 0,
+            "total": len(sections),
+            "size": None,
+            "error": None,
+            "filename": filename,
+            "mediaType": media_type,
+            "createdAt": time.time(),
+        }
+        self._jobs[job["id"]] = job
+        self._trim_history()
+
+        task = asyncio.create_task(self._run(job, doc_type, topic, sections, theme))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+    def file_path(self, job_id: str):
+        return self.store.get(job_id)
+
+    async def _run(self, job: dict, doc_type: str, topic: str, sections: list, theme: str):
+        def progress(done, total):
+            if job["status"] in ("queued", "running"):  # Ignore late messages
+                job["status"] = "running"
+                job["done"] = done
+
+        try:
+            path, size = await self.engine.render(doc_type, topic, sections, theme, progress=progress,
+                                                  reserved=True)
+            suffix = os.path.splitext(path)[1]
+            for evicted in self.store.put(job["id"], path, size, suffix):
+                self._jobs.pop(evicted, None)
+            job.update(status="done", done=job["total"], size=size)
+        except Exception as e:
+            logger.exception("Export job failed", extra={"jobId": job["id"]})
+            job.update(status="failed", error=str(e))
+
+    def _trim_history(self):
+        """Forget the oldest finished jobs beyond the history limit"""
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
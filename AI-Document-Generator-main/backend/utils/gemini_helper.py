@@ -0,0 +1,553 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.llm_cache import make_cache_key
+from utils.metrics import LLM_COALESCED, LLM_QUOTA_RPM, LLM_REQUESTS, LLM_RETRIES, STAGE_LATENCY, record_llm_usage
+from utils.prompts import PACKED_MARKER
+from utils.rate_limiter import (
+    BACKOFF_BASE, BACKOFF_CAP, DEFAULT_MAX_RETRIES, RETRYABLE_STATUS, LLMRateLimitError, QuotaLimiter,
+    backoff_delay, estimate_tokens, upstream_status
+)
+
+# ========== CONFIGURATION ==========
+DEFAULT_MODEL = 'gemini-2.5-flash-lite'
+DEFAULT_MAX_CONCURRENCY = 8       # Gemini calls in flight per worker
+DEFAULT_TIMEOUT = 60.0            # Seconds per Gemini call
+DISCONNECT_POLL_INTERVAL = 0.5    # Seconds between client disconnect checks
+DEFAULT_PROVIDER = 'gemini'       # LLM_PROVIDER: 'gemini' or 'stub'
+DEFAULT_STUB_LATENCY = 0.05       # Seconds per stub call
+DEFAULT_STUB_THROTTLE_RATE = 0.0  # Fraction of stub calls answered with a 429
+DEFAULT_STUB_TOKEN_LATENCY = 0.0  # Extra seconds per output token, like a model's decoding time
+STUB_STREAM_CHUNKS = 4            # Chunks per streamed stub response
+# The stub "refines" by echoing the text it was asked to rewrite (full or span prompt)
+STUB_REFINE_TEXT = re.compile(
+    r'^(?:Current Content|Part of a longer section to rewrite):\n(.*?)\n\n(?:Text just|User Instruction:)', re.S | re.M
+)
+
+
+# ========== ERRORS ==========
+
+class LLMTimeoutError(Exception):
+    """Raised when a Gemini call exceeds its timeout"""
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client went away before the Gemini call finished"""
+
+
+# LLMRateLimitError (quota exhausted before the call's deadline) lives in
+# utils.rate_limiter and is re-exported here with the other LLM errors
+
+
+# ========== PROVIDERS ==========
+# A provider hands out models. A model only needs Gemini's
+# ``await generate_content_async(prompt, stream=False)``: a response with
+# ``.text`` (and optionally ``.usage_metadata``), or with stream=True an
+# async iterable of such chunks.
+
+class GeminiProvider:
+    """Google Gemini; optionally appends every prompt/response pair to a JSONL recording.
+
+    The SDK takes most of the API's import time, so it is imported and
+    configured on the first ``model()`` call rather than at startup.
+    """
+
+    name = 'gemini'
+
+    def __init__(self, api_key: str = None, record_path: str = None):
+        if record_path is None:
+            record_path = os.getenv('LLM_RECORD_FILE') or None
+        self.api_key = api_key or os.getenv('GEMINI_API_KEY')
+        self.record_path = record_path
+        self._record_lock = threading.Lock()
+        self._sdk_lock = threading.Lock()
+        self._genai = None
+
+    def sdk(self):
+        """The configured ``google.generativeai`` module, imported on first use"""
+        with self._sdk_lock:
+            if self._genai is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self._genai = genai
+            return self._genai
+
+    def model(self, model_name: str, generation_config: dict = None):
+        model = self.sdk().GenerativeModel(model_name, generation_config=generation_config)
+        if self.record_path:
+            return RecordingModel(model, model_name, self)
+        return model
+
+    def record(self, model_name: str, prompt: str, text: str):
+        line = json.dumps({"model": model_name, "prompt": prompt, "text": text}, ensure_ascii=False)
+        with self._record_lock, open(self.record_path, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+
+
+class RecordingModel:
+    """Wraps a Gemini model and records each finished response"""
+
+    def __init__(self, model, model_name: str, provider: GeminiProvider):
+        self._model = model
+        self._model_name = model_name
+        self._provider = provider
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        response = await self._model.generate_content_async(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._record_stream(prompt, response)
+        self._provider.record(self._model_name, str(prompt), response.text)
+        return response
+
+    async def _record_stream(self, prompt, response):
+        parts = []
+        async for chunk in response:
+            parts.append(chunk_text(chunk))
+            yield chunk
+        self._provider.record(self._model_name, str(prompt), ''.join(parts))
+
+
+class StubProvider:
+    """Offline, deterministic responses after a fixed latency.
+
+    Prompts found in the replay file (JSONL lines of model/prompt/text, as
+    written by LLM_RECORD_FILE) get their recorded text; anything else gets
+    canned text derived from the prompt. ``throttle_rate`` answers that
+    fraction of calls with a 429, to exercise the retry path offline.
+    ``token_latency`` adds time per output token, so long answers take
+    longer as they would upstream.
+    """
+
+    name = 'stub'
+
+    def __init__(self, latency: float = None, replay_path: str = None, throttle_rate: float = None,
+                 token_latency: float = None):
+        if latency is None:
+            latency = float(os.getenv('LLM_STUB_LATENCY', DEFAULT_STUB_LATENCY))
+        if replay_path is None:
+            replay_path = os.getenv('LLM_REPLAY_FILE') or None
+        if throttle_rate is None:
+            throttle_rate = float(os.getenv('LLM_STUB_THROTTLE_RATE', DEFAULT_STUB_THROTTLE_RATE))
+        if token_latency is None:
+            token_latency = float(os.getenv('LLM_STUB_TOKEN_LATENCY', DEFAULT_STUB_TOKEN_LATENCY))
+
+        self.latency = latency
+        self.token_latency = token_latency
+        self.replay_path = replay_path
+        self.throttle_rate = throttle_rate
+        self._recorded = {}  # (model, prompt) and (None, prompt) -> text
+        if replay_path:
+            self._load(replay_path)
+
+    def model(self, model_name: str, generation_config: dict = None):
+        return StubModel(self, model_name)
+
+    def response_for(self, model_name: str, prompt: str) -> str:
+        recorded = self._recorded.get((model_name, prompt))
+        if recorded is None:
+            recorded = self._recorded.get((None, prompt))
+        return recorded if recorded is not None else canned_text(prompt)
+
+    def _load(self, path: str):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._recorded[(entry.get("model"), entry["prompt"])] = entry["text"]
+                    self._recorded.setdefault((None, entry["prompt"]), entry["text"])
+
+
+class StubQuotaError(Exception):
+    """Stand-in for google.api_core's ResourceExhausted"""
+
+    code = 429
+
+
+class StubResponse:
+    def __init__(self, text: str, prompt_tokens: int = 0, output_tokens: int = 0):
+        self.text = text
+        self.usage_metadata = StubUsage(prompt_tokens, output_tokens) if prompt_tokens else None
+
+
+class StubUsage:
+    def __init__(self, prompt_tokens: int, output_tokens: int):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+
+
+class StubModel:
+    def __init__(self, provider: StubProvider, model_name: str):
+        self.provider = provider
+        self.model_name = model_name
+
+    async def generate_content_async(self, prompt, stream: bool = False, **kwargs):
+        if self.provider.throttle_rate and random.random() < self.provider.throttle_rate:
+            await asyncio.sleep(self.provider.latency / 10)
+            raise StubQuotaError("429 Resource has been exhausted (stub)")
+        prompt = str(prompt)
+        text = self.provider.response_for(self.model_name, prompt)
+        # Roughly four characters per token, like the Gemini tokenizer on English
+        tokens = (len(prompt) // 4 + 1, len(text) // 4 + 1)
+        latency = self.provider.latency + tokens[1] * self.provider.token_latency
+        if stream:
+            return self._stream(text, tokens, latency)
+        await asyncio.sleep(latency)
+        return StubResponse(text, *tokens)
+
+    async def _stream(self, text: str, tokens: tuple, latency: float):
+        size = max(len(text) // STUB_STREAM_CHUNKS, 1)
+        chunks = [text[i:i + size] for i in range(0, len(text), size)] or ['']
+        for n, chunk in enumerate(chunks, 1):
+            await asyncio.sleep(latency / len(chunks))
+            yield StubResponse(chunk, *tokens) if n == len(chunks) else StubResponse(chunk)
+
+
+PROVIDERS = {
+    'gemini': GeminiProvider,
+    'stub': StubProvider,
+}
+
+def get_provider(name: str = None):
+    """Provider named by ``name`` or LLM_PROVIDER"""
+    name = name or os.getenv('LLM_PROVIDER', DEFAULT_PROVIDER)
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER {name!r}, expected one of {', '.join(PROVIDERS)}")
+    return PROVIDERS[name]()
+
+def canned_text(prompt: str) -> str:
+    """Stub answer: JSON for packed prompts, a title list for outline prompts, the text to rewrite
+    for refine prompts, bullet points otherwise"""
+    refine = STUB_REFINE_TEXT.search(prompt)
+    if refine:
+        return refine.group(1).strip()
+    seed = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:6]
+    if PACKED_MARKER in prompt:
+        count = re.search(r'EXACTLY (\d+)', prompt)
+        count = int(count.group(1)) if count else 1
+        return json.dumps({"sections": [
+            {"index": n, "content": "\n".join(
+                f"• **Point {p}**: a concise, presentation-friendly statement ({seed}-{n})" for p in range(1, 6)
+            )}
+            for n in range(1, count + 1)
+        ]}, ensure_ascii=False)
+    if 'titles' in prompt:
+        count = re.search(r'EXACTLY (\d+)', prompt)
+        count = int(count.group(1)) if count else 5
+        return "\n".join(f"Topic Area {n} ({seed})" for n in range(1, count + 1))
+    return "\n".join(
+        f"• **Point {n}**: a concise, presentation-friendly statement ({seed})"
+        for n in range(1, 6)
+    )
+
+
+# ========== ASYNC CLIENT ==========
+
+class SingleFlight:
+    """One upstream call shared by every caller waiting on the same prompt"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class GeminiClient:
+    """Async LLM client with a concurrency limit, per-call timeouts and an optional response cache.
+
+    Concurrent ``generate`` calls for the same prompt share one upstream
+    call (single flight). Calls wait for room under the model's RPM/TPM
+    quota, and 429/5xx answers are retried with jittered backoff until the
+    call's timeout. Talks to Gemini unless another ``provider`` is given
+    (default: LLM_PROVIDER).
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, max_concurrency: int = None, timeout: float = None,
+                 cache=None, generation_config: dict = None, provider=None, limiter: QuotaLimiter = None,
+                 max_retries: int = None):
+        if max_concurrency is None:
+            max_concurrency = int(os.getenv('GEMINI_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+        if timeout is None:
+            timeout = float(os.getenv('GEMINI_TIMEOUT', DEFAULT_TIMEOUT))
+        if max_retries is None:
+            max_retries = int(os.getenv('GEMINI_MAX_RETRIES', DEFAULT_MAX_RETRIES))
+
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        self.provider = provider or get_provider()
+        self._model = None
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.limiter = limiter or QuotaLimiter()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._flights = {}  # cache key -> SingleFlight
+        self.upstream_calls = 0
+        self.coalesced = 0
+
+    @property
+    def model(self):
+        """Provider model, created on first use (this imports the Gemini SDK)"""
+        if self._model is None:
+            self._model = self.provider.model(self.model_name, self.generation_config or None)
+        return self._model
+
+    async def generate(self, prompt: str, request=None, timeout: float = None, use_cache: bool = True) -> str:
+        """Generate text for a prompt without blocking the event loop.
+
+        When ``request`` (a Starlette ``Request``) is given, the call is
+        cancelled as soon as the client disconnects. ``use_cache=False``
+        skips the cache lookup but still stores the fresh response. An
+        identical prompt already in flight is joined rather than sent again;
+        the first caller's timeout applies to everyone who joins it.
+        """
+        key = self.cache_key(prompt)
+        if self.cache is not None and use_cache:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                LLM_REQUESTS.labels(self.model_name, 'cached').inc()
+                return cached
+
+        call = self._join(key, prompt, timeout or self.timeout)
+        if request is None:
+            return await call
+        return await run_until_disconnect(request, call)
+
+    async def _join(self, key: str, prompt: str, timeout: float) -> str:
+        """Wait on the in-flight call for ``key``, starting it if there is none.
+
+        A waiter that is cancelled (e.g. its client disconnected) only
+        detaches; the upstream call is cancelled when its last waiter leaves.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = SingleFlight(asyncio.ensure_future(self._generate(prompt, timeout)))
+            flight.task.add_done_callback(lambda task: self._land(key, flight, task))
+            self._flights[key] = flight
+            self.upstream_calls += 1
+        else:
+            self.coalesced += 1
+            LLM_COALESCED.labels(self.model_name).inc()
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody wants the answer any more; later callers start afresh
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def _land(self, key: str, flight: SingleFlight, task: asyncio.Task):
+        """Retire a finished flight and cache its text once for all waiters"""
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        if self.cache is not None:
+            self.cache.set_nowait(key, task.result())
+
+    def single_flight_stats(self) -> dict:
+        return {
+            "upstreamCalls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "inFlight": len(self._flights),
+        }
+
+    def cache_key(self, prompt: str) -> str:
+        # Stub answers must never be served as real Gemini responses
+        model = self.model_name if self.provider.name == 'gemini' else f'{self.provider.name}:{self.model_name}'
+        return make_cache_key(prompt, model, self.generation_config)
+
+    async def _generate(self, prompt: str, timeout: float) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        queued_at = time.perf_counter()
+        async with self._semaphore:
+            STAGE_LATENCY.labels('llm', 'queue').observe(time.perf_counter() - queued_at)
+            attempt = 0
+            while True:
+                estimate = await self._reserve(prompt, deadline)
+                started_at = time.perf_counter()
+                try:
+                    with self._track_outcome():
+                        try:
+                            response = await asyncio.wait_for(
+                                self.model.generate_content_async(prompt),
+                                timeout=deadline - loop.time()
+                            )
+                        except asyncio.TimeoutError:
+                            raise LLMTimeoutError(f"Gemini call timed out after {timeout:.0f}s")
+                        finally:
+                            STAGE_LATENCY.labels('llm', 'call').observe(time.perf_counter() - started_at)
+                        text = response.text.strip()
+                except Exception as e:
+                    await self._backoff(e, attempt, estimate, deadline)
+                    attempt += 1
+                    continue
+                break
+        self._settle(estimate, response)
+        record_llm_usage(self.model_name, response)
+        return text
+
+    async def stream(self, prompt: str, timeout: float = None, use_cache: bool = True):
+        """Yield partial text chunks as Gemini produces them.
+
+        The timeout applies to the whole stream, not to each chunk. A cached
+        response is replayed as a single chunk.
+        """
+        key = self.cache_key(prompt)
+        if self.cache is not None and use_cache:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                LLM_REQUESTS.labels(self.model_name, 'cached').inc()
+                yield cached
+                return
+
+        parts = []
+        async for text in self._stream(prompt, timeout or self.timeout):
+            parts.append(text)
+            yield text
+
+        if self.cache is not None:
+            self.cache.set_nowait(key, "".join(parts).strip())
+
+    async def _stream(self, prompt: str, timeout: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        queued_at = time.perf_counter()
+        async with self._semaphore:
+            STAGE_LATENCY.labels('llm', 'queue').observe(time.perf_counter() - queued_at)
+            attempt = 0
+            while True:
+                estimate = await self._reserve(prompt, deadline)
+                started_at = time.perf_counter()
+                chunk = None
+                yielded = False
+                try:
+                    with self._track_outcome():
+                        try:
+                            response = await asyncio.wait_for(
+                                self.model.generate_content_async(prompt, stream=True),
+                                timeout=deadline - loop.time()
+                            )
+                            chunks = response.__aiter__()
+                            while True:
+                                try:
+                                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=deadline - loop.time())
+                                except StopAsyncIteration:
+                                    break
+                                text = chunk_text(chunk)
+                                if text:
+                                    yielded = True
+                                    yield text
+                        except asyncio.TimeoutError:
+                            raise LLMTimeoutError(f"Gemini call timed out after {timeout:.0f}s")
+                        finally:
+                            STAGE_LATENCY.labels('llm', 'call').observe(time.perf_counter() - started_at)
+                except Exception as e:
+                    if yielded:
+                        raise  # Text already sent to the client can't be taken back
+                    await self._backoff(e, attempt, estimate, deadline)
+                    attempt += 1
+                    continue
+                break
+        self._settle(estimate, chunk)
+        # The last chunk carries the usage totals
+        if chunk is not None:
+            record_llm_usage(self.model_name, chunk)
+
+    async def _reserve(self, prompt: str, deadline: float) -> int:
+        """Wait for quota room for one call; returns the tokens reserved"""
+        estimate = estimate_tokens(prompt)
+        waited_from = time.perf_counter()
+        try:
+            await self.limiter.acquire(estimate, deadline)
+        except LLMRateLimitError:
+            LLM_REQUESTS.labels(self.model_name, 'rate_limited').inc()
+            raise
+        finally:
+            STAGE_LATENCY.labels('llm', 'rate_limit').observe(time.perf_counter() - waited_from)
+        return estimate
+
+    async def _backoff(self, error: Exception, attempt: int, estimate: int, deadline: float):
+        """Sleep before retrying a 429/5xx; re-raise anything else, or when out of retries or time"""
+        status = upstream_status(error)
+        if status not in RETRYABLE_STATUS:
+            raise error
+        self.limiter.settle(estimate, 0)  # A rejected call used no tokens
+        if status == 429:
+            self.limiter.on_throttled()
+            LLM_QUOTA_RPM.labels(self.model_name).set(self.limiter.requests.rate)
+
+        delay = backoff_delay(attempt)
+        if attempt >= self.max_retries or asyncio.get_running_loop().time() + delay >= deadline:
+            if status == 429:
+                raise LLMRateLimitError(
+                    "Gemini quota exceeded, try again shortly",
+                    retry_after=min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt + 1))
+                ) from error
+            raise error
+        LLM_RETRIES.labels(self.model_name, 'throttled' if status == 429 else 'server_error').inc()
+        await asyncio.sleep(delay)
+
+    def _settle(self, estimate: int, response):
+        """Correct the token reservation with the usage the response reports"""
+        usage = getattr(response, 'usage_metadata', None)
+        actual = estimate
+        if usage is not None:
+            actual = (getattr(usage, 'prompt_token_count', 0) or 0) + (getattr(usage, 'candidates_token_count', 0) or 0)
+        self.limiter.settle(estimate, actual)
+        self.limiter.on_success()
+        LLM_QUOTA_RPM.labels(self.model_name).set(self.limiter.requests.rate)
+
+    @contextmanager
+    def _track_outcome(self):
+        """Count the enclosed Gemini call as ok, timeout, cancelled, throttled (429) or error"""
+        try:
+            yield
+        except LLMTimeoutError:
+            LLM_REQUESTS.labels(self.model_name, 'timeout').inc()
+            raise
+        except (asyncio.CancelledError, GeneratorExit):
+            LLM_REQUESTS.labels(self.model_name, 'cancelled').inc()
+            raise
+        except Exception as e:
+            LLM_REQUESTS.labels(self.model_name, 'throttled' if upstream_status(e) == 429 else 'error').inc()
+            raise
+        else:
+            LLM_REQUESTS.labels(self.model_name, 'ok').inc()
+
+
+# ========== HELPER FUNCTIONS ==========
+
+def chunk_text(chunk) -> str:
+    """Text of a streamed chunk, or '' for chunks without text parts"""
+    try:
+        return chunk.text
+    except ValueError:  # e.g. the final chunk carrying only finish_reason
+        return ''
+
+async def run_until_disconnect(request, coro, poll_interval: float = DISCONNECT_POLL_INTERVAL):
+    """Await ``coro``, cancelling it if the HTTP client disconnects first"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnectedError("Client disconnected before generation finished")
+    finally:
+        if not task.done():
+            task.cancel()
@@ -0,0 +1,209 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ========== CONFIGURATION ==========
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024   # In-process LRU budget
+DEFAULT_TTL = 24 * 60 * 60             # Seconds a cached response stays valid
+PURGE_EVERY = 200                      # SQLite writes between expired-row purges
+
+
+def make_cache_key(prompt: str, model_name: str, generation_config: dict = None) -> str:
+    """Content hash of everything that determines a Gemini response"""
+    payload = json.dumps(
+        {"model": model_name, "config": generation_config or {}, "prompt": prompt},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """LLM response cache: in-process LRU with a byte budget, optional SQLite tier.
+
+    The SQLite file can be shared by several uvicorn workers on one host.
+    Entries expire ``ttl`` seconds after they were stored; a ttl of 0
+    disables the cache. ``table`` lets other caches share the class (and
+    a database file) without mixing entries.
+
+    ``get``/``set`` block on the SQLite tier; on an event loop use ``aget``
+    and ``set_nowait``, which keep the LRU inline and run SQLite in a thread.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl: float = None, db_path: str = None, table: str = 'llm_cache'):
+        if max_bytes is None:
+            max_bytes = int(os.getenv('LLM_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        if ttl is None:
+            ttl = float(os.getenv('LLM_CACHE_TTL', DEFAULT_TTL))
+        if db_path is None:
+            db_path = os.getenv('LLM_CACHE_DB') or None
+
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.table = table
+
+        self._entries = OrderedDict()   # key -> (expires_at, value, size)
+        self._bytes = 0
+        self._lock = threading.Lock()     # The LRU; never held across a SQLite query
+        self._db_lock = threading.Lock()  # The SQLite connection
+        self._db = self._open_db(db_path, table) if db_path else None
+        self._writes_since_purge = 0
+        self._writes = set()              # Background SQLite writes in flight
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def get(self, key: str):
+        """Return the cached response for ``key``, or None"""
+        if not self.enabled:
+            return None
+        value = self._memory_get(key)
+        return value if value is not None else self._disk_get(key)
+
+    async def aget(self, key: str):
+        """``get`` for the event loop: a miss in the LRU is looked up in SQLite on a thread"""
+        if not self.enabled:
+            return None
+        value = self._memory_get(key)
+        if value is not None:
+            return value
+        if self._db is None:
+            return self._disk_get(key)  # Just counts the miss
+        return await asyncio.to_thread(self._disk_get, key)
+
+    def set(self, key: str, value: str):
+        """Store a response under ``key``"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        self._db_set(key, value, expires_at)
+
+    def set_nowait(self, key: str, value: str):
+        """``set`` for the event loop: the LRU is filled at once, SQLite written from a thread"""
+        if not self.enabled:
+            return
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, value, expires_at)
+        if self._db is not None:
+            write = asyncio.ensure_future(asyncio.to_thread(self._db_set, key, value, expires_at))
+            self._writes.add(write)
+            write.add_done_callback(self._writes.discard)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "diskHits": self.disk_hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "ttl": self.ttl,
+                "diskBackend": self.db_path
+            }
+
+    # ---------- in-process LRU ----------
+
+    def _memory_get(self, key: str):
+        """The LRU's value for ``key``, or None (a miss is counted by ``_disk_get``)"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value, _ = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self._remove(key)
+            return None
+
+    def _store(self, key: str, value: str, expires_at: float):
+        size = len(value.encode('utf-8'))
+        if key in self._entries:
+            self._remove(key)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (expires_at, value, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    # ---------- SQLite tier ----------
+
+    @staticmethod
+    def _open_db(db_path: str, table: str):
+        db = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        db.execute(f"DELETE FROM {table} WHERE expires_at <= ?", (time.time(),))
+        return db
+
+    def _disk_get(self, key: str):
+        """Look ``key`` up in SQLite, promoting a hit into the LRU; counts the lookup as a hit or miss"""
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?",
+                    (key, time.time())
+                ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            value, expires_at = row
+            self.disk_hits += 1
+            self.hits += 1
+            self._store(key, value, expires_at)
+            return value
+
+    def _db_set(self, key: str, value: str, expires_at: float):
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at)
+            )
+            self._writes_since_purge += 1
+            if self._writes_since_purge >= PURGE_EVERY:
+                self._db.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+                self._writes_since_purge = 0
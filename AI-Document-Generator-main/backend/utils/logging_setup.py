@@ -0,0 +1,118 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+# ========== CONFIGURATION ==========
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_FORMAT = 'json'            # 'json' for log pipelines, 'text' for local development
+DEFAULT_PAYLOAD_SAMPLE_RATE = 0.0  # Fraction of requests whose bodies are logged at DEBUG
+
+# Set per request by the request-id middleware
+request_id_var = contextvars.ContextVar('request_id', default=None)
+payload_sampled_var = contextvars.ContextVar('payload_sampled', default=False)
+
+# Attributes every LogRecord has; anything else was passed through ``extra``
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request id and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            entry["requestId"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Readable single line with the extra fields appended as key=value"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = ' '.join(f"{key}={value}" for key, value in vars(record).items() if key not in _RECORD_ATTRS)
+        request_id = getattr(record, 'request_id', None)
+        line = (
+            f"{time.strftime('%H:%M:%S', time.localtime(record.created))} {record.levelname:<7} "
+            f"{record.name}{f' [{request_id}]' if request_id else ''}: {record.getMessage()}"
+        )
+        if fields:
+            line += f" {fields}"
+        if record.exc_text:
+            line += f"\n{record.exc_text}"
+        return line
+
+
+class RequestQueueHandler(QueueHandler):
+    """Hands records to the background listener with the request id attached.
+
+    Formatting and writing happen on the listener thread, so a slow stdout
+    never blocks the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: str = None, fmt: str = None):
+    """Route all logging through a queue to one stdout handler; safe to call twice"""
+    global _listener
+    if _listener is not None:
+        return
+    level = (level or os.getenv('LOG_LEVEL', DEFAULT_LEVEL)).upper()
+    fmt = fmt or os.getenv('LOG_FORMAT', DEFAULT_FORMAT)
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else TextFormatter())
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers = [RequestQueueHandler(log_queue)]
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def start_request(request_id: str, sample_rate: float = None) -> contextvars.Token:
+    """Bind a request id to the current context and decide if its payloads are logged"""
+    if sample_rate is None:
+        sample_rate = float(os.getenv('LOG_PAYLOAD_SAMPLE_RATE', DEFAULT_PAYLOAD_SAMPLE_RATE))
+    payload_sampled_var.set(sample_rate > 0 and random.random() < sample_rate)
+    return request_id_var.set(request_id)
+
+def log_payload(logger: logging.Logger, message: str, **payload):
+    """Log request/response bodies at DEBUG, only for sampled requests"""
+    if payload_sampled_var.get() and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(message, extra=payload)
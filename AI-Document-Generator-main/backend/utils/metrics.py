@@ -0,0 +1,169 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# ========== CONFIGURATION ==========
+# Request and LLM latencies span milliseconds (cache hits) to a minute (timeouts)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# With several uvicorn/gunicorn workers, point this at an empty directory
+# shared by them so /metrics aggregates every worker
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+
+# ========== METRICS ==========
+
+HTTP_REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to the response headers, by route',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requests being handled, by route',
+    ['route'], multiprocess_mode='livesum'
+)
+STAGE_LATENCY = Histogram(
+    'stage_duration_seconds', 'Time spent in one stage of an operation',
+    ['operation', 'stage'], buckets=LATENCY_BUCKETS
+)
+LLM_REQUESTS = Counter(
+    'llm_requests_total',
+    'LLM calls by outcome (ok, cached, timeout, error, cancelled, throttled, rate_limited)',
+    ['model', 'outcome']
+)
+LLM_RETRIES = Counter(
+    'llm_retries_total', 'LLM calls retried after a 429 (throttled) or 5xx (server_error)',
+    ['model', 'reason']
+)
+LLM_QUOTA_RPM = Gauge(
+    'llm_quota_rpm', 'Requests per minute the adaptive limiter currently allows',
+    ['model'], multiprocess_mode='max'
+)
+LLM_COALESCED = Counter(
+    'llm_coalesced_total', 'LLM calls saved by joining an identical call already in flight',
+    ['model']
+)
+LLM_TOKENS = Counter(
+    'llm_tokens_total', 'Tokens reported by Gemini usage metadata',
+    ['model', 'direction']
+)
+PACKED_SECTIONS = Counter(
+    'packed_sections_total', 'Sections of packed generate-document calls, parsed from the answer or regenerated alone',
+    ['result']
+)
+REFINE_REQUESTS = Counter(
+    'refine_requests_total', 'Refinements by mode (full: whole section, span: only the targeted lines)',
+    ['mode']
+)
+REFINE_TOKENS_SAVED = Counter(
+    'refine_tokens_saved_total', 'Estimated LLM tokens saved by sending only the targeted lines'
+)
+PREFETCH_SECTIONS = Counter(
+    'prefetch_sections_total',
+    'Sections speculatively generated after an outline, by outcome (queued, done, used, cancelled, skipped, expired, failed)',
+    ['outcome']
+)
+EXPORTS = Counter(
+    'exports_total', 'Export requests by export cache result (hit, miss, not_modified)',
+    ['doc_type', 'cache']
+)
+EXPORT_BYTES = Counter(
+    'export_bytes_total', 'Bytes of exported documents sent or stored',
+    ['doc_type']
+)
+RENDER_FRAGMENTS = Counter(
+    'render_fragments_total', 'Slides/sections taken from the render cache (hit) or rendered (miss)',
+    ['doc_type', 'result']
+)
+
+
+# ========== HELPERS ==========
+
+@contextmanager
+def stage_timer(operation: str, stage: str):
+    """Time the enclosed block as one stage of ``operation``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(operation, stage).observe(time.perf_counter() - start)
+
+def record_llm_usage(model: str, response):
+    """Count prompt/output tokens from a Gemini response, if it reports them"""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+    output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+    if prompt_tokens:
+        LLM_TOKENS.labels(model, 'in').inc(prompt_tokens)
+    if output_tokens:
+        LLM_TOKENS.labels(model, 'out').inc(output_tokens)
+
+def record_render(doc_type: str, stats: dict):
+    """Record the stage timings and fragment counts a generator filled in"""
+    operation = f'export_{doc_type}'
+    for stage in ('render', 'serialize'):
+        seconds = stats.get(f'{stage}_seconds')
+        if seconds is not None:
+            STAGE_LATENCY.labels(operation, stage).observe(seconds)
+    RENDER_FRAGMENTS.labels(doc_type, 'hit').inc(stats.get('fragment_hits', 0))
+    RENDER_FRAGMENTS.labels(doc_type, 'miss').inc(stats.get('fragment_misses', 0))
+
+
+class CacheStatsCollector:
+    """Exposes the counters of caches that keep their own ``stats()``"""
+
+    def __init__(self, caches: dict):
+        self.caches = caches  # name -> object with stats()
+
+    def collect(self):
+        hits = CounterMetricFamily('cache_hits', 'Cache hits', labels=['cache'])
+        misses = CounterMetricFamily('cache_misses', 'Cache misses', labels=['cache'])
+        entries = GaugeMetricFamily('cache_entries', 'Entries held', labels=['cache'])
+        size = GaugeMetricFamily('cache_bytes', 'Bytes held', labels=['cache'])
+        for name, cache in self.caches.items():
+            stats = cache.stats()
+            hits.add_metric([name], stats['hits'])
+            misses.add_metric([name], stats['misses'])
+            entries.add_metric([name], stats['entries'])
+            size.add_metric([name], stats['bytes'])
+        yield from (hits, misses, entries, size)
+
+
+class EngineCollector:
+    """Exposes the export engine's queue depth"""
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def collect(self):
+        in_flight = GaugeMetricFamily('exports_in_flight', 'Exports rendering or queued on the workers')
+        in_flight.add_metric([], self.engine.in_flight)
+        capacity = GaugeMetricFamily('exports_capacity', 'Exports accepted at once before answering 429')
+        capacity.add_metric([], self.engine.capacity)
+        yield from (in_flight, capacity)
+
+
+_local_collectors = []  # Collectors reading objects of this process
+
+
+def register_collector(collector):
+    """Register a collector on the default registry and for multiprocess scrapes"""
+    _local_collectors.append(collector)
+    REGISTRY.register(collector)
+
+def render_metrics():
+    """Exposition body and content type for the /metrics endpoint"""
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        # Per-process collectors (caches, engine) only see this worker
+        for collector in _local_collectors:
+            registry.register(collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
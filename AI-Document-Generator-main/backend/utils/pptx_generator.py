@@ -3,8 +3,20 @@ from pptx.util import Inches, Pt
 from pptx.enum.text import PP_ALIGN
 from pptx.dml.color import RGBColor
 from pptx.enum.dml import MSO_THEME_COLOR
+from pptx.oxml.ns import qn
+from lxml import etree
+import copy
 import io
+import logging
 import re
+import zipfile
+import time
+from functools import lru_cache
+
+from utils.render_cache import fragment_key, get_render_cache
+from utils.text_normalizer import parse_content
+
+logger = logging.getLogger(__name__)
 
 # ========== THEME DEFINITIONS ==========
 THEMES = {
@@ -141,37 +153,83 @@ ICON_MAP = {
 
 # ========== HELPER FUNCTIONS ==========
 
+# Fallback keywords when no ICON_MAP keyword matches, checked group by group
+FALLBACK_ICONS = [
+    (['intro', 'start', 'begin', 'welcome'], '📊'),
+    (['end', 'conclude', 'final', 'summary'], '🏁'),
+    (['thank', 'questions', 'q&a'], '🙏'),
+]
+
+ICON_CACHE_SIZE = 4096  # Distinct titles remembered by get_icon_for_title
+
+def _alternation(keywords) -> str:
+    """Regex alternation of keywords, longest first so the longest wins at a position"""
+    return '|'.join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+
+class IconMatcher:
+    """Precompiled keyword-to-icon matcher.
+
+    All keywords are compiled into one alternation regex, so a title is
+    scanned once. Keywords match whole words (a plural 's'/'es' is allowed),
+    so 'ai' no longer fires inside 'training'. When several keywords appear
+    in a title the longest one wins, e.g. 'machine learning' beats 'data'.
+    Fallback keywords only need to match the start of a word and are used
+    when no keyword matched, earlier groups first.
+    """
+
+    def __init__(self, icon_map: dict, fallbacks=FALLBACK_ICONS):
+        self.icons = {keyword.lower(): icon for keyword, icon in icon_map.items()}
+        # fallback word -> (group priority, icon)
+        self.fallbacks = {
+            word: (priority, icon)
+            for priority, (words, icon) in enumerate(fallbacks)
+            for word in words
+        }
+        self.pattern = re.compile(
+            r'(?<!\w)(?:'
+            r'(?P<kw>' + _alternation(self.icons) + r')(?:e?s)?(?!\w)'
+            r'|(?P<fb>' + _alternation(self.fallbacks) + r'))'
+        )
+
+    def match(self, title_lower: str) -> str:
+        best = None
+        fallback = None
+        for m in self.pattern.finditer(title_lower):
+            keyword = m.group('kw')
+            if keyword is not None:
+                if best is None or len(keyword) > len(best):
+                    best = keyword
+            elif best is None:
+                candidate = self.fallbacks[m.group('fb')]
+                if fallback is None or candidate < fallback:
+                    fallback = candidate
+
+        if best is not None:
+            return self.icons[best]
+        if fallback is not None:
+            return fallback[1]
+        return ''  # No icon
+
+_extra_icon_maps = []
+_icon_matcher = IconMatcher(ICON_MAP)
+
+def register_icon_map(icon_map: dict):
+    """Add extra keyword -> icon mappings; they override ICON_MAP on conflicts"""
+    global _icon_matcher
+    _extra_icon_maps.append(dict(icon_map))
+    merged = dict(ICON_MAP)
+    for extra in _extra_icon_maps:
+        merged.update(extra)
+    _icon_matcher = IconMatcher(merged)
+    _cached_icon.cache_clear()
+
+@lru_cache(maxsize=ICON_CACHE_SIZE)
+def _cached_icon(title_lower: str) -> str:
+    return _icon_matcher.match(title_lower)
+
 def get_icon_for_title(title: str) -> str:
     """Find best matching icon for slide title"""
-    title_lower = title.lower()
-    
-    # Check for direct matches first
-    for keyword, icon in ICON_MAP.items():
-        if keyword in title_lower:
-            return icon
-    
-    # Default icons based on position
-    if any(word in title_lower for word in ['intro', 'start', 'begin', 'welcome']):
-        return '📊'
-    elif any(word in title_lower for word in ['end', 'conclude', 'final', 'summary']):
-        return '🏁'
-    elif any(word in title_lower for word in ['thank', 'questions', 'q&a']):
-        return '🙏'
-    
-    return ''  # No icon
-
-def clean_text_formatting(text: str) -> str:
-    """Remove ** markdown and clean text"""
-    # Remove ** for bold
-    text = re.sub(r'\*\*(.+?)\*\*', r'\1', text)
-    
-    # Remove * for italic
-    text = re.sub(r'\*(.+?)\*', r'\1', text)
-    
-    # Remove leading bullets if present
-    text = re.sub(r'^[\*\-•]\s*', '', text, flags=re.MULTILINE)
-    
-    return text.strip()
+    return _cached_icon(title.lower())
 
 def apply_gradient_background(slide, theme_colors):
     """Apply gradient background to slide"""
@@ -185,18 +243,19 @@ def apply_gradient_background(slide, theme_colors):
         fill.gradient_stops[0].color.rgb = RGBColor(*theme_colors['bg_start'])
         fill.gradient_stops[1].color.rgb = RGBColor(*theme_colors['bg_end'])
     except Exception as e:
-        print(f"Warning: Could not apply gradient: {e}")
+        logger.warning("Could not apply gradient: %s", e)
         # Fallback to solid color
         background = slide.background
         fill = background.fill
         fill.solid()
         fill.fore_color.rgb = RGBColor(*theme_colors['bg_start'])
 
-def add_decorative_bar(slide, theme_colors):
-    """Add decorative accent bar at bottom of slide"""
+def add_decorative_bar(slide, theme_colors, top=None):
+    """Add decorative accent bar along the bottom edge of the title area"""
     try:
         left = Inches(0)
-        top = slide.shapes[0].top + slide.shapes[0].height - Inches(0.15)
+        if top is None:
+            top = slide.shapes[0].top + slide.shapes[0].height - Inches(0.15)
         width = Inches(10)
         height = Inches(0.15)
         
@@ -209,30 +268,108 @@ def add_decorative_bar(slide, theme_colors):
         shape.fill.solid()
         shape.fill.fore_color.rgb = RGBColor(*theme_colors['accent_color'])
         shape.line.fill.background()
+        return shape
     except:
         pass  # Skip if error
 
-# ========== MAIN GENERATOR FUNCTION ==========
+def add_accent_line(slide, theme_colors):
+    """Add decorative line under the slide title"""
+    try:
+        line_shape = slide.shapes.add_shape(
+            1,  # Rectangle
+            Inches(0.5),
+            Inches(1.6),
+            Inches(9),
+            Inches(0.05)
+        )
+        line_shape.fill.solid()
+        line_shape.fill.fore_color.rgb = RGBColor(*theme_colors['accent_color'])
+        line_shape.line.fill.background()
+        return line_shape
+    except:
+        pass
 
-def generate_pptx(topic: str, sections: list, theme: str = 'professional_blue') -> bytes:
-    """Generate a beautifully formatted PowerPoint presentation"""
-    
-    # Get theme colors
-    if theme not in THEMES:
-        theme = 'professional_blue'
-    theme_colors = THEMES[theme]
-    
-    prs = Presentation()
-    prs.slide_width = Inches(10)
-    prs.slide_height = Inches(7.5)
+# ========== THEME TEMPLATE CACHE ==========
+
+TITLE_LAYOUT = 5      # 'Title Only', stripped to a blank layout with the gradient
+CONTENT_LAYOUT = 6    # 'Blank', gets the gradient, accent line and bar baked in
+
+# Content slide title box; the decorative bar sits on its bottom edge
+TITLE_BOX = (Inches(0.5), Inches(0.5), Inches(9), Inches(1))
+
+_theme_templates = {}  # theme name -> built template, see _build_theme_template
+
+# Package parts rewritten per export, and the names they need for each slide
+CONTENT_TYPES_PART = '[Content_Types].xml'
+PRESENTATION_PART = 'ppt/presentation.xml'
+PRESENTATION_RELS_PART = 'ppt/_rels/presentation.xml.rels'
+XML_DECLARATION = b"<?xml version='1.0' encoding='UTF-8' standalone='yes'?>\n"
+NS_RELATIONSHIPS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+CT_SLIDE = 'application/vnd.openxmlformats-officedocument.presentationml.slide+xml'
+RT_SLIDE = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slide'
+RT_SLIDE_LAYOUT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/slideLayout'
+
+def _add_content_title(slide, text, theme_colors):
+    title_box = slide.shapes.add_textbox(*TITLE_BOX)
+    title_frame = title_box.text_frame
+    title_frame.text = text
     
-    # ========== TITLE SLIDE ==========
-    title_slide_layout = prs.slide_layouts[6]  # Blank layout
-    slide = prs.slides.add_slide(title_slide_layout)
+    # Style title
+    title_paragraph = title_frame.paragraphs[0]
+    title_paragraph.font.size = Pt(36)
+    title_paragraph.font.bold = True
+    title_paragraph.font.color.rgb = RGBColor(*theme_colors['title_color'])
+    return title_box
+
+def _add_content_body(slide, lines, theme_colors):
+    content_left = Inches(1)
+    content_top = Inches(2.2)
+    content_width = Inches(8)
+    content_height = Inches(4.5)
     
-    # Apply gradient background
-    apply_gradient_background(slide, theme_colors)
+    content_box = slide.shapes.add_textbox(content_left, content_top, content_width, content_height)
+    text_frame = content_box.text_frame
+    text_frame.word_wrap = True
     
+    for j, line in enumerate(lines):
+        if j == 0:
+            p = text_frame.paragraphs[0]
+        else:
+            p = text_frame.add_paragraph()
+        
+        p.text = line
+        p.level = 0
+        p.font.size = Pt(20)
+        p.font.color.rgb = RGBColor(*theme_colors['text_color'])
+        p.space_before = Pt(14)
+        p.space_after = Pt(14)
+        p.line_spacing = 1.3
+    return content_box
+
+def _add_slide_number(slide, number, theme_colors):
+    slide_num_box = slide.shapes.add_textbox(
+        Inches(9),
+        Inches(7),
+        Inches(0.5),
+        Inches(0.3)
+    )
+    slide_num_frame = slide_num_box.text_frame
+    slide_num_frame.text = str(number)
+    slide_num_para = slide_num_frame.paragraphs[0]
+    slide_num_para.font.size = Pt(14)
+    slide_num_para.font.color.rgb = RGBColor(*theme_colors['text_color'])
+    slide_num_para.alignment = PP_ALIGN.RIGHT
+    return slide_num_box
+
+def _move_to_layout(shape, layout):
+    """Move a slide shape onto a layout, giving it a free shape id there"""
+    layout_tree = layout.shapes._spTree
+    element = shape._element
+    element.getparent().remove(element)
+    element.nvSpPr.cNvPr.id = layout_tree.max_shape_id + 1
+    layout_tree.append(element)
+
+def _add_title_slide_shapes(slide, topic, theme_colors):
     # Add title
     left = Inches(1)
     top = Inches(2.5)
@@ -260,114 +397,236 @@ def generate_pptx(topic: str, sections: list, theme: str = 'professional_blue')
     subtitle_paragraph.alignment = PP_ALIGN.CENTER
     subtitle_paragraph.font.size = Pt(24)
     subtitle_paragraph.font.color.rgb = RGBColor(*theme_colors['text_color'])
+
+def _split_at(xml: str, marker: str):
+    """Split package XML around a marker that must occur exactly once"""
+    head, found, tail = xml.partition(marker)
+    if not found or marker in tail:
+        raise ValueError(f"Unexpected template XML, cannot find {marker!r}")
+    return head, tail
+
+def _build_theme_template(theme_colors) -> dict:
+    """Render a theme once: package parts whose layouts carry the static
+    decoration, plus styled prototype slides and shapes to fill with text"""
+    prs = Presentation()
+    prs.slide_width = Inches(10)
+    prs.slide_height = Inches(7.5)
+    
+    title_layout = prs.slide_layouts[TITLE_LAYOUT]
+    for placeholder in list(title_layout.placeholders):
+        placeholder._element.getparent().remove(placeholder._element)
+    apply_gradient_background(title_layout, theme_colors)
+    
+    content_layout = prs.slide_layouts[CONTENT_LAYOUT]
+    apply_gradient_background(content_layout, theme_colors)
+    
+    # Prototype title slide; its first run is replaced by the topic
+    title_slide = prs.slides.add_slide(title_layout)
+    _add_title_slide_shapes(title_slide, 'Title', theme_colors)
+    
+    # Render one content slide through the normal styling code
+    slide = prs.slides.add_slide(content_layout)
+    empty_slide = copy.deepcopy(slide._element)
+    title_box = _add_content_title(slide, 'Title', theme_colors)
+    line_shape = add_accent_line(slide, theme_colors)
+    body_box = _add_content_body(slide, ['Line'], theme_colors)
+    bar_shape = add_decorative_bar(slide, theme_colors, top=TITLE_BOX[1] + TITLE_BOX[3] - Inches(0.15))
+    number_box = _add_slide_number(slide, 1, theme_colors)
+    
+    # Bake the static shapes into the layout, keep the text boxes as prototypes
+    for shape in (line_shape, bar_shape):
+        if shape is not None:
+            _move_to_layout(shape, content_layout)
+    
+    body = copy.deepcopy(body_box._element)
+    paragraph = body.txBody.p_lst[0]
+    body.txBody.remove(paragraph)
+    run = paragraph.find(qn('a:r'))
+    paragraph.remove(run)
+    # Give the run prototype the paragraph's font, so bold/italic runs keep its size and colour
+    run_properties = copy.deepcopy(paragraph.find(qn('a:pPr')).find(qn('a:defRPr')))
+    run_properties.tag = qn('a:rPr')
+    run.insert(0, run_properties)
+    template = {
+        'title_slide': copy.deepcopy(title_slide._element),
+        'slide': empty_slide,
+        'title': copy.deepcopy(title_box._element),
+        'body': body,
+        'paragraph': paragraph,
+        'run': run,
+        'number': copy.deepcopy(number_box._element),
+        'title_layout': '../slideLayouts/' + title_layout.part.partname.split('/')[-1],
+        'content_layout': '../slideLayouts/' + content_layout.part.partname.split('/')[-1],
+    }
+    
+    # Drop the prototype slides; only the layouts go into the package
+    slide_ids = prs.slides._sldIdLst
+    for slide_id in list(slide_ids):
+        prs.part.drop_rel(slide_id.rId)
+        slide_ids.remove(slide_id)
+    
+    file_stream = io.BytesIO()
+    prs.save(file_stream)
+    
+    # Keep the parts as bytes; the three that list slides are split where
+    # write_pptx splices in the slide entries
+    with zipfile.ZipFile(file_stream) as package:
+        parts = {name: package.read(name) for name in package.namelist()}
+    template['content_types'] = _split_at(parts.pop(CONTENT_TYPES_PART).decode('utf-8'), '</Types>')
+    template['presentation'] = _split_at(parts.pop(PRESENTATION_PART).decode('utf-8'), '<p:sldIdLst/>')
+    rels = parts.pop(PRESENTATION_RELS_PART).decode('utf-8')
+    template['presentation_rels'] = _split_at(rels, '</Relationships>')
+    template['first_rid'] = max(int(n) for n in re.findall(r'Id="rId(\d+)"', rels)) + 1
+    template['parts'] = list(parts.items())
+    return template
+
+def get_theme_template(theme: str) -> dict:
+    """Pre-rendered template for a theme, built on first use"""
+    template = _theme_templates.get(theme)
+    if template is None:
+        template = _build_theme_template(THEMES[theme])
+        _theme_templates[theme] = template
+    return template
+
+def _clone_with_text(prototype, text):
+    """Copy a prototype shape or paragraph and set the text of its first run"""
+    element = copy.deepcopy(prototype)
+    element.find('.//' + qn('a:r')).text = text
+    return element
+
+# ========== SLIDE RENDERING ==========
+
+def _render_paragraph(template, block):
+    """Body paragraph for one parsed block: a run per bold/italic span, bullets indented by level"""
+    paragraph = copy.deepcopy(template['paragraph'])
+    if block.level:
+        paragraph.find(qn('a:pPr')).set('lvl', str(block.level))
+    for run in block.runs:
+        element = copy.deepcopy(template['run'])
+        element.find(qn('a:t')).text = run.text
+        if run.bold or block.kind == 'heading':
+            element[0].set('b', '1')
+        if run.italic:
+            element[0].set('i', '1')
+        paragraph.append(element)
+    return paragraph
+
+def _render_title_slide(template, topic) -> str:
+    """Slide XML for the title slide"""
+    return etree.tostring(_clone_with_text(template['title_slide'], topic), encoding='unicode')
+
+def _render_content_slide(template, number, section) -> str:
+    """Slide XML for one section; backgrounds, accent line and bar come from the layout"""
+    slide = copy.deepcopy(template['slide'])
+    shape_tree = slide.find(qn('p:cSld')).find(qn('p:spTree'))
+    
+    # Add title with icon
+    icon = get_icon_for_title(section['title'])
+    title_text = f"{icon}  {section['title']}" if icon else section['title']
+    shape_tree.append(_clone_with_text(template['title'], title_text))
+    
+    # Add content
+    content = section.get('content', '')
+    if content:
+        blocks = parse_content(content)
+        
+        body = copy.deepcopy(template['body'])
+        for block in blocks:
+            body.txBody.append(_render_paragraph(template, block))
+        if not blocks:
+            body.txBody.add_p()
+        shape_tree.append(body)
+    
+    # Add slide number
+    shape_tree.append(_clone_with_text(template['number'], str(number)))
+    return etree.tostring(slide, encoding='unicode')
+
+def _write_package(template, slides, output):
+    """Zip the template parts together with ``slides``, a list of (layout, slide XML)"""
+    first_rid = template['first_rid']
+    overrides = []
+    relationships = []
+    slide_ids = []
+    for n in range(1, len(slides) + 1):
+        rid = f"rId{first_rid + n - 1}"
+        overrides.append(f'<Override PartName="/ppt/slides/slide{n}.xml" ContentType="{CT_SLIDE}"/>')
+        relationships.append(f'<Relationship Id="{rid}" Type="{RT_SLIDE}" Target="slides/slide{n}.xml"/>')
+        slide_ids.append(f'<p:sldId id="{255 + n}" r:id="{rid}"/>')
+    
+    def spliced(parts, insert):
+        head, tail = parts
+        return (head + insert + tail).encode('utf-8')
+    
+    with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as package:
+        package.writestr(CONTENT_TYPES_PART, spliced(template['content_types'], ''.join(overrides) + '</Types>'))
+        package.writestr(PRESENTATION_PART, spliced(
+            template['presentation'], '<p:sldIdLst>' + ''.join(slide_ids) + '</p:sldIdLst>'
+        ))
+        package.writestr(PRESENTATION_RELS_PART, spliced(
+            template['presentation_rels'], ''.join(relationships) + '</Relationships>'
+        ))
+        for name, data in template['parts']:
+            package.writestr(name, data)
+        for n, (layout, slide_xml) in enumerate(slides, 1):
+            package.writestr(f'ppt/slides/slide{n}.xml', XML_DECLARATION + slide_xml.encode('utf-8'))
+            package.writestr(
+                f'ppt/slides/_rels/slide{n}.xml.rels',
+                f'{XML_DECLARATION.decode()}<Relationships xmlns="{NS_RELATIONSHIPS}">'
+                f'<Relationship Id="rId1" Type="{RT_SLIDE_LAYOUT}" Target="{layout}"/></Relationships>'
+            )
+
+# ========== MAIN GENERATOR FUNCTION ==========
+
+def generate_pptx(topic: str, sections: list, theme: str = 'professional_blue', progress=None,
+                  stats: dict = None) -> bytes:
+    """Generate a beautifully formatted PowerPoint presentation"""
+    file_stream = io.BytesIO()
+    write_pptx(topic, sections, file_stream, theme, progress, stats)
+    return file_stream.getvalue()
+
+def write_pptx(topic: str, sections: list, output, theme: str = 'professional_blue', progress=None,
+               stats: dict = None) -> None:
+    """Render the presentation into a writable, seekable file object.
+
+    Each slide's XML is cached by theme, position and section text, so
+    re-exporting after a one-section edit only renders that slide.
+    ``progress(done, total)`` is called after each slide is rendered.
+    If given, ``stats`` receives render/serialize seconds and the number of
+    slides taken from (fragment_hits) or added to (fragment_misses) the cache.
+    """
+    started_at = time.perf_counter()
+    hits = 0
+    
+    # Get theme colors
+    if theme not in THEMES:
+        theme = 'professional_blue'
+    template = get_theme_template(theme)
+    render_cache = get_render_cache()
+    
+    # ========== TITLE SLIDE ==========
+    slides = [(template['title_layout'], _render_title_slide(template, topic))]
     
     # ========== CONTENT SLIDES ==========
     for i, section in enumerate(sections, 1):
-        # Use blank layout for full control
-        content_slide_layout = prs.slide_layouts[6]
-        slide = prs.slides.add_slide(content_slide_layout)
-        
-        # Apply gradient background
-        apply_gradient_background(slide, theme_colors)
-        
-        # Get icon for this slide
-        icon = get_icon_for_title(section['title'])
-        
-        # Add title with icon
-        title_left = Inches(0.5)
-        title_top = Inches(0.5)
-        title_width = Inches(9)
-        title_height = Inches(1)
-        
-        title_box = slide.shapes.add_textbox(title_left, title_top, title_width, title_height)
-        title_frame = title_box.text_frame
-        
-        # Add icon if available
-        if icon:
-            title_frame.text = f"{icon}  {section['title']}"
+        key = fragment_key('pptx', theme, i, section['title'], section.get('content', ''))
+        slide_xml = render_cache.get(key)
+        if slide_xml is None:
+            slide_xml = _render_content_slide(template, i, section)
+            render_cache.set(key, slide_xml)
         else:
-            title_frame.text = section['title']
-        
-        # Style title
-        title_paragraph = title_frame.paragraphs[0]
-        title_paragraph.font.size = Pt(36)
-        title_paragraph.font.bold = True
-        title_paragraph.font.color.rgb = RGBColor(*theme_colors['title_color'])
-        
-        # Add decorative line under title
-        try:
-            line_shape = slide.shapes.add_shape(
-                1,  # Rectangle
-                Inches(0.5),
-                Inches(1.6),
-                Inches(9),
-                Inches(0.05)
-            )
-            line_shape.fill.solid()
-            line_shape.fill.fore_color.rgb = RGBColor(*theme_colors['accent_color'])
-            line_shape.line.fill.background()
-        except:
-            pass
-        
-        # Add content
-        content = section.get('content', '')
-        if content:
-            content_left = Inches(1)
-            content_top = Inches(2.2)
-            content_width = Inches(8)
-            content_height = Inches(4.5)
-            
-            content_box = slide.shapes.add_textbox(content_left, content_top, content_width, content_height)
-            text_frame = content_box.text_frame
-            text_frame.word_wrap = True
-            
-            # Clean the content
-            cleaned_content = clean_text_formatting(content)
-            
-            # Split into lines
-            lines = [line.strip() for line in cleaned_content.split('\n') if line.strip()]
-            
-            for j, line in enumerate(lines):
-                if j == 0:
-                    p = text_frame.paragraphs[0]
-                else:
-                    p = text_frame.add_paragraph()
-                
-                # Add bullet point
-                p.text = line
-                p.level = 0
-                p.font.size = Pt(20)
-                p.font.color.rgb = RGBColor(*theme_colors['text_color'])
-                p.space_before = Pt(14)
-                p.space_after = Pt(14)
-                p.line_spacing = 1.3
-                
-                # Add bullet
-                p.bullet = True
+            hits += 1
+        slides.append((template['content_layout'], slide_xml))
         
-        # Add decorative accent bar at bottom
-        add_decorative_bar(slide, theme_colors)
-        
-        # Add slide number
-        try:
-            slide_num_box = slide.shapes.add_textbox(
-                Inches(9),
-                Inches(7),
-                Inches(0.5),
-                Inches(0.3)
-            )
-            slide_num_frame = slide_num_box.text_frame
-            slide_num_frame.text = str(i)
-            slide_num_para = slide_num_frame.paragraphs[0]
-            slide_num_para.font.size = Pt(14)
-            slide_num_para.font.color.rgb = RGBColor(*theme_colors['text_color'])
-            slide_num_para.alignment = PP_ALIGN.RIGHT
-        except:
-            pass
-    
-    # Save to bytes
-    file_stream = io.BytesIO()
-    prs.save(file_stream)
-    file_stream.seek(0)
+        if progress:
+            progress(i, len(sections))
     
-    return file_stream.getvalue()
+    rendered_at = time.perf_counter()
+    _write_package(template, slides, output)
+    
+    if stats is not None:
+        stats.update(
+            render_seconds=rendered_at - started_at,
+            serialize_seconds=time.perf_counter() - rendered_at,
+            fragment_hits=hits,
+            fragment_misses=len(sections) - hits
+        )
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+
+from utils.metrics import PREFETCH_SECTIONS
+from utils.prompts import build_section_prompt
+from utils.rate_limiter import TokenBucket, estimate_tokens
+
+# ========== CONFIGURATION ==========
+DEFAULT_TOKENS_PER_MINUTE = 20000  # PREFETCH_TPM: speculative token budget (0 = no speculation)
+DEFAULT_MAX_SECTIONS = 10          # Sections speculated per outline
+DEFAULT_CONCURRENCY = 1            # Speculative calls in flight per worker
+DEFAULT_TTL = 600                  # Seconds an outline's speculation is kept
+QUOTA_HEADROOM = 0.5               # Share of the RPM/TPM buckets kept free for user requests
+IDLE_POLL_INTERVAL = 0.2           # Seconds between checks while user requests keep the model busy
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Speculative section generation for a freshly generated outline.
+
+    Each title's section prompt is sent at low priority: one call at a
+    time (``concurrency``), only while user requests leave the model's
+    concurrency limit and quota half free, and only while the token
+    budget lasts. The answers land in the LLM client's cache, so the
+    user's later generate-section or generate-document call for the same
+    topic and title is answered from it, or joins the speculative call
+    if it is still running. Editing (``update``) or discarding (``cancel``)
+    the outline cancels the titles that are no longer wanted.
+    """
+
+    def __init__(self, client, tokens_per_minute: int = None, max_sections: int = None,
+                 concurrency: int = None, ttl: float = None):
+        if tokens_per_minute is None:
+            tokens_per_minute = int(os.getenv('PREFETCH_TPM', DEFAULT_TOKENS_PER_MINUTE))
+        if max_sections is None:
+            max_sections = int(os.getenv('PREFETCH_MAX_SECTIONS', DEFAULT_MAX_SECTIONS))
+        if concurrency is None:
+            concurrency = int(os.getenv('PREFETCH_CONCURRENCY', DEFAULT_CONCURRENCY))
+        if ttl is None:
+            ttl = float(os.getenv('PREFETCH_TTL', DEFAULT_TTL))
+
+        self.client = client
+        self.budget = TokenBucket(tokens_per_minute)
+        self.max_sections = max_sections
+        self.ttl = ttl
+        self._semaphore = asyncio.Semaphore(max(concurrency, 1))
+        self._outlines = OrderedDict()  # outline id -> outline dict
+        self._entries = {}              # (doc type, topic, title) -> entry dict
+        self._running = 0
+        self.counts = {"queued": 0, "done": 0, "used": 0, "cancelled": 0, "skipped": 0, "expired": 0, "failed": 0}
+        self.tokens_spent = 0
+
+    @property
+    def enabled(self) -> bool:
+        cache = self.client.cache
+        return bool(self.budget.limit) and self.max_sections > 0 and cache is not None and cache.enabled
+
+    def start(self, topic: str, doc_type: str, titles: list):
+        """Queue speculation for an outline's titles; returns the outline id, or None if disabled"""
+        self._expire()
+        if not self.enabled:
+            return None
+        outline = {
+            "id": uuid.uuid4().hex,
+            "topic": topic,
+            "docType": doc_type,
+            "entries": [],
+            "expiresAt": time.monotonic() + self.ttl,
+        }
+        self._outlines[outline["id"]] = outline
+        for title in titles[:self.max_sections]:
+            self._queue(outline, title)
+        logger.info("Speculating on outline", extra={
+            "outlineId": outline["id"], "sections": len(outline["entries"])
+        })
+        return outline["id"]
+
+    def update(self, outline_id: str, topic: str, titles: list) -> dict:
+        """The user edited the outline: keep titles still in it, cancel the rest.
+
+        Returns the outline's status, or None for an unknown (or expired) id.
+        """
+        self._expire()
+        outline = self._outlines.get(outline_id)
+        if outline is None:
+            return None
+        wanted = set(titles) if topic == outline["topic"] else set()
+        for entry in outline["entries"]:
+            if entry["title"] not in wanted:
+                self._cancel(entry)
+        return self.status(outline_id)
+
+    def cancel(self, outline_id: str) -> bool:
+        """The user discarded the outline; False for an unknown id"""
+        outline = self._outlines.pop(outline_id, None)
+        if outline is None:
+            return False
+        for entry in outline["entries"]:
+            self._cancel(entry)
+            self._forget(entry)
+        return True
+
+    def cancel_all(self):
+        for outline_id in list(self._outlines):
+            self.cancel(outline_id)
+
+    def claim(self, topic: str, doc_type: str, title: str) -> bool:
+        """A user request wants this section now.
+
+        True if it was generated speculatively or is being generated, so the
+        request should send the same single-section prompt to get the cached
+        answer or join the call. A section still waiting for its turn is
+        cancelled instead; the request generates it itself.
+        """
+        entry = self._entries.get((doc_type, topic, title))
+        if entry is None:
+            return False
+        if entry["state"] == "queued":
+            self._cancel(entry)
+            return False
+        if entry["state"] not in ("running", "done"):
+            return False
+        if not entry["used"]:
+            entry["used"] = True
+            self._count("used")
+        return True
+
+    def status(self, outline_id: str):
+        outline = self._outlines.get(outline_id)
+        if outline is None:
+            return None
+        return {
+            "id": outline_id,
+            "topic": outline["topic"],
+            "docType": outline["docType"],
+            "sections": [{"title": e["title"], "state": e["state"]} for e in outline["entries"]],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "outlines": len(self._outlines),
+            "running": self._running,
+            "tokensSpent": self.tokens_spent,
+            "tokensPerMinute": self.budget.limit,
+            **self.counts,
+        }
+
+    # ---------- speculation ----------
+
+    def _queue(self, outline: dict, title: str):
+        key = (outline["docType"], outline["topic"], title)
+        current = self._entries.get(key)
+        if current is not None and current["state"] in ("queued", "running", "done"):
+            return  # Another outline already speculates on it
+        entry = {"key": key, "title": title, "state": "queued", "used": False, "task": None,
+                 "expiresAt": outline["expiresAt"]}
+        entry["task"] = asyncio.create_task(self._speculate(entry))
+        outline["entries"].append(entry)
+        self._entries[key] = entry
+        self._count("queued")
+
+    async def _speculate(self, entry: dict):
+        doc_type, topic, title = entry["key"]
+        prompt = build_section_prompt(topic, title, doc_type)
+        estimate = estimate_tokens(prompt)
+        async with self._semaphore:
+            if not await self._wait_until_idle(estimate, entry["expiresAt"]):
+                self._finish(entry, "expired")  # User requests kept the model busy for the outline's whole ttl
+                return
+            if self.budget.wait_time(estimate) > 0:
+                self._finish(entry, "skipped")
+                return
+            self.budget.take(estimate)
+            entry["state"] = "running"
+            self._running += 1
+            try:
+                text = await self.client.generate(prompt)
+            except asyncio.CancelledError:
+                self._finish(entry, "cancelled")
+                raise
+            except Exception as e:
+                logger.warning("Speculative section failed", extra={"error": str(e)})
+                self._finish(entry, "failed")
+                return
+            finally:
+                self._running -= 1
+        actual = estimate_tokens(prompt, len(text) // 4)
+        self.budget.take(actual - estimate)
+        self.tokens_spent += actual
+        self._finish(entry, "done")
+
+    async def _wait_until_idle(self, estimate: int, deadline: float) -> bool:
+        """Wait while user requests fill half the model's concurrency limit or its quota.
+
+        Returns False if that lasts until ``deadline`` (a ``time.monotonic()``).
+        """
+        limiter = self.client.limiter
+        while True:
+            if time.monotonic() >= deadline:
+                return False
+            user_calls = self.client.single_flight_stats()["inFlight"] - self._running
+            busy = (
+                user_calls >= max(self.client.max_concurrency // 2, 1)
+                or limiter.requests.wait_time(limiter.requests.rate * QUOTA_HEADROOM) > 0
+                or limiter.tokens.wait_time(max(limiter.tokens.rate * QUOTA_HEADROOM, estimate)) > 0
+            )
+            if not busy:
+                return True
+            await asyncio.sleep(min(IDLE_POLL_INTERVAL, max(deadline - time.monotonic(), 0)))
+
+    def _cancel(self, entry: dict):
+        if entry["state"] in ("queued", "running"):
+            entry["task"].cancel()
+            if entry["state"] == "queued":  # Cancelled before the task ran
+                self._finish(entry, "cancelled")
+
+    def _finish(self, entry: dict, state: str):
+        if entry["state"] in ("queued", "running"):
+            entry["state"] = state
+            self._count(state)
+
+    def _forget(self, entry: dict):
+        if self._entries.get(entry["key"]) is entry:
+            del self._entries[entry["key"]]
+
+    def _expire(self):
+        """Drop outlines past their ttl, cancelling what they still have queued or running"""
+        now = time.monotonic()
+        for outline_id, outline in list(self._outlines.items()):
+            if outline["expiresAt"] > now:
+                break
+            self.cancel(outline_id)
+
+    def _count(self, outcome: str):
+        self.counts[outcome] += 1
+        PREFETCH_SECTIONS.labels(outcome).inc()
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+# ========== CONFIGURATION ==========
+DEFAULT_DB_NAME = 'ai-doc-projects.db'  # In the temp dir unless PROJECT_STORE_DB names a file (':memory:' = per process)
+
+
+class ProjectNotFoundError(Exception):
+    """Raised for an unknown project or section id"""
+
+
+class VersionConflictError(Exception):
+    """Raised when an update names a version that is no longer the current one"""
+
+    def __init__(self, message: str, current_version: int):
+        super().__init__(message)
+        self.current_version = current_version
+
+
+class ProjectStore:
+    """Projects (topic, doc type, theme) and their sections in SQLite.
+
+    Clients upload a project once and then send per-section deltas. Every
+    section carries a version that each change increments; an update must
+    name the version it was based on, so two editors can't silently
+    overwrite each other. The project version increments with any change
+    to the project or one of its sections.
+    """
+
+    def __init__(self, db_path: str = None):
+        if db_path is None:
+            db_path = os.getenv('PROJECT_STORE_DB') or os.path.join(tempfile.gettempdir(), DEFAULT_DB_NAME)
+
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = self._open_db(db_path)
+
+    @staticmethod
+    def _open_db(db_path: str):
+        db = sqlite3.connect(db_path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS projects ("
+            "id TEXT PRIMARY KEY, topic TEXT NOT NULL, doc_type TEXT NOT NULL, theme TEXT, "
+            "version INTEGER NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS project_sections ("
+            "project_id TEXT NOT NULL, id INTEGER NOT NULL, position INTEGER NOT NULL, "
+            "title TEXT NOT NULL, content TEXT NOT NULL, version INTEGER NOT NULL, "
+            "PRIMARY KEY (project_id, id))"
+        )
+        return db
+
+    # ---------- projects ----------
+
+    def create(self, topic: str, doc_type: str, theme: str, sections: list) -> dict:
+        """Store a new project; ``sections`` are dicts with id, title and content.
+
+        Raises ValueError if two sections share an id.
+        """
+        ids = [s["id"] for s in sections]
+        if len(set(ids)) != len(ids):
+            duplicates = sorted({i for i in ids if ids.count(i) > 1})
+            raise ValueError(f"Duplicate section ids: {', '.join(map(str, duplicates))}")
+        project_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._db.execute(
+                "INSERT INTO projects (id, topic, doc_type, theme, version, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?)",
+                (project_id, topic, doc_type, theme, now, now)
+            )
+            self._db.executemany(
+                "INSERT INTO project_sections (project_id, id, position, title, content, version) "
+                "VALUES (?, ?, ?, ?, ?, 1)",
+                [(project_id, s["id"], position, s["title"], s.get("content") or "")
+                 for position, s in enumerate(sections)]
+            )
+        return self.get(project_id, with_content=False)
+
+    def get(self, project_id: str, with_content: bool = True) -> dict:
+        """The project and its sections in order; without content, only titles and versions"""
+        with self._lock:
+            project = self._project_row(project_id)
+            columns = "id, title, version, content" if with_content else "id, title, version"
+            rows = self._db.execute(
+                f"SELECT {columns} FROM project_sections WHERE project_id = ? ORDER BY position",
+                (project_id,)
+            ).fetchall()
+        topic, doc_type, theme, version, updated_at = project
+        sections = []
+        for row in rows:
+            section = {"id": row[0], "title": row[1], "version": row[2]}
+            if with_content:
+                section["content"] = row[3]
+            sections.append(section)
+        return {
+            "id": project_id,
+            "topic": topic,
+            "docType": doc_type,
+            "theme": theme,
+            "version": version,
+            "updatedAt": updated_at,
+            "sections": sections
+        }
+
+    def update(self, project_id: str, version: int, **fields) -> dict:
+        """Change topic, docType and/or theme if the project is still at ``version``"""
+        columns = {"topic": "topic", "docType": "doc_type", "theme": "theme"}
+        changes = {columns[name]: value for name, value in fields.items() if value is not None}
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            current = self._project_row(project_id)[3]
+            if current != version:
+                raise VersionConflictError(f"Project is at version {current}, not {version}", current)
+            assignments = ''.join(f"{column} = ?, " for column in changes)
+            self._db.execute(
+                f"UPDATE projects SET {assignments}version = version + 1, updated_at = ? WHERE id = ?",
+                (*changes.values(), time.time(), project_id)
+            )
+        return self.get(project_id, with_content=False)
+
+    def delete(self, project_id: str):
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._project_row(project_id)
+            self._db.execute("DELETE FROM project_sections WHERE project_id = ?", (project_id,))
+            self._db.execute("DELETE FROM projects WHERE id = ?", (project_id,))
+
+    # ---------- sections ----------
+
+    def update_section(self, project_id: str, section_id: int, version: int,
+                       title: str = None, content: str = None) -> dict:
+        """Apply a delta to one section if it is still at ``version``"""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            current = self._section_version(project_id, section_id)
+            if current != version:
+                raise VersionConflictError(f"Section {section_id} is at version {current}, not {version}", current)
+            self._db.execute(
+                "UPDATE project_sections SET title = COALESCE(?, title), content = COALESCE(?, content), "
+                "version = version + 1 WHERE project_id = ? AND id = ?",
+                (title, content, project_id, section_id)
+            )
+            project_version = self._touch(project_id)
+        return {"id": section_id, "version": version + 1, "projectVersion": project_version}
+
+    def add_section(self, project_id: str, title: str, content: str = "") -> dict:
+        """Append a section with the next free id"""
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._project_row(project_id)
+            next_id, next_position = self._db.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1, COALESCE(MAX(position), -1) + 1 "
+                "FROM project_sections WHERE project_id = ?",
+                (project_id,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT INTO project_sections (project_id, id, position, title, content, version) "
+                "VALUES (?, ?, ?, ?, ?, 1)",
+                (project_id, next_id, next_position, title, content or "")
+            )
+            project_version = self._touch(project_id)
+        return {"id": next_id, "version": 1, "projectVersion": project_version}
+
+    def delete_section(self, project_id: str, section_id: int, version: int) -> dict:
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            current = self._section_version(project_id, section_id)
+            if current != version:
+                raise VersionConflictError(f"Section {section_id} is at version {current}, not {version}", current)
+            self._db.execute(
+                "DELETE FROM project_sections WHERE project_id = ? AND id = ?", (project_id, section_id)
+            )
+            project_version = self._touch(project_id)
+        return {"projectVersion": project_version}
+
+    def save_contents(self, project_id: str, contents: dict) -> dict:
+        """Store generated content, {section id: (content, version it was generated from)}.
+
+        Sections edited while the content was being generated keep the
+        edit. Returns {section id: new version, or None if it was skipped}.
+        """
+        saved = {}
+        with self._lock, self._db:
+            self._db.execute("BEGIN")
+            self._project_row(project_id)
+            for section_id, (content, version) in contents.items():
+                updated = self._db.execute(
+                    "UPDATE project_sections SET content = ?, version = version + 1 "
+                    "WHERE project_id = ? AND id = ? AND version = ?",
+                    (content, project_id, section_id, version)
+                ).rowcount
+                saved[section_id] = version + 1 if updated else None
+            if any(new_version is not None for new_version in saved.values()):
+                self._touch(project_id)
+        return saved
+
+    def stats(self) -> dict:
+        with self._lock:
+            projects, = self._db.execute("SELECT COUNT(*) FROM projects").fetchone()
+            sections, content_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(CAST(content AS BLOB))), 0) FROM project_sections"
+            ).fetchone()
+        return {"projects": projects, "sections": sections, "contentBytes": content_bytes, "db": self.db_path}
+
+    # ---------- helpers (caller holds the lock) ----------
+
+    def _project_row(self, project_id: str):
+        row = self._db.execute(
+            "SELECT topic, doc_type, theme, version, updated_at FROM projects WHERE id = ?", (project_id,)
+        ).fetchone()
+        if row is None:
+            raise ProjectNotFoundError(f"Project {project_id} not found")
+        return row
+
+    def _section_version(self, project_id: str, section_id: int) -> int:
+        row = self._db.execute(
+            "SELECT version FROM project_sections WHERE project_id = ? AND id = ?", (project_id, section_id)
+        ).fetchone()
+        if row is None:
+            self._project_row(project_id)
+            raise ProjectNotFoundError(f"Section {section_id} not found in project {project_id}")
+        return row[0]
+
+    def _touch(self, project_id: str) -> int:
+        """Bump the project version; returns the new one"""
+        self._db.execute(
+            "UPDATE projects SET version = version + 1, updated_at = ? WHERE id = ?", (time.time(), project_id)
+        )
+        return self._db.execute("SELECT version FROM projects WHERE id = ?", (project_id,)).fetchone()[0]
@@ -0,0 +1,124 @@
+import json
+import re
+
+# Packed prompts put all the sections of a batch in one call; the model answers
+# with this JSON shape and parse_packed_sections maps it back to the sections
+PACKED_MARKER = "Return ONLY a JSON object"
+JSON_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def build_section_prompt(topic: str, section_title: str, doc_type: str) -> str:
+    """Build the Gemini prompt for a single document section or slide"""
+    if doc_type == "docx":
+        return f"""
+You are writing a section for a professional document about: {topic}
+
+Section Title: {section_title}
+
+Write detailed, well-structured content for this section (3-4 paragraphs).
+Make it professional, informative, and engaging.
+Use clear language and proper formatting.
+Do not include the section title in your response.
+"""
+
+    # pptx
+    return f"""
+You are creating content for a PowerPoint slide about: {topic}
+
+Slide Title: {section_title}
+
+Write concise, impactful content for this slide (4-6 bullet points).
+Keep it brief and presentation-friendly.
+Each point should be clear and actionable.
+Do not include the slide title in your response.
+Format as bullet points using • symbol.
+"""
+
+
+def build_packed_sections_prompt(topic: str, section_titles: list, doc_type: str) -> str:
+    """Build one Gemini prompt asking for several sections as a JSON object"""
+    listing = "\n".join(f"{n}. {title}" for n, title in enumerate(section_titles, 1))
+    if doc_type == "docx":
+        kind = "sections for a professional document"
+        style = """For each section write detailed, well-structured content (3-4 paragraphs).
+Make it professional, informative, and engaging.
+Use clear language and proper formatting."""
+    else:
+        kind = "PowerPoint slides"
+        style = """For each slide write concise, impactful content (4-6 bullet points).
+Keep it brief and presentation-friendly.
+Each point should be clear and actionable.
+Format as bullet points using • symbol."""
+
+    return f"""
+You are writing {len(section_titles)} {kind} about: {topic}
+
+{listing}
+
+{style}
+Do not include the section or slide title in its content.
+
+{PACKED_MARKER}, no other text, in exactly this shape with EXACTLY {len(section_titles)} entries:
+{{"sections": [{{"index": 1, "content": "..."}}, {{"index": 2, "content": "..."}}]}}
+"index" is the number from the list above; "content" is that section's text with \\n for line breaks.
+"""
+
+
+def parse_packed_sections(text: str, count: int) -> dict:
+    """Section contents by 1-based index from a packed response.
+
+    Entries that are missing, duplicated, out of range or empty are left
+    out, so the caller can generate just those sections separately. An
+    unparseable response gives an empty dict.
+    """
+    try:
+        data = json.loads(JSON_FENCE.sub('', text.strip()))
+    except ValueError:
+        return {}
+    entries = data.get("sections") if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+
+    contents = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        index, content = entry.get("index"), entry.get("content")
+        if isinstance(index, int) and 1 <= index <= count and index not in contents \
+                and isinstance(content, str) and content.strip():
+            contents[index] = content.strip()
+    return contents
+
+
+def build_refine_prompt(current_content: str, instruction: str) -> str:
+    """Build the Gemini prompt for rewriting a section per user instruction"""
+    return f"""
+Current Content:
+{current_content}
+
+User Instruction: {instruction}
+
+Rewrite the content following the user's instruction.
+Maintain professional quality and coherence.
+Keep the same general structure unless asked to change it.
+Do not add any preamble or explanation, just provide the refined content.
+"""
+
+
+def build_span_refine_prompt(target: str, instruction: str, before: str = '', after: str = '') -> str:
+    """Build the Gemini prompt for rewriting only part of a section; the lines around it are context"""
+    surroundings = ""
+    if before:
+        surroundings += f"\nText just before it (do not repeat):\n{before}\n"
+    if after:
+        surroundings += f"\nText just after it (do not repeat):\n{after}\n"
+    return f"""
+Part of a longer section to rewrite:
+{target}
+{surroundings}
+User Instruction: {instruction}
+
+Rewrite only this part following the user's instruction, so it still fits between the surrounding text.
+Keep its formatting (bullet symbols, bold markers) unless asked to change it.
+Do not add any preamble or explanation, just provide the rewritten part.
+"""
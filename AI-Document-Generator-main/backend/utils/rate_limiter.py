@@ -0,0 +1,161 @@
+import asyncio
+import os
+import random
+import time
+
+# ========== CONFIGURATION ==========
+DEFAULT_RPM = 1000                 # GEMINI_RPM: requests per minute per model (0 = unlimited)
+DEFAULT_TPM = 1_000_000            # GEMINI_TPM: prompt + output tokens per minute per model (0 = unlimited)
+DEFAULT_OUTPUT_TOKENS = 800        # Output tokens reserved per call until the real usage is known
+MIN_RATE_FRACTION = 0.05           # Throttling never drops below this fraction of the configured rate
+THROTTLE_FACTOR = 0.5              # Rate multiplier after an upstream 429
+THROTTLE_COOLDOWN = 2.0            # Seconds in which further 429s don't lower the rate again
+RECOVERY_FRACTION = 0.02           # Share of the configured rate regained per successful call
+
+DEFAULT_MAX_RETRIES = 3            # GEMINI_MAX_RETRIES: extra attempts after a 429/5xx
+BACKOFF_BASE = 0.5                 # Seconds; attempt n waits up to BACKOFF_BASE * 2**n
+BACKOFF_CAP = 8.0
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class LLMRateLimitError(Exception):
+    """Raised when the quota leaves no room for a call before its deadline"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ========== TOKEN BUCKETS ==========
+
+class TokenBucket:
+    """Refills ``rate`` units per minute up to one minute's worth.
+
+    Takes may overdraw the bucket (an estimate that turned out low); the
+    debt is paid back by the refill before anything else gets through.
+    """
+
+    def __init__(self, per_minute: float):
+        self.limit = per_minute
+        self.rate = per_minute
+        self.level = per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.rate, self.level + (now - self._updated) * self.rate / 60)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` can be taken (0 if it can be now)"""
+        if not self.limit:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.rate)  # A call larger than the bucket waits for a full one
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60 / self.rate
+
+    def take(self, amount: float):
+        if self.limit:
+            self._refill()
+            self.level -= amount
+
+    def scale(self, factor: float):
+        """Multiply the current rate, staying between the floor and the configured limit"""
+        if self.limit:
+            self._refill()
+            self.rate = max(self.limit * MIN_RATE_FRACTION, min(self.limit, self.rate * factor))
+            self.level = min(self.level, self.rate)
+
+
+class QuotaLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one model.
+
+    The rate halves on an upstream 429 (once per burst of them) and creeps
+    back to the configured limit as calls succeed (AIMD), so a quota lower
+    than configured is found within a few calls. Callers are given slots in
+    arrival order without holding each other up.
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None):
+        if rpm is None:
+            rpm = int(os.getenv('GEMINI_RPM', DEFAULT_RPM))
+        if tpm is None:
+            tpm = int(os.getenv('GEMINI_TPM', DEFAULT_TPM))
+
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.throttled = 0
+        self.waited_seconds = 0.0
+        self._throttled_at = None
+
+    async def acquire(self, tokens: int, deadline: float = None):
+        """Wait for room for one call of ``tokens`` tokens.
+
+        ``deadline`` is a ``loop.time()``; if the wait would pass it,
+        LLMRateLimitError is raised right away instead of sleeping.
+        """
+        loop = asyncio.get_running_loop()
+        wait = max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+        if deadline is not None and wait > 0 and loop.time() + wait > deadline:
+            raise LLMRateLimitError(
+                f"Gemini quota reached, next call possible in {wait:.0f}s", retry_after=wait
+            )
+        # Reserve now (the buckets may go negative) and sleep off the debt: later
+        # callers see the longer wait at once instead of queueing behind this one
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        if wait <= 0:
+            return
+        self.waited_seconds += wait
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self.requests.take(-1)  # Hand the slot back to the callers behind
+            self.tokens.take(-tokens)
+            raise
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token bucket once the call reports its real usage"""
+        self.tokens.take(actual - estimated)
+
+    def on_throttled(self):
+        self.throttled += 1
+        now = time.monotonic()
+        if self._throttled_at is not None and now - self._throttled_at < THROTTLE_COOLDOWN:
+            return  # Calls already in flight when the quota ran out
+        self._throttled_at = now
+        self.requests.scale(THROTTLE_FACTOR)
+        self.tokens.scale(THROTTLE_FACTOR)
+
+    def on_success(self):
+        for bucket in (self.requests, self.tokens):
+            if bucket.limit and bucket.rate < bucket.limit:
+                bucket.scale(1 + RECOVERY_FRACTION * bucket.limit / bucket.rate)
+
+    def stats(self) -> dict:
+        return {
+            "rpm": round(self.requests.rate, 1),
+            "rpmLimit": self.requests.limit,
+            "tpm": round(self.tokens.rate),
+            "tpmLimit": self.tokens.limit,
+            "throttled": self.throttled,
+            "waitedSeconds": round(self.waited_seconds, 3),
+        }
+
+
+# ========== RETRIES ==========
+
+def upstream_status(error: Exception):
+    """HTTP status of a Gemini SDK error (google.api_core exceptions carry ``code``)"""
+    code = getattr(error, 'code', None)
+    return code if isinstance(code, int) else None
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+def estimate_tokens(prompt: str, output_tokens: int = DEFAULT_OUTPUT_TOKENS) -> int:
+    """Tokens to reserve for a call: about four characters per prompt token plus the output"""
+    return len(prompt) // 4 + 1 + output_tokens
@@ -0,0 +1,37 @@
+import hashlib
+import json
+import os
+
+from utils.llm_cache import LLMCache
+
+# ========== CONFIGURATION ==========
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024   # Per-process budget for rendered fragments
+DEFAULT_TTL = 7 * 24 * 60 * 60         # Seconds a rendered fragment stays valid
+
+# Bump when generator output changes so stale renders (and ETags) are not reused
+RENDER_VERSION = 3
+
+_render_cache = None  # Built on first use, one per process
+
+
+def fragment_key(*parts) -> str:
+    """Content hash of everything that determines one rendered slide or section"""
+    payload = json.dumps([RENDER_VERSION, *parts], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_render_cache() -> LLMCache:
+    """Cache of rendered slide XML and docx section fragments.
+
+    Each export worker keeps its own in-process LRU; set RENDER_CACHE_DB to
+    share fragments between workers (and restarts) through SQLite.
+    """
+    global _render_cache
+    if _render_cache is None:
+        _render_cache = LLMCache(
+            max_bytes=int(os.getenv('RENDER_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)),
+            ttl=float(os.getenv('RENDER_CACHE_TTL', DEFAULT_TTL)),
+            db_path=os.getenv('RENDER_CACHE_DB') or '',
+            table='render_cache'
+        )
+    return _render_cache
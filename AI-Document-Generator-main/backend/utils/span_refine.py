@@ -0,0 +1,178 @@
+import os
+import re
+from typing import NamedTuple, Optional
+
+from utils.text_normalizer import LINE
+
+# ========== CONFIGURATION ==========
+CONTEXT_LINES = int(os.getenv('REFINE_CONTEXT_LINES', 1))         # Read-only lines sent on each side of the span
+AUTO_MIN_CHARS = int(os.getenv('REFINE_SPAN_MIN_CHARS', 600))     # Shorter sections are always refined whole
+AUTO_MAX_FRACTION = 0.5            # A guessed span covering more of the section than this is refined whole
+
+ORDINALS = {
+    'first': 1, 'second': 2, 'third': 3, 'fourth': 4, 'fifth': 5,
+    'sixth': 6, 'seventh': 7, 'eighth': 8, 'ninth': 9, 'tenth': 10, 'last': -1,
+}
+# "the third bullet", "2nd paragraph", "last point" / "bullet 3", "point #2"
+ORDINAL_BEFORE = re.compile(
+    r'\b(first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|last|\d+)(?:st|nd|rd|th)?\s+'
+    r'(bullet|point|item|paragraph|line|sentence)s?\b', re.I
+)
+ORDINAL_AFTER = re.compile(r'\b(bullet|point|item|paragraph|line)\s+(?:#|no\.?\s*|number\s+)?(\d+)\b', re.I)
+QUOTED = re.compile(r'"([^"]{3,})"|“([^”]{3,})”|\'([^\']{3,})\'')
+# Instructions about the whole section can't be narrowed down
+WHOLE_SECTION = re.compile(r'\b(whole|entire|all|every|everything|overall|throughout|each)\b', re.I)
+WORD = re.compile(r'[a-z0-9][a-z0-9\'-]{3,}')
+INSTRUCTION_WORDS = frozenset((
+    'make', 'more', 'less', 'shorter', 'longer', 'rewrite', 'change', 'replace', 'remove', 'delete', 'expand',
+    'shorten', 'simplify', 'clarify', 'about', 'with', 'that', 'this', 'into', 'instead', 'should', 'please',
+    'bullet', 'point', 'paragraph', 'line', 'sentence', 'section', 'slide', 'text', 'content', 'word', 'words',
+    'formal', 'casual', 'concise', 'detailed', 'professional', 'friendly', 'mention', 'add', 'fix', 'them', 'their',
+))
+
+
+class Span(NamedTuple):
+    """Character range of whole lines in the section, end exclusive"""
+    start: int
+    end: int
+
+
+def _lines(content: str) -> list:
+    """(start, end, is_bullet) of every non-blank line, ends excluding trailing whitespace"""
+    lines = []
+    for match in LINE.finditer(content):
+        text = match.group(0)
+        if text.strip():
+            lines.append((match.start(), match.start() + len(text.rstrip()), bool(match.group(2))))
+    return lines
+
+
+def expand_to_lines(content: str, start: int, end: int) -> Span:
+    """Widen a character range to the whole lines it touches"""
+    line_start = content.rfind('\n', 0, start) + 1
+    line_end = content.find('\n', max(end - 1, start))
+    if line_end == -1:
+        line_end = len(content)
+    return Span(line_start, line_start + len(content[line_start:line_end].rstrip()))
+
+
+def context(content: str, span: Span, lines: int = CONTEXT_LINES) -> tuple:
+    """Up to ``lines`` non-blank lines before and after the span"""
+    before = [content[s:e] for s, e, _ in _lines(content[:span.start])][-lines:] if lines else []
+    after = [content[span.end + s:span.end + e] for s, e, _ in _lines(content[span.end:])][:lines] if lines else []
+    return '\n'.join(before), '\n'.join(after)
+
+
+def splice(content: str, span: Span, replacement: str) -> tuple:
+    """Put the refined text in place of the span, keeping the span's indentation.
+
+    An empty replacement (e.g. "remove the third bullet") takes the line
+    break after the span with it. Returns (content, span of the new text).
+    """
+    replacement = replacement.strip('\n')
+    if not replacement.strip():
+        end = span.end + 1 if content[span.end:span.end + 1] == '\n' else span.end
+        return content[:span.start] + content[end:], Span(span.start, span.start)
+    original = content[span.start:span.end]
+    indent = original[:len(original) - len(original.lstrip())]
+    if indent and not replacement[:1].isspace():
+        replacement = indent + replacement
+    return content[:span.start] + replacement + content[span.end:], Span(span.start, span.start + len(replacement))
+
+
+def _nth(items: list, position: int):
+    if position == -1:
+        return items[-1] if items else None
+    return items[position - 1] if 0 < position <= len(items) else None
+
+
+def _paragraphs(content: str, lines: list) -> list:
+    """(start, end) of runs of consecutive non-bullet lines"""
+    paragraphs = []
+    joins_previous = False  # The last line was a paragraph line right above this one
+    for start, end, is_bullet in lines:
+        if is_bullet:
+            joins_previous = False
+            continue
+        if joins_previous and content.count('\n', paragraphs[-1][1], start) == 1:
+            paragraphs[-1] = (paragraphs[-1][0], end)
+        else:
+            paragraphs.append((start, end))
+        joins_previous = True
+    return paragraphs
+
+
+def _ordinal_span(content: str, lines: list, instruction: str) -> Optional[Span]:
+    match = ORDINAL_BEFORE.search(instruction)
+    if match:
+        word, kind = match.group(1).lower(), match.group(2).lower()
+        position = int(word) if word.isdigit() else ORDINALS[word]
+    else:
+        match = ORDINAL_AFTER.search(instruction)
+        if not match:
+            return None
+        kind, position = match.group(1).lower(), int(match.group(2))
+
+    if kind in ('bullet', 'point', 'item'):
+        candidates = [(s, e) for s, e, is_bullet in lines if is_bullet] or [(s, e) for s, e, _ in lines]
+    elif kind == 'paragraph':
+        candidates = _paragraphs(content, lines)
+    elif kind == 'line':
+        candidates = [(s, e) for s, e, _ in lines]
+    else:  # sentence: the line holding it
+        return None
+    chosen = _nth(candidates, position)
+    return Span(*chosen) if chosen else None
+
+
+def _keyword_span(content: str, lines: list, instruction: str) -> Optional[Span]:
+    """Lines sharing the most of the instruction's distinctive words (or containing a quoted phrase)"""
+    lowered = content.lower()
+    for groups in QUOTED.findall(instruction):
+        phrase = next(g for g in groups if g).lower()
+        at = lowered.find(phrase)
+        if at != -1:
+            return expand_to_lines(content, at, at + len(phrase))
+
+    words = {word for word in WORD.findall(instruction.lower()) if word not in INSTRUCTION_WORDS}
+    if not words:
+        return None
+    scores = [len(words & set(WORD.findall(lowered[s:e]))) for s, e, _ in lines]
+    best = max(scores)
+    matching = [line for line, score in zip(lines, scores) if score == best]
+    if not best or len(matching) == len(lines):
+        return None
+    return Span(matching[0][0], matching[-1][1])
+
+
+def find_span(content: str, instruction: str) -> Optional[Span]:
+    """Guess the lines an instruction is about, or None to refine the whole section"""
+    if len(content) < AUTO_MIN_CHARS or WHOLE_SECTION.search(instruction):
+        return None
+    lines = _lines(content)
+    if len(lines) < 3:
+        return None
+    span = _ordinal_span(content, lines, instruction) or _keyword_span(content, lines, instruction)
+    if span is None or span.end - span.start > len(content) * AUTO_MAX_FRACTION:
+        return None
+    return span
+
+
+def resolve_span(content: str, instruction: str, target_span: list = None, target_text: str = None,
+                 auto: bool = False) -> Optional[Span]:
+    """The span to refine: the client's character range or text, else a guess if ``auto``.
+
+    Raises ValueError for a range outside the content or text it doesn't contain.
+    """
+    if target_span is not None:
+        if len(target_span) != 2 or not 0 <= target_span[0] < target_span[1] <= len(content):
+            raise ValueError(f"targetSpan must be [start, end) within the {len(content)} characters of currentContent")
+        return expand_to_lines(content, target_span[0], target_span[1])
+    if target_text:
+        at = content.find(target_text)
+        if at == -1:
+            raise ValueError("targetText does not occur in currentContent")
+        return expand_to_lines(content, at, at + len(target_text))
+    if auto:
+        return find_span(content, instruction)
+    return None
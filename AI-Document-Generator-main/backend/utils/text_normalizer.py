@@ -0,0 +1,130 @@
+import re
+from typing import List, NamedTuple
+
+# ========== CONFIGURATION ==========
+INDENT_WIDTH = 2                   # Spaces of indentation per bullet level
+MAX_LEVEL = 4                      # Deepest bullet level kept; deeper items are clamped
+MAX_TITLE_WORDS = 15               # Longer outline lines are descriptions, not titles
+TAB_WIDTH = 4
+
+# Outline lines containing these are the model talking about its answer
+OUTLINE_SKIP_PHRASES = ('here are', 'these are', 'following', 'presentation', 'document', 'titles', 'for an', 'about')
+
+# ========== PATTERNS ==========
+# One match per line: indent, list marker ("• " with the space optional,
+# "- ", "* ", "+ "), heading marker ("# " to "###### ") and the rest
+LINE = re.compile(r'^([ \t]*)(?:(•[ \t]*|[-*+][ \t]+)|(#{1,6}[ \t]+))?(.*)$', re.MULTILINE)
+NUMBERED = re.compile(r'\d+\s*[.)]\s*(.*)')
+# ***bold italic***, **bold**, *italic* (no space just inside the asterisks)
+EMPHASIS = re.compile(r'\*\*\*(.+?)\*\*\*|\*\*(.+?)\*\*|\*(?=\S)(.+?)(?<=\S)\*')
+
+
+class Run(NamedTuple):
+    text: str
+    bold: bool = False
+    italic: bool = False
+
+
+class Block(NamedTuple):
+    """One line of content: a 'paragraph', 'bullet' or 'heading'.
+
+    ``continues`` marks a paragraph line that directly follows another one
+    (no blank line between); documents join those with a line break.
+    """
+    kind: str
+    runs: tuple
+    level: int = 0
+    continues: bool = False
+
+    @property
+    def text(self) -> str:
+        return ''.join(run.text for run in self.runs)
+
+
+# ========== PARSING ==========
+# Blocks and runs are built with tuple.__new__: a NamedTuple's own
+# constructor is a Python-level call and dominates parsing time
+_tuple = tuple.__new__
+
+
+def parse_runs(text: str) -> tuple:
+    """Split one line into runs, turning **bold** and *italic* markers into flags"""
+    if '*' not in text:
+        return (_tuple(Run, (text, False, False)),)
+    # split() interleaves plain text with the three emphasis groups
+    parts = EMPHASIS.split(text)
+    runs = []
+    for i in range(0, len(parts) - 1, 4):
+        if parts[i]:
+            runs.append(_tuple(Run, (parts[i], False, False)))
+        both, bold, italic = parts[i + 1:i + 4]
+        if both is not None:
+            runs.append(_tuple(Run, (both, True, True)))
+        elif bold is not None:
+            runs.append(_tuple(Run, (bold, True, False)))
+        else:
+            runs.append(_tuple(Run, (italic, False, True)))
+    if parts[-1]:
+        runs.append(_tuple(Run, (parts[-1], False, False)))
+    return tuple(runs)
+
+def parse_content(text: str) -> List[Block]:
+    """Parse LLM markdown into blocks in one pass over its lines"""
+    blocks = []
+    after_paragraph = False
+    for indent, bullet, heading, rest in LINE.findall(text):
+        rest = rest.rstrip()
+        if not rest:
+            after_paragraph = False
+        elif bullet:
+            level = min(len(indent.expandtabs(TAB_WIDTH)) // INDENT_WIDTH, MAX_LEVEL)
+            blocks.append(_tuple(Block, ('bullet', parse_runs(rest), level, False)))
+            after_paragraph = False
+        elif heading:
+            blocks.append(_tuple(Block, ('heading', parse_runs(rest), 0, False)))
+            after_paragraph = False
+        else:
+            blocks.append(_tuple(Block, ('paragraph', parse_runs(rest), 0, after_paragraph)))
+            after_paragraph = True
+    return blocks
+
+def plain_text(text: str) -> str:
+    """Content without markdown markers, one block per line"""
+    return '\n'.join(block.text for block in parse_content(text))
+
+def parse_outline(text: str) -> List[str]:
+    """Titles from an outline answer: one per line, without numbering, bullets,
+    emphasis or lines where the model explains itself"""
+    # Line by line with string checks: the marker, number and emphasis
+    # patterns only run on lines that can contain them
+    titles = []
+    for line in text.split('\n'):
+        line = line.lstrip(' \t')
+        if not line:
+            continue
+        first = line[0]  # Drop the list or heading marker, as LINE would
+        if first == '•':
+            line = line[1:]
+        elif first in '-*+' and line[1:2] in (' ', '\t'):
+            line = line[2:]
+        elif first == '#':
+            line = LINE.match(line).group(4)
+        line = line.strip()
+        if not line:
+            continue
+        lowered = line.lower()
+        if any(phrase in lowered for phrase in OUTLINE_SKIP_PHRASES):
+            continue
+        if line[:1].isdigit():
+            numbered = NUMBERED.match(line)
+            if numbered is not None:
+                line = numbered.group(1)
+        if '*' in line:
+            inner = line[2:-2]
+            if len(line) > 4 and line[:2] == line[-2:] == '**' and '*' not in inner:
+                line = inner.strip()  # The usual **Title**
+            else:
+                line = ''.join(run.text for run in parse_runs(line)).strip()
+        if line and len(line.split()) <= MAX_TITLE_WORDS:
+            titles.append(line)
+    return titles
@@ -0,0 +1,61 @@
+import time
+import zipfile
+
+# ========== CONFIGURATION ==========
+CHUNK_SIZE = 64 * 1024
+
+
+class ZipStream:
+    """Writes a ZIP archive piece by piece for a streaming response.
+
+    The ZipFile writes into this object, which has no ``tell``/``seek``, so
+    zipfile falls back to its streaming layout (sizes and CRC in a data
+    descriptor after each member). Whatever it wrote so far is handed back
+    by the ``add_*`` and ``close`` methods; nothing but the member being
+    copied is held in memory. Members are stored, not compressed: DOCX and
+    PPTX files are already deflated ZIPs.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._zip = zipfile.ZipFile(self, 'w', compression=zipfile.ZIP_STORED)
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def _drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+    def _info(self, name: str, size: int) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        info.file_size = size  # Lets zipfile decide on ZIP64 before the data is written
+        return info
+
+    def add_file(self, name: str, file, size: int, chunk_size: int = CHUNK_SIZE):
+        """Copy an open binary file into the archive, yielding the archive bytes as they are produced"""
+        with self._zip.open(self._info(name, size), 'w') as member:
+            while True:
+                chunk = file.read(chunk_size)
+                if not chunk:
+                    break
+                member.write(chunk)
+                yield self._drain()
+        yield self._drain()
+
+    def add_bytes(self, name: str, data: bytes) -> bytes:
+        """Add a small in-memory member; returns the archive bytes it produced"""
+        self._zip.writestr(self._info(name, len(data)), data)
+        return self._drain()
+
+    def close(self) -> bytes:
+        """Finish the archive; returns the central directory bytes"""
+        self._zip.close()
+        return self._drain()
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { doc, getDoc, updateDoc } from 'firebase/firestore';
 import { db, auth } from '../firebase';
@@ -20,10 +20,24 @@ function ConfigurePPT() {
   const [saving, setSaving] = useState(false);
   const [suggesting, setSuggesting] = useState(false); // ✅ NEW: AI suggestion state
   const [selectedTheme, setSelectedTheme] = useState('professional_blue'); // ADD THIS LINE
+  // Outline whose section content the backend is pre-generating
+  const outlineId = useRef(null);
+  // Topic of the last AI suggestion; suggesting again for it asks for fresh titles
+  const suggestedTopic = useRef(null);
+
   useEffect(() => {
     loadProject();
   }, [projectId]);
 
+  // Leaving without generating discards the outline, cancelling its pre-generation
+  useEffect(() => () => discardOutline(), []);
+
+  const discardOutline = () => {
+    if (!outlineId.current) return;
+    fetch(`${API_URL}/api/outlines/${outlineId.current}`, { method: 'DELETE', keepalive: true }).catch(() => {});
+    outlineId.current = null;
+  };
+
   const loadProject = async () => {
     try {
       const userId = auth.currentUser.uid;
@@ -58,15 +72,18 @@ function ConfigurePPT() {
     }
 
     setSuggesting(true);
+    discardOutline();
     try {
       const response = await fetch(
-        `${API_URL}/api/generate-template?topic=${encodeURIComponent(topic)}&doc_type=pptx&num_sections=5`,
-        { method: 'POST' }
+        `${API_URL}/api/generate-template?topic=${encodeURIComponent(topic)}&doc_type=pptx&num_sections=5&prefetch=true`,
+        { method: 'POST', headers: topic === suggestedTopic.current ? { 'Cache-Control': 'no-cache' } : {} }
       );
 
       if (!response.ok) throw new Error('Failed to generate template');
 
       const data = await response.json();
+      outlineId.current = data.outlineId || null;
+      suggestedTopic.current = topic;
       
       // Replace current sections with AI suggestions
       setSections(data.sections);
@@ -110,6 +127,16 @@ function ConfigurePPT() {
       lastModified: new Date()
     });
 
+    // Keep pre-generating only the titles the user kept
+    if (outlineId.current) {
+      fetch(`${API_URL}/api/outlines/${outlineId.current}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ topic, titles: sections.map(s => s.title) })
+      }).catch(() => {});
+      outlineId.current = null;
+    }
+
     navigate(`/generate/${projectId}`);
   } catch (error) {
     console.error('Error saving:', error);
@@ -4,12 +4,16 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { doc, getDoc, updateDoc } from 'firebase/firestore';
 import { db, auth } from '../firebase';
 
+// Initial batch plus one retry of the sections that failed
+const MAX_GENERATION_ATTEMPTS = 2;
+// Longest wait honoured when the backend reports the Gemini quota was hit
+const MAX_RETRY_WAIT_SECONDS = 30;
+
 function GenerateContent() {
   const { projectId } = useParams();
   const navigate = useNavigate();
   const [project, setProject] = useState(null);
   const [sections, setSections] = useState([]);
-  const [currentIndex, setCurrentIndex] = useState(0);
   const [progress, setProgress] = useState(0);
   const [isGenerating, setIsGenerating] = useState(false);
   const [isComplete, setIsComplete] = useState(false);
@@ -51,46 +55,74 @@ function GenerateContent() {
   const startGeneration = async (projectData, sectionsToGenerate) => {
     setIsGenerating(true);
     
-    const updatedSections = [...sectionsToGenerate];
+    const updatedSections = sectionsToGenerate.map(s => ({ ...s, status: 'generating' }));
+    setSections([...updatedSections]);
     
-    for (let i = 0; i < updatedSections.length; i++) {
-      setCurrentIndex(i);
-      
-      // Update status to generating
-      updatedSections[i].status = 'generating';
-      setSections([...updatedSections]);
-      
+    // First attempt generates every section, later attempts only the failed ones
+    let retryIds = null;
+    let retryAfter = 0;
+    for (let attempt = 0; attempt < MAX_GENERATION_ATTEMPTS; attempt++) {
+      if (retryAfter > 0) {
+        await new Promise(resolve => setTimeout(resolve, Math.min(retryAfter, MAX_RETRY_WAIT_SECONDS) * 1000));
+      }
       try {
-        // Call backend to generate content
-       const response = await fetch(`${API_URL}/api/generate-section`, {
+        // Call backend to generate all sections in one batch
+        const response = await fetch(`${API_URL}/api/generate-document`, {
           method: 'POST',
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify({
             topic: projectData.topic,
-            sectionTitle: updatedSections[i].title,
-            docType: projectData.type
+            docType: projectData.type,
+            sections: updatedSections.map(s => ({
+              id: s.id,
+              title: s.title,
+              content: s.status === 'completed' ? s.content : ''
+            })),
+            retryIds,
+            packed: true
           })
         });
         
-        if (!response.ok) throw new Error('Generation failed');
+        if (!response.ok) {
+          retryAfter = Number(response.headers.get('Retry-After')) || 0;
+          throw new Error('Generation failed');
+        }
         
         const data = await response.json();
         
         // Update with generated content
-        updatedSections[i].content = data.content;
-        updatedSections[i].status = 'completed';
-        setSections([...updatedSections]);
-        
-        // Update progress
-        const newProgress = ((i + 1) / updatedSections.length) * 100;
-        setProgress(newProgress);
+        data.sections.forEach(result => {
+          const section = updatedSections.find(s => s.id === result.id);
+          if (!section || section.status === 'completed') return;
+          if (result.error) {
+            section.status = 'error';
+            section.content = 'Failed to generate content. Please try again.';
+          } else {
+            section.status = 'completed';
+            section.content = result.content;
+          }
+        });
+        retryIds = data.failed;
+        retryAfter = data.retryAfter || 0;
         
       } catch (error) {
-        console.error(`Error generating section ${i}:`, error);
-        updatedSections[i].status = 'error';
-        updatedSections[i].content = 'Failed to generate content. Please try again.';
-        setSections([...updatedSections]);
+        console.error('Error generating sections:', error);
+        updatedSections.forEach(s => {
+          if (s.status !== 'completed') {
+            s.status = 'error';
+            s.content = 'Failed to generate content. Please try again.';
+          }
+        });
+        retryIds = updatedSections.filter(s => s.status === 'error').map(s => s.id);
       }
+      
+      setSections([...updatedSections]);
+      
+      // Update progress
+      const completed = updatedSections.filter(s => s.status === 'completed').length;
+      setProgress((completed / updatedSections.length) * 100);
+      
+      if (retryIds.length === 0) break;
     }
     
     // Save to database
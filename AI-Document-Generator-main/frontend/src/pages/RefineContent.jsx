@@ -1,5 +1,5 @@
 import API_URL from "../config";
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import { doc, getDoc, updateDoc } from 'firebase/firestore';
 import { db, auth } from '../firebase';
@@ -11,6 +11,8 @@ function RefineContent() {
   const [sections, setSections] = useState([]);
   const [loading, setLoading] = useState(true);
   const [exporting, setExporting] = useState(false);
+  // Last exported file; the server answers 304 if nothing changed since
+  const lastExport = useRef({ etag: null, blob: null });
 
   useEffect(() => {
     loadProject();
@@ -55,7 +57,8 @@ function RefineContent() {
     try {
      const response = await fetch(`${API_URL}/api/refine-section`, {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        // Each click asks for a new rewrite, not the cached answer for the same content and instruction
+        headers: { 'Content-Type': 'application/json', 'Cache-Control': 'no-cache' },
         body: JSON.stringify({
           currentContent: sections[sectionIndex].content,
           instruction: instruction
@@ -139,7 +142,8 @@ function RefineContent() {
       const response = await fetch(`${API_URL}/api/export-document`, {
         method: 'POST',
         headers: { 
-          'Content-Type': 'application/json'
+          'Content-Type': 'application/json',
+          ...(lastExport.current.etag && { 'If-None-Match': lastExport.current.etag })
         },
         body: JSON.stringify({
           topic: project.topic,
@@ -153,14 +157,20 @@ function RefineContent() {
         })
       });
 
-      if (!response.ok) {
+      if (!response.ok && response.status !== 304) {
         const errorText = await response.text();
         console.error('Export error:', errorText);
         throw new Error('Export failed');
       }
 
-      // Download file
-      const blob = await response.blob();
+      // Download file (reuse the previous one if unchanged)
+      let blob;
+      if (response.status === 304) {
+        blob = lastExport.current.blob;
+      } else {
+        blob = await response.blob();
+        lastExport.current = { etag: response.headers.get('ETag'), blob };
+      }
       const url = window.URL.createObjectURL(blob);
       const a = document.createElement('a');
       a.href = url;